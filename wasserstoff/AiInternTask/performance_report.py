@@ -1,17 +1,22 @@
+import argparse
 import re
 import json
-import pandas as pd
+import math
 import os
 
+# Stage fields summarized by percentile in the report
+STAGE_FIELDS = ("wall_time", "cpu_time", "peak_memory_delta", "rss_delta")
+PERCENTILES = (50, 95, 99)
+
+
 def parse_log(log_file):
+    """Scrapes per-document metrics from a pipeline.log written before metrics.jsonl existed."""
     performance_data = []
     # Regex pattern to capture the performance metrics from the log file
     performance_pattern = r"Performance metrics for (.+): {'extraction_time': (.+), 'summary_time': (.+), 'keyword_extraction_time': (.+), 'mongodb_insertion_time': (.+), 'memory_usage': (.+)}"
 
     with open(log_file, 'r') as file:
         for line in file:
-            # Print each line for debugging purposes (optional)
-            print(f"Parsing line: {line.strip()}")
             match = re.search(performance_pattern, line)
             if match:
                 document_name = match.group(1)
@@ -34,26 +39,156 @@ def parse_log(log_file):
     return performance_data
 
 
+def load_events(metrics_file):
+    """Reads the JSON-lines events written by the pipeline's metrics sink."""
+    events = []
+    with open(metrics_file, 'r') as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError:
+                # A run killed mid-write can leave a truncated last line
+                continue
+    return events
+
+
+def percentile(values, p):
+    """Returns the p-th percentile of the values, interpolating between the closest ranks."""
+    if not values:
+        return None
+    values = sorted(values)
+    rank = (len(values) - 1) * p / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def summarize_events(events):
+    """Aggregates metric events into per-stage percentiles, per-document rows and throughput."""
+    stages = {}
+    for event in events:
+        if event.get("event") == "stage":
+            stages.setdefault(event["stage"], []).append(event)
+
+    stage_report = {}
+    for stage, stage_events in sorted(stages.items()):
+        summary = {"count": len(stage_events),
+                   "errors": sum(1 for event in stage_events if event.get("status") != "ok")}
+        for field in STAGE_FIELDS:
+            values = [event[field] for event in stage_events if event.get(field) is not None]
+            if values:
+                summary[field] = {f"p{p}": percentile(values, p) for p in PERCENTILES}
+                summary[field]["total"] = sum(values)
+        stage_report[stage] = summary
+
+    documents = [event for event in events if event.get("event") == "document"]
+    completed = [document for document in documents if document.get("status") == "ok"]
+    # Documents that triage skipped or queued did not fail, but were not processed either
+    routed = [document for document in documents if document.get("status") in ("skipped", "queued")]
+    pages = sum(document.get("pages", 0) for document in completed)
+
+    # Throughput is measured over the pipeline runs, or the span of the events if no run finished
+    runs = [event for event in events if event.get("event") == "run"]
+    if runs:
+        elapsed = sum(run["wall_time"] for run in runs)
+    elif events:
+        elapsed = max(event["ts"] for event in events) - min(event["ts"] for event in events)
+    else:
+        elapsed = 0.0
+
+    # Admission decisions, for tuning the memory and CPU budgets
+    admissions = [event for event in events if event.get("event") == "admission"]
+    defer_reasons = {}
+    for event in admissions:
+        if event["decision"] == "defer":
+            defer_reasons[event["reason"]] = defer_reasons.get(event["reason"], 0) + 1
+
+    # Triage categories and the routes they took
+    triage = {"categories": {}, "routes": {}}
+    for event in stages.get("triage", []):
+        if event.get("status") == "ok":
+            for key, value in (("categories", event["category"]), ("routes", event["route"])):
+                triage[key][value] = triage[key].get(value, 0) + 1
+
+    return {
+        "documents": len(documents),
+        "failed": len(documents) - len(completed) - len(routed),
+        "skipped": sum(1 for document in routed if document["status"] == "skipped"),
+        "queued": sum(1 for document in routed if document["status"] == "queued"),
+        "pages": pages,
+        "elapsed": elapsed,
+        "throughput": {
+            "documents_per_second": len(completed) / elapsed if elapsed else None,
+            "pages_per_second": pages / elapsed if elapsed else None,
+        },
+        "stages": stage_report,
+        "admission": {
+            "admitted": sum(1 for event in admissions if event["decision"] == "admit"),
+            "forced": sum(1 for event in admissions if event.get("forced")),
+            "deferred": sum(defer_reasons.values()),
+            "defer_reasons": defer_reasons,
+            "peak_inflight_memory": max((event["inflight_memory"] + event["memory"] for event in admissions
+                                         if event["decision"] == "admit"), default=0),
+        },
+        "triage": triage,
+        "per_document": documents,
+    }
+
+
 def save_report(performance_data, output_file):
+    import pandas as pd  # Only needed for the CSV output
+
     # Save performance data to a JSON file
     with open(output_file, 'w') as json_file:
         json.dump(performance_data, json_file, indent=4)
 
     # Optionally, save the performance data to a CSV file
-    df = pd.DataFrame(performance_data)
+    rows = performance_data["per_document"] if isinstance(performance_data, dict) else performance_data
+    df = pd.DataFrame(rows)
     df.to_csv(output_file.replace('.json', '.csv'), index=False)
 
-if __name__ == "__main__":
-    # Correct path to the log file
-    log_file = r'C:\Users\91730\pythonProject\pdfsummarizer\pythonProject1\src\pipeline.log'
+    # One row per stage with its percentiles
+    if isinstance(performance_data, dict):
+        stage_rows = []
+        for stage, summary in performance_data["stages"].items():
+            row = {"stage": stage, "count": summary["count"], "errors": summary["errors"]}
+            for field in STAGE_FIELDS:
+                for name, value in summary.get(field, {}).items():
+                    row[f"{field}_{name}"] = value
+            stage_rows.append(row)
+        pd.DataFrame(stage_rows).to_csv(output_file.replace('.json', '_stages.csv'), index=False)
 
-    # Check if the log file exists
-    if not os.path.exists(log_file):
-        print(f"Log file not found at {log_file}. Please check the path.")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Builds a performance report from the pipeline's metrics.")
+    parser.add_argument("--metrics", default=os.environ.get("PIPELINE_METRICS_PATH", "metrics.jsonl"),
+                        help="JSON-lines metrics file written by the pipeline")
+    parser.add_argument("--log", help="Legacy pipeline.log to scrape instead of the metrics file")
+    parser.add_argument("--output", default="performance_report.json", help="JSON report path")
+    args = parser.parse_args(argv)
+
+    source = args.log or args.metrics
+    # Check if the input file exists
+    if not os.path.exists(source):
+        print(f"File not found at {source}. Please check the path.")
+        return 1
+
+    if args.log:
+        performance_data = parse_log(args.log)
     else:
-        # Parse the log file and extract performance data
-        performance_data = parse_log(log_file)
+        performance_data = summarize_events(load_events(args.metrics))
+        for stage, summary in performance_data["stages"].items():
+            wall_time = summary.get("wall_time", {})
+            print(f"{stage}: n={summary['count']} p50={wall_time.get('p50', 0):.3f}s "
+                  f"p95={wall_time.get('p95', 0):.3f}s p99={wall_time.get('p99', 0):.3f}s")
 
-        # Save the performance data to a report
-        save_report(performance_data, 'performance_report.json')
-        print("Performance report generated successfully.")
+    # Save the performance data to a report
+    save_report(performance_data, args.output)
+    print("Performance report generated successfully.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,201 @@
+# src/admission.py
+import os
+import threading
+import time
+
+import psutil
+
+from metrics import sink
+
+# Rough per-document memory model: fixed overhead, the parsed file, and the extracted text with
+# everything derived from it. Tune against the "admission" metrics on the nodes that run the pipeline.
+BASE_DOCUMENT_BYTES = 16 * 1024 * 1024
+FILE_MEMORY_FACTOR = 4
+BYTES_PER_TOKEN = 64
+TOKENS_PER_PAGE = 500
+
+
+def estimate_pdf_cost(pdf_path):
+    """Returns the estimated size, pages, tokens, memory and work of processing one PDF.
+
+    The page count comes from the PDF's page tree, which is read without extracting any page.
+    """
+    file_bytes = os.path.getsize(pdf_path)
+    try:
+        import fitz
+        with fitz.open(pdf_path) as doc:
+            pages = doc.page_count
+    except Exception:
+        pages = 0  # Extraction will report why the PDF cannot be read
+    tokens = pages * TOKENS_PER_PAGE
+    return {"bytes": file_bytes, "pages": pages, "tokens": tokens,
+            "memory": BASE_DOCUMENT_BYTES + FILE_MEMORY_FACTOR * file_bytes + BYTES_PER_TOKEN * tokens,
+            "work": pages + tokens / 1000 + file_bytes / (1024 * 1024)}
+
+
+class _Waiting:
+    def __init__(self, item, cost):
+        self.item = item
+        self.cost = cost
+        self.skips = 0
+        self.deferred_for = None
+
+
+class AdmissionController:
+    """Decides which PDF enters the pipeline next, and when, from its estimated cost.
+
+    Up to `lookahead` upcoming items are estimated, and the one with the most work is admitted
+    first so large documents do not end up as the tail of a run. An item is admitted only while
+    the estimated memory of everything in flight stays under `memory_budget` (bytes; None means
+    no fixed budget), system memory keeps `reserve_fraction` free, and the CPU is below
+    `cpu_budget` percent or has a core per in-flight item. Admission slows down as free memory
+    shrinks, before the process gets near a MemoryError. When nothing is in flight the next
+    item is always admitted, so one oversized PDF still runs, alone. Every decision is emitted
+    as an "admission" metrics event.
+    """
+
+    def __init__(self, memory_budget=None, reserve_fraction=0.15, cpu_budget=90.0, lookahead=16, max_skips=4,
+                 estimate_fn=estimate_pdf_cost, memory_fn=psutil.virtual_memory, cpu_fn=psutil.cpu_percent,
+                 cpu_count=None):
+        self.memory_budget = memory_budget
+        self.reserve_fraction = reserve_fraction
+        self.cpu_budget = cpu_budget
+        self.lookahead = lookahead
+        self.max_skips = max_skips
+        self.estimate_fn = estimate_fn
+        self.memory_fn = memory_fn
+        self.cpu_fn = cpu_fn
+        self.cpu_count = cpu_count or psutil.cpu_count() or 1
+        self._waiting = []
+        self._inflight = {}
+        self._inflight_memory = 0
+        self._released = threading.Condition()
+        self._stats = {"admitted": 0, "deferred": 0, "forced": 0, "released": 0, "peak_inflight": 0,
+                       "peak_inflight_memory": 0, "defer_reasons": {}}
+
+    @property
+    def waiting(self):
+        return len(self._waiting)
+
+    def offer(self, item):
+        """Estimates an upcoming item and adds it to the lookahead window."""
+        try:
+            cost = self.estimate_fn(item)
+        except Exception:
+            cost = {"memory": BASE_DOCUMENT_BYTES, "work": 0}
+        self._waiting.append(_Waiting(item, cost))
+
+    def _check(self, cost, inflight, inflight_memory, memory, cpu):
+        # Returns why the item cannot be admitted now, or None
+        if inflight == 0:
+            return None
+        if memory.available - cost["memory"] < self.reserve_fraction * memory.total:
+            return "memory_pressure"
+        if self.memory_budget is not None and inflight_memory + cost["memory"] > self.memory_budget:
+            return "memory_budget"
+        if inflight >= self.cpu_count and cpu >= self.cpu_budget:
+            return "cpu"
+        return None
+
+    def next_item(self):
+        """Admits and returns the next item, or None if the window is empty or nothing fits right now."""
+        if not self._waiting:
+            return None
+        with self._released:
+            inflight = sum(len(costs) for costs in self._inflight.values())
+            inflight_memory = self._inflight_memory
+        ranked = sorted(self._waiting, key=lambda entry: -entry.cost.get("work", 0))
+        # Smaller items may pass a large one that does not fit, but only `max_skips` times
+        if ranked[0].skips >= self.max_skips:
+            ranked = ranked[:1]
+
+        # One reading of memory and CPU per decision; repeated CPU readings microseconds apart are noise
+        memory = self.memory_fn()
+        cpu = self.cpu_fn()
+        for entry in ranked:
+            reason = self._check(entry.cost, inflight, inflight_memory, memory, cpu)
+            if reason is None:
+                self._admit(entry, ranked, inflight == 0, inflight, inflight_memory, memory)
+                return entry.item
+            self._defer(entry, reason, inflight, inflight_memory, memory)
+        return None
+
+    def _admit(self, entry, ranked, forced, inflight, inflight_memory, memory):
+        self._waiting.remove(entry)
+        for other in ranked:
+            if other is not entry and other.cost.get("work", 0) > entry.cost.get("work", 0):
+                other.skips += 1
+        with self._released:
+            self._inflight.setdefault(entry.item, []).append(entry.cost)
+            self._inflight_memory += entry.cost["memory"]
+            self._stats["admitted"] += 1
+            self._stats["forced"] += forced
+            self._stats["peak_inflight"] = max(self._stats["peak_inflight"], inflight + 1)
+            self._stats["peak_inflight_memory"] = max(self._stats["peak_inflight_memory"], self._inflight_memory)
+        sink.emit("admission", document=os.path.basename(str(entry.item)), decision="admit", forced=forced,
+                  inflight=inflight, inflight_memory=inflight_memory, available_memory=memory.available,
+                  **entry.cost)
+
+    def _defer(self, entry, reason, inflight, inflight_memory, memory):
+        # Deferrals are re-checked on every poll, so only a change of reason is recorded
+        if entry.deferred_for == reason:
+            return
+        entry.deferred_for = reason
+        with self._released:
+            self._stats["deferred"] += 1
+            self._stats["defer_reasons"][reason] = self._stats["defer_reasons"].get(reason, 0) + 1
+        sink.emit("admission", document=os.path.basename(str(entry.item)), decision="defer", reason=reason,
+                  inflight=inflight, inflight_memory=inflight_memory, available_memory=memory.available,
+                  **entry.cost)
+
+    def release(self, item):
+        """Marks an admitted item as finished, successfully or not."""
+        with self._released:
+            costs = self._inflight.get(item)
+            if not costs:
+                return
+            self._inflight_memory -= costs.pop()["memory"]
+            if not costs:
+                del self._inflight[item]
+            self._stats["released"] += 1
+            self._released.notify_all()
+
+    def wait_for_release(self, timeout):
+        """Blocks until an in-flight item finishes or `timeout` seconds pass."""
+        with self._released:
+            self._released.wait(timeout)
+
+    def stats(self):
+        """Returns the admission counters."""
+        with self._released:
+            stats = dict(self._stats, defer_reasons=dict(self._stats["defer_reasons"]))
+            stats["inflight"] = sum(len(costs) for costs in self._inflight.values())
+        return stats
+
+
+class FifoAdmission:
+    """Admits items in arrival order without looking at their cost; the pipeline's default."""
+
+    lookahead = 1
+
+    def __init__(self):
+        self._waiting = []
+
+    @property
+    def waiting(self):
+        return len(self._waiting)
+
+    def offer(self, item):
+        self._waiting.append(item)
+
+    def next_item(self):
+        return self._waiting.pop(0) if self._waiting else None
+
+    def release(self, item):
+        pass
+
+    def wait_for_release(self, timeout):
+        time.sleep(timeout)
+
+    def stats(self):
+        return {}
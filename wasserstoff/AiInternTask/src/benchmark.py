@@ -0,0 +1,443 @@
+# src/benchmark.py
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+# The bundled corpus (pdf1.pdf ... pdf16.pdf) sits next to src/
+default_corpus = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+default_baseline = os.path.join(default_corpus, "benchmark_baseline.json")
+
+# A benchmark whose median is this much slower than the baseline counts as a regression
+regression_threshold = 0.10
+
+
+class BenchmarkSkipped(Exception):
+    """Raised by a benchmark whose model or service is not available offline."""
+
+
+def corpus_files(corpus_dir):
+    """Returns the corpus PDFs in natural order (pdf2 before pdf10)."""
+    names = [name for name in os.listdir(corpus_dir) if name.lower().endswith(".pdf")]
+    names.sort(key=lambda name: [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", name)])
+    return [os.path.join(corpus_dir, name) for name in names]
+
+
+def set_thread_count(threads):
+    """Pins the BLAS/OpenMP and torch thread pools so trials are comparable between runs."""
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[variable] = str(threads)
+    # torch reads OMP_NUM_THREADS when it is imported; only a torch that is already loaded needs telling
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(threads)
+
+
+def time_benchmark(run, warmup=1, trials=5):
+    """Calls `run` `warmup` times untimed and then `trials` times timed; returns the timings."""
+    for _ in range(warmup):
+        run()
+    times = []
+    for _ in range(trials):
+        start_time = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start_time)
+    return {
+        "trials": times,
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.mean(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+    }
+
+
+def _pdf_texts(context):
+    # Full text of every corpus PDF, extracted once and shared by the benchmarks that need it
+    if "texts" not in context:
+        from pdf_text import extract_text_from_pdf
+        context["texts"] = [extract_text_from_pdf(path) for path in context["files"]]
+    return context["texts"]
+
+
+def _load_model(name):
+    from model_registry import registry
+    try:
+        return registry.get(name)
+    except Exception as e:
+        raise BenchmarkSkipped(f"model '{name}' is not available: {e}")
+
+
+def _mongo_collection(context):
+    # Benchmark writes go to their own collection so they never touch the pipeline's documents
+    from pymongo import MongoClient
+    from pymongo.errors import PyMongoError
+    import mongodb_handler
+    client = MongoClient(context["mongodb_uri"] or mongodb_handler.mongodb_uri, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError as e:
+        raise BenchmarkSkipped(f"MongoDB is not reachable: {e}")
+    return client[mongodb_handler.database_name]["benchmark_metadata"]
+
+
+# Each benchmark takes the shared context and returns (run, documents): a zero-argument callable
+# that runs one trial over the corpus, and the number of documents one trial processes. Benchmarks
+# that count something other than documents return (run, count, unit).
+
+def bench_extract_pymupdf(context):
+    from pdf_text import extract_text_from_pdf
+    files = context["files"]
+    return lambda: [extract_text_from_pdf(path) for path in files], len(files)
+
+
+def bench_extract_pypdf2(context):
+    import PyPDF2
+    files = context["files"]
+
+    def run():
+        for path in files:
+            with open(path, "rb") as file:
+                try:
+                    "".join(page.extract_text() or "" for page in PyPDF2.PdfReader(file).pages)
+                except PyPDF2.errors.PdfReadError:
+                    # PyPDF2 rejects PDFs that PyMuPDF repairs (e.g. a missing EOF marker)
+                    continue
+    return run, len(files)
+
+
+def _bench_summarize(length_name, backend="fp32"):
+    def setup(context):
+        import main
+        from model_registry import SUMMARIZER_BACKENDS
+        from summarization import summarize_batch_multi_length, SUMMARY_LENGTHS
+        model, tokenizer = _load_model(SUMMARIZER_BACKENDS[backend])
+        texts = [text[:main.summary_input_chars] for text in _pdf_texts(context)]
+        lengths = {length_name: SUMMARY_LENGTHS[length_name]}
+        batch_size = context["batch_size"]
+
+        def run():
+            for start in range(0, len(texts), batch_size):
+                summarize_batch_multi_length(texts[start:start + batch_size], model, tokenizer, lengths=lengths,
+                                             num_beams=main.summary_num_beams)
+        return run, len(texts)
+    return setup
+
+
+def bench_keywords_keybert(context):
+    import main
+    model = _load_model("keybert")
+    texts = [text[:main.summary_input_chars] for text in _pdf_texts(context)]
+    return lambda: [model.extract_keywords(text, top_n=main.keyword_top_n) for text in texts], len(texts)
+
+
+def bench_keywords_keybert_batch(context):
+    import main
+    from keybert_keywords import BatchKeywordExtractor
+    model = _load_model("keybert")
+    texts = [text[:main.summary_input_chars] for text in _pdf_texts(context)]
+    # One extractor across trials, so later trials show the effect of a warm phrase embedding cache
+    extractor = BatchKeywordExtractor(model.model.embed)
+
+    def run():
+        for start in range(0, len(texts), main.keyword_batch_size):
+            extractor.extract_keywords(texts[start:start + main.keyword_batch_size], top_n=main.keyword_top_n)
+    return run, len(texts)
+
+
+def bench_keywords_tfidf(context):
+    import main
+    from tfidf_keywords import TfidfKeywordEngine
+    texts = _pdf_texts(context)
+
+    def run():
+        # The whole corpus is ingested and scored in one pass, starting from empty frequencies
+        TfidfKeywordEngine().extract_keywords(texts, top_n=main.keyword_top_n)
+    return run, len(texts)
+
+
+def _sample_results(context):
+    return [{"name": os.path.basename(path), "summaries": {"short": "s" * 200, "medium": "m" * 400,
+                                                          "long": "l" * 800},
+             "keywords": ["alpha", "beta", "gamma", "delta", "epsilon"]} for path in context["files"]]
+
+
+def bench_storage_file_write(context):
+    results = _sample_results(context)
+    output_dir = os.path.join(context["workdir"], "summaries")
+    os.makedirs(output_dir, exist_ok=True)
+
+    def run():
+        for result in results:
+            with open(os.path.join(output_dir, f"{result['name']}_summary.txt"), "w") as file:
+                for name, summary in result["summaries"].items():
+                    file.write(f"{name.capitalize()} Summary:\n{summary}\n\n")
+    return run, len(results)
+
+
+def bench_storage_result_cache(context):
+    from result_cache import ResultCache
+    results = _sample_results(context)
+    cache = ResultCache(os.path.join(context["workdir"], "result_cache.sqlite"), {"benchmark": True})
+
+    def run():
+        for index, result in enumerate(results):
+            cache.put(f"benchmark-{index}", result)
+    return run, len(results)
+
+
+def bench_storage_mongodb(context):
+    from mongodb_handler import BulkMongoWriter
+    collection = _mongo_collection(context)
+    results = _sample_results(context)
+
+    def run():
+        writer = BulkMongoWriter(collection, max_latency=60)
+        for index, result in enumerate(results):
+            writer.write(dict(result, content_key=f"benchmark-{index}"))
+        writer.close()
+    return run, len(results)
+
+
+@contextmanager
+def _benchmark_writer(context):
+    # The pipeline's bulk writer goes to the benchmark collection on the benchmark's server for the
+    # block, and back to the pipeline's collection afterwards
+    import mongodb_handler
+    settings = {name: getattr(mongodb_handler, name) for name in ("mongodb_uri", "collection_name", "_writer")}
+    mongodb_handler.mongodb_uri = context["mongodb_uri"] or mongodb_handler.mongodb_uri
+    mongodb_handler.collection_name = "benchmark_metadata"
+    mongodb_handler._writer = None
+    try:
+        yield
+    finally:
+        writer = mongodb_handler._writer
+        for name, value in settings.items():
+            setattr(mongodb_handler, name, value)
+        if writer is not None:
+            writer.close()
+
+
+def bench_search_query(context):
+    import numpy as np
+    import main
+    from search_index import SearchIndex, tokenize
+    # A synthetic corpus of search_documents documents drawing on the real corpus's vocabulary with
+    # a Zipf distribution, so posting lists have realistic length skew. The index is built and left
+    # with the pipeline's flush and merge settings, segments and all, as queries would find it.
+    vocabulary = sorted(set(tokenize(" ".join(_pdf_texts(context)))))
+    rng = np.random.default_rng(0)
+    index = SearchIndex(os.path.join(context["workdir"], "search_index"),
+                        flush_documents=main.search_index_flush_documents, merge_factor=main.search_index_merge_factor)
+    for number in range(context["search_documents"]):
+        words = [vocabulary[min(rank, len(vocabulary)) - 1] for rank in rng.zipf(1.2, size=300)]
+        pages = [(page + 1, " ".join(words[page * 100:(page + 1) * 100])) for page in range(3)]
+        index.add_document(f"doc{number}.pdf", pages, keywords=words[:3])
+    index.flush()
+
+    # Two-word queries, every fourth one also filtered on a keyword
+    queries = [(" ".join(rng.choice(vocabulary[:2000], size=2)), [vocabulary[int(rng.integers(50))]] if i % 4 == 0
+                else None) for i in range(200)]
+
+    def run():
+        for query, keywords in queries:
+            index.search(query, top_k=10, keywords=keywords)
+    return run, len(queries), "queries"
+
+
+def bench_near_duplicate_lookup(context):
+    import numpy as np
+    from near_duplicates import NearDuplicateIndex
+    # Random signatures stand in for search_documents documents; each query is an indexed signature
+    # with an eighth of its entries changed, so it matches at about 0.88
+    rng = np.random.default_rng(0)
+    index = NearDuplicateIndex(threshold=0.8)
+    signatures = rng.integers(0, 1 << 32, size=(context["search_documents"], index.hasher.num_perm), dtype=np.uint32)
+    for number, signature in enumerate(signatures):
+        index.add(f"doc{number}", signature)
+    queries = signatures[rng.integers(len(signatures), size=1000)].copy()
+    changed = rng.random(queries.shape) < 0.125
+    queries[changed] = rng.integers(0, 1 << 32, size=int(changed.sum()), dtype=np.uint32)
+
+    def run():
+        for query in queries:
+            index.query(query)
+    return run, len(queries), "queries"
+
+
+def bench_end_to_end(context):
+    import main
+    _load_model(main.summary_model_name())
+    _load_model("keybert")
+    _mongo_collection(context)
+    # The pipeline writes summary files next to its PDFs, so it runs on a copy of the corpus
+    corpus_copy = os.path.join(context["workdir"], "corpus")
+    os.makedirs(corpus_copy, exist_ok=True)
+    files = [shutil.copy(path, corpus_copy) for path in context["files"]]
+
+    def run():
+        # Fresh stores per trial, so every trial parses, deduplicates and summarizes every document,
+        # and nothing is written to the working directory
+        trial_dir = os.path.join(context["workdir"], f"e2e_{time.perf_counter_ns()}")
+        os.makedirs(trial_dir)
+        main._result_cache = None
+        main._search_index = None
+        main._near_duplicate_index = None
+        main.result_cache_path = os.path.join(trial_dir, "cache.sqlite")
+        main.page_store_path = os.path.join(trial_dir, "page_store")
+        main.search_index_path = os.path.join(trial_dir, "search_index")
+        main.near_duplicate_index_path = os.path.join(trial_dir, "near_duplicates.idx")
+        main.triage_queue_path = os.path.join(trial_dir, "triage_queue.jsonl")
+        with _benchmark_writer(context):
+            main.process_files(files)
+    return run, len(files)
+
+
+BENCHMARKS = {
+    "extract_pymupdf": bench_extract_pymupdf,
+    "extract_pypdf2": bench_extract_pypdf2,
+    "summarize_short": _bench_summarize("short"),
+    "summarize_medium": _bench_summarize("medium"),
+    "summarize_long": _bench_summarize("long"),
+    "summarize_medium_int8": _bench_summarize("medium", "int8"),
+    "summarize_medium_onnx": _bench_summarize("medium", "onnx"),
+    "keywords_keybert": bench_keywords_keybert,
+    "keywords_keybert_batch": bench_keywords_keybert_batch,
+    "keywords_tfidf": bench_keywords_tfidf,
+    "storage_file_write": bench_storage_file_write,
+    "storage_result_cache": bench_storage_result_cache,
+    "storage_mongodb": bench_storage_mongodb,
+    "search_query": bench_search_query,
+    "near_duplicate_lookup": bench_near_duplicate_lookup,
+    "end_to_end": bench_end_to_end,
+}
+
+
+def environment(threads, files):
+    """Describes the machine and corpus, so results are only compared against like baselines."""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "threads": threads,
+        "corpus": {os.path.basename(path): os.path.getsize(path) for path in files},
+    }
+
+
+def run_suite(corpus_dir=default_corpus, names=None, warmup=1, trials=5, threads=1, batch_size=4,
+              mongodb_uri=None, search_documents=10000):
+    """Runs the selected benchmarks (all by default) over the corpus and returns their results."""
+    set_thread_count(threads)
+    # The suite runs without network access; models must already be in the local cache
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+    files = corpus_files(corpus_dir)
+    results = {"environment": environment(threads, files), "warmup": warmup, "trials": trials, "benchmarks": {}}
+    with tempfile.TemporaryDirectory() as workdir:
+        context = {"files": files, "workdir": workdir, "batch_size": batch_size, "mongodb_uri": mongodb_uri,
+                   "search_documents": search_documents}
+        for name in names or list(BENCHMARKS):
+            try:
+                run, count, *unit = BENCHMARKS[name](context)
+                unit = unit[0] if unit else "documents"
+                result = time_benchmark(run, warmup=warmup, trials=trials)
+                result["unit"] = unit
+                result[unit] = count
+                result[f"{unit}_per_second"] = count / result["median"] if result["median"] else None
+            except BenchmarkSkipped as e:
+                result = {"skipped": str(e)}
+            except Exception as e:
+                result = {"error": f"{type(e).__name__}: {e}"}
+            results["benchmarks"][name] = result
+    return results
+
+
+def compare_to_baseline(results, baseline, threshold=regression_threshold):
+    """Compares each benchmark's median against the baseline's.
+
+    Returns one entry per benchmark timed in both, with the ratio of current to baseline median
+    and a status of "regression", "improvement" or "ok" depending on `threshold`.
+    """
+    comparison = {}
+    for name, result in results["benchmarks"].items():
+        reference = baseline.get("benchmarks", {}).get(name, {})
+        if "median" not in result or not reference.get("median"):
+            continue
+        ratio = result["median"] / reference["median"]
+        if ratio > 1 + threshold:
+            status = "regression"
+        elif ratio < 1 - threshold:
+            status = "improvement"
+        else:
+            status = "ok"
+        comparison[name] = {"baseline": reference["median"], "current": result["median"], "ratio": ratio,
+                            "status": status}
+    return comparison
+
+
+def print_results(results, comparison):
+    for name, result in results["benchmarks"].items():
+        if "median" not in result:
+            reason = result.get("skipped") or result.get("error")
+            print(f"{name:<22} {reason.splitlines()[0][:100]}")
+            continue
+        line = (f"{name:<22} median {result['median']:.3f}s  min {result['min']:.3f}s  "
+                f"stdev {result['stdev']:.3f}s  {result[result['unit'] + '_per_second']:.2f} {result['unit']}/s")
+        if name in comparison:
+            line += f"  {comparison[name]['ratio']:.2f}x baseline ({comparison[name]['status']})"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks the pipeline stages over the bundled PDF corpus.")
+    parser.add_argument("--corpus", default=default_corpus, help="Folder holding the benchmark PDFs")
+    parser.add_argument("--benchmarks", nargs="+", choices=list(BENCHMARKS), help="Benchmarks to run (default: all)")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs before the trials")
+    parser.add_argument("--trials", type=int, default=5, help="Timed runs per benchmark")
+    parser.add_argument("--threads", type=int, default=1, help="Torch/BLAS threads")
+    parser.add_argument("--batch-size", type=int, default=4, help="Documents per summarization batch")
+    parser.add_argument("--mongodb-uri", help="MongoDB for the storage and end-to-end benchmarks")
+    parser.add_argument("--search-documents", type=int, default=10000,
+                        help="Size of the synthetic corpus the search benchmark queries")
+    parser.add_argument("--baseline", default=default_baseline, help="Stored baseline to compare against")
+    parser.add_argument("--threshold", type=float, default=regression_threshold,
+                        help="Fraction slower than the baseline that counts as a regression")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.corpus, names=args.benchmarks, warmup=args.warmup, trials=args.trials,
+                        threads=args.threads, batch_size=args.batch_size, mongodb_uri=args.mongodb_uri,
+                        search_documents=args.search_documents)
+
+    comparison = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline.get("environment", {}).get("threads") != args.threads:
+            print(f"Warning: the baseline was recorded with {baseline['environment'].get('threads')} threads")
+        comparison = compare_to_baseline(results, baseline, threshold=args.threshold)
+    results["comparison"] = comparison
+    print_results(results, comparison)
+
+    for path in filter(None, [args.output, args.baseline if args.save_baseline else None]):
+        with open(path, "w") as file:
+            json.dump(results, file, indent=4)
+        print(f"Results written to {path}")
+
+    regressions = [name for name, entry in comparison.items() if entry["status"] == "regression"]
+    if regressions:
+        print(f"Regressions over {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
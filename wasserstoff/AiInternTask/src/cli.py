@@ -0,0 +1,246 @@
+# src/cli.py
+import argparse
+import os
+import sys
+import threading
+
+# Everything heavy (torch, transformers, pymongo, pandas) is imported inside the commands, after the
+# cache, offline and output settings have been put in the environment those libraries read.
+
+
+def configure_environment(args):
+    """Points the model, corpus, log and metrics locations at the paths given on the command line."""
+    if args.model_cache:
+        os.makedirs(args.model_cache, exist_ok=True)
+        os.environ["HF_HOME"] = args.model_cache
+        os.environ["SENTENCE_TRANSFORMERS_HOME"] = args.model_cache
+        os.environ.setdefault("T5_ONNX_DIR", os.path.join(args.model_cache, "t5-small-onnx"))
+    if args.corpus_cache:
+        os.makedirs(args.corpus_cache, exist_ok=True)
+        os.environ["NLTK_DATA"] = args.corpus_cache
+    if args.offline:
+        # Models and corpora must already be in the caches; nothing is fetched over the network
+        os.environ["HF_HUB_OFFLINE"] = "1"
+        os.environ["TRANSFORMERS_OFFLINE"] = "1"
+        os.environ["PIPELINE_OFFLINE"] = "1"
+    if args.log:
+        os.environ["PIPELINE_LOG_PATH"] = args.log
+    if args.metrics:
+        os.environ["PIPELINE_METRICS_PATH"] = args.metrics
+    if args.page_store:
+        os.environ["PAGE_STORE_PATH"] = args.page_store
+
+
+def pdf_paths(paths):
+    """Expands folders into the PDFs they contain."""
+    from benchmark import corpus_files
+    files = []
+    for path in paths:
+        files.extend(corpus_files(path) if os.path.isdir(path) else [path])
+    return files
+
+
+def configure_pipeline(args):
+    """Applies the pipeline options shared by summarize and ingest to main and returns the module."""
+    import main
+    main.summary_mode = args.mode
+    main.summary_backend = args.backend
+    main.keyword_mode = args.keywords
+    main.result_cache_path = args.result_cache
+    main.search_index_path = args.search_index
+    main.page_store_path = os.environ.get("PAGE_STORE_PATH", main.page_store_path)
+    main.summary_latency_budget = args.latency_budget
+    main.document_timeout = args.document_timeout or None
+    main.triage_queue_path = args.triage_queue
+    main.near_duplicate_threshold = args.near_duplicate_threshold or None
+    return main
+
+
+def summarize_command(args, extra):
+    main = configure_pipeline(args)
+    if args.memory_budget:
+        main.admission_memory_budget = args.memory_budget * 1024 * 1024
+    files = pdf_paths(args.paths)
+    try:
+        stats = main.process_files(files, extract_workers=args.extract_workers)
+    finally:
+        main.summary_scheduler.stop()
+        main.keyword_scheduler.stop()
+    print(f"Processed {stats['submitted']} PDFs: {stats['completed']} completed, {stats['failed']} failed")
+    return 1 if stats["failed"] else 0
+
+
+def ingest_command(args, extra):
+    from ingest_service import IngestService, WorkQueue, make_health_server
+    main = configure_pipeline(args)
+    work_queue = WorkQueue(args.queue, max_attempts=args.max_attempts, retry_delay=args.retry_delay)
+    # Workers are threads, where only a worker process can enforce --document-timeout
+    service = IngestService(args.folders, work_queue,
+                            lambda pdf_path: main.process_pdf(*os.path.split(pdf_path),
+                                                              extract_fn=main.extract_in_subprocess),
+                            main.flush_outputs, workers=args.workers, scan_interval=args.scan_interval,
+                            commit_interval=args.commit_interval)
+    server = None
+    if args.health_port:
+        server = make_health_server(service, port=args.health_port)
+        threading.Thread(target=server.serve_forever, name="ingest-health", daemon=True).start()
+        print(f"Serving health counters on http://127.0.0.1:{server.server_address[1]}/health")
+    try:
+        health = service.run()  # Until Ctrl+C or SIGTERM, then drains
+    finally:
+        if server is not None:
+            server.shutdown()
+        main.summary_scheduler.stop()
+        main.keyword_scheduler.stop()
+        main.shutdown_extract_pools()
+        work_queue.close()
+    counts = health["queue"]
+    print(f"Stopped with {counts['done']} PDFs done, {counts['pending']} pending and {counts['failed']} failed")
+    return 0
+
+
+def keywords_command(args, extra):
+    from page_store import document_text
+    files = pdf_paths(args.paths)
+    texts = [document_text(path, max_chars=args.chars) for path in files]
+    if args.mode == "tfidf":
+        from tfidf_keywords import TfidfKeywordEngine
+        # Every PDF given is ingested and scored in one pass, on top of any saved frequencies
+        engine = TfidfKeywordEngine.load(args.state) if args.state else TfidfKeywordEngine()
+        keywords = engine.extract_keywords(texts, top_n=args.top_n)
+        if args.state:
+            engine.save(args.state)
+    elif args.mode == "keybert-batch":
+        import main
+        main.keyword_embedding_cache_path = args.embedding_cache
+        # Every PDF given is one batch; phrase embeddings are reused from and saved to the cache
+        extractor = main.get_batch_keyword_extractor()
+        keywords = extractor.extract_keywords(texts, top_n=args.top_n)
+        extractor.cache.save(args.embedding_cache)
+    else:
+        from keyword_extractor import extract_keywords
+        keywords = [extract_keywords(text, top_n=args.top_n) for text in texts]
+    for path, document_keywords in zip(files, keywords):
+        print(f"{os.path.basename(path)}: {', '.join(document_keywords)}")
+    return 0
+
+
+def search_command(args, extra):
+    import json
+    from search_index import SearchIndex, make_server
+    index = SearchIndex(args.index)
+    if args.merge:
+        index.merge()
+    if args.serve:
+        server = make_server(index, port=args.port)
+        print(f"Serving {len(index)} documents on http://127.0.0.1:{server.server_address[1]}/search?q=...")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
+        return 0
+    for result in index.search(args.query, top_k=args.top_k, keywords=args.keyword):
+        print(f"{result['score']:8.3f}  {result['name']}  pages: {json.dumps(result['pages'])}")
+    return 0
+
+
+def report_command(args, extra):
+    # performance_report.py lives in the project folder, next to src/
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    import performance_report
+    return performance_report.main(extra)
+
+
+def bench_command(args, extra):
+    import benchmark
+    return benchmark.main(extra)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Summarizes PDFs, extracts keywords and reports on performance.")
+    parser.add_argument("--offline", action="store_true", help="Only use models and corpora already in the caches")
+    parser.add_argument("--model-cache", help="Folder for downloaded and exported models")
+    parser.add_argument("--corpus-cache", help="Folder for NLTK corpora such as the stopword lists")
+    parser.add_argument("--log", help="Pipeline log file (default: pipeline.log)")
+    parser.add_argument("--metrics", help="Metrics JSON-lines file (default: metrics.jsonl)")
+    parser.add_argument("--page-store", help="Store of extracted page texts (default: page_store)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    # Options of the summarization pipeline, shared by summarize and ingest
+    pipeline_options = argparse.ArgumentParser(add_help=False)
+    pipeline_options.add_argument("--mode", choices=["truncate", "hierarchical"], default="truncate")
+    pipeline_options.add_argument("--backend", choices=["fp32", "int8", "onnx"], default="fp32")
+    pipeline_options.add_argument("--keywords", choices=["keybert", "keybert-batch", "tfidf"], default="keybert",
+                                  help="Keyword mode")
+    pipeline_options.add_argument("--result-cache", default="result_cache.sqlite", help="Cache of per-PDF results")
+    pipeline_options.add_argument("--search-index", default="search_index", help="Search index to add the PDFs to")
+    pipeline_options.add_argument("--latency-budget", type=float,
+                                  help="Seconds per document for its summaries; picks faster decoding to meet it")
+    pipeline_options.add_argument("--document-timeout", type=float, default=120,
+                                  help="Seconds a PDF may spend in extraction (0: no limit)")
+    pipeline_options.add_argument("--triage-queue", default="triage_queue.jsonl",
+                                  help="File listing the scanned PDFs that triage queued for OCR")
+    pipeline_options.add_argument("--near-duplicate-threshold", type=float, default=0.9,
+                                  help="Similarity above which a PDF reuses the results of a processed one (0: off)")
+
+    summarize = commands.add_parser("summarize", parents=[pipeline_options],
+                                    help="Summarize PDFs and store the results")
+    summarize.add_argument("paths", nargs="+", help="PDF files or folders of PDFs")
+    summarize.add_argument("--extract-workers", type=int, default=2, help="PDF extraction processes")
+    summarize.add_argument("--memory-budget", type=int, help="Estimated MB of PDFs in flight at once")
+    summarize.set_defaults(handler=summarize_command)
+
+    ingest = commands.add_parser("ingest", parents=[pipeline_options],
+                                 help="Watch folders and process every PDF that appears in them, until stopped")
+    ingest.add_argument("folders", nargs="+", help="Folders to watch")
+    ingest.add_argument("--queue", default="ingest_queue.sqlite", help="Durable work queue")
+    ingest.add_argument("--workers", type=int, default=2, help="PDFs processed at once")
+    ingest.add_argument("--max-attempts", type=int, default=3, help="Attempts per PDF before it is marked failed")
+    ingest.add_argument("--retry-delay", type=float, default=30.0,
+                        help="Seconds before the first retry; doubles with each attempt")
+    ingest.add_argument("--scan-interval", type=float, default=5.0, help="Seconds between folder scans")
+    ingest.add_argument("--commit-interval", type=float, default=5.0,
+                        help="Seconds between flushes of MongoDB and the search index")
+    ingest.add_argument("--health-port", type=int, help="Serve the health counters on /health at this port")
+    ingest.set_defaults(handler=ingest_command)
+
+    keywords = commands.add_parser("keywords", help="Print the keywords of PDFs")
+    keywords.add_argument("paths", nargs="+", help="PDF files or folders of PDFs")
+    keywords.add_argument("--top-n", type=int, default=5, help="Keywords per PDF")
+    keywords.add_argument("--chars", type=int, default=2000, help="Characters of each PDF to read")
+    keywords.add_argument("--mode", choices=["keybert", "keybert-batch", "tfidf"], default="keybert")
+    keywords.add_argument("--state", help="Document frequencies to load and update in tfidf mode")
+    keywords.add_argument("--embedding-cache", default="keyword_embeddings.npz",
+                          help="Phrase embedding cache to load and update in keybert-batch mode")
+    keywords.set_defaults(handler=keywords_command)
+
+    search = commands.add_parser("search", help="Search the indexed PDFs with BM25")
+    search.add_argument("query", nargs="?", default="", help="Words to search for")
+    search.add_argument("--index", default="search_index", help="Search index folder")
+    search.add_argument("--keyword", action="append", help="Only PDFs with this keyword (repeatable)")
+    search.add_argument("-k", "--top-k", type=int, default=10, help="Results to show")
+    search.add_argument("--merge", action="store_true", help="Merge the index segments first")
+    search.add_argument("--serve", action="store_true", help="Answer /search?q=...&keyword=... over local HTTP")
+    search.add_argument("--port", type=int, default=8765, help="Port for --serve")
+    search.set_defaults(handler=search_command)
+
+    # report and bench pass their remaining options through to performance_report.py and benchmark.py
+    report = commands.add_parser("report", add_help=False,
+                                  help="Build the performance report (options: see performance_report.py)")
+    report.set_defaults(handler=report_command)
+    bench = commands.add_parser("bench", add_help=False, help="Run the benchmark suite (options: see benchmark.py)")
+    bench.set_defaults(handler=bench_command)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if extra and args.command not in ("report", "bench"):
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    configure_environment(args)
+    return args.handler(args, extra)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,25 +1,195 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import time
-import os
 import logging
-from process_pdf import process_pdf  # Assuming process_pdf logic is separated into its own module
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from admission import FifoAdmission
+
+# Marks the end of a stage's input
+_DONE = object()
+
+
+class StagedPipeline:
+    """Streams items through extract -> infer -> persist stages connected by bounded queues.
+
+    Extraction runs in a process pool so CPU-bound PDF parsing does not hold the GIL that
+    inference needs. Inference and persistence run in their own threads. Every stage has its
+    own worker count, and a full queue blocks the stage feeding it, so a slow stage slows
+    down the stages before it instead of piling up work in memory.
+
+    `admission` decides which item is extracted next and when (see admission.AdmissionController);
+    an item counts as in flight from admission until it is persisted or fails. By default items
+    are admitted in order.
+
+    An extraction that has been running for `extract_timeout` seconds fails with a TimeoutError,
+    so one file that hangs the parser cannot stall the run; its worker process is replaced and
+    the other pending extractions are resubmitted.
+    """
+
+    def __init__(self, extract_fn, infer_fn, persist_fn, extract_workers=2, infer_workers=1, persist_workers=1,
+                 queue_size=4, use_processes=True, on_error=None, admission=None, poll_interval=0.2,
+                 extract_timeout=None):
+        self.extract_fn = extract_fn
+        self.infer_fn = infer_fn
+        self.persist_fn = persist_fn
+        self.extract_workers = extract_workers
+        self.infer_workers = infer_workers
+        self.persist_workers = persist_workers
+        self.queue_size = queue_size
+        self.use_processes = use_processes
+        self.on_error = on_error
+        self.admission = admission or FifoAdmission()
+        self.poll_interval = poll_interval
+        self.extract_timeout = extract_timeout
+        self._stats_lock = threading.Lock()
+        self.stats = {}
+
+    def run(self, items):
+        """Runs every item through all three stages and returns completion counts."""
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0}
+        if self.extract_timeout is not None:
+            self.stats["timed_out"] = 0
+        extracted = queue.Queue(maxsize=self.queue_size)
+        inferred = queue.Queue(maxsize=self.queue_size)
+
+        infer_threads = [threading.Thread(target=self._stage_loop, args=("infer", self.infer_fn, extracted, inferred),
+                                          name=f"infer-{i}", daemon=True) for i in range(self.infer_workers)]
+        persist_threads = [threading.Thread(target=self._stage_loop, args=("persist", self.persist_fn, inferred, None),
+                                            name=f"persist-{i}", daemon=True) for i in range(self.persist_workers)]
+        for thread in infer_threads + persist_threads:
+            thread.start()
+
+        self._extract_all(items, extracted)
+
+        # Shut the stages down in order so every queued item is drained first
+        for _ in infer_threads:
+            extracted.put(_DONE)
+        for thread in infer_threads:
+            thread.join()
+        for _ in persist_threads:
+            inferred.put(_DONE)
+        for thread in persist_threads:
+            thread.join()
+        return dict(self.stats)
+
+    def _extract_all(self, items, extracted):
+        executor_class = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        executor = executor_class(max_workers=self.extract_workers)
+        try:
+            items = iter(items)
+            pending = {}
+            started = {}
+            exhausted = False
+            while True:
+                # Keep one extra item queued per worker so no worker sits idle between files
+                while len(pending) < self.extract_workers * 2:
+                    while not exhausted and self.admission.waiting < self.admission.lookahead:
+                        try:
+                            self.admission.offer(next(items))
+                        except StopIteration:
+                            exhausted = True
+                    item = self.admission.next_item()
+                    if item is None:
+                        break
+                    pending[executor.submit(self.extract_fn, item)] = item
+                    self._count("submitted")
+                if not pending:
+                    if exhausted and not self.admission.waiting:
+                        return
+                    # Everything admitted is further down the pipeline; admit more once some of it finishes
+                    self.admission.wait_for_release(self.poll_interval)
+                    continue
+
+                # Deferred items are re-checked, and running extractions timed, at least every poll interval
+                polling = self.admission.waiting or self.extract_timeout is not None
+                done, _ = wait(pending, timeout=self.poll_interval if polling else None, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = pending.pop(future)
+                    started.pop(future, None)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        self._fail(item, "extract", e)
+                        continue
+                    extracted.put((item, result))  # Blocks while inference is behind
+                if self.extract_timeout is not None and self._expire(pending, started) and self.use_processes:
+                    executor = self._replace_executor(executor, pending, started)
+        finally:
+            executor.shutdown()
+
+    def _expire(self, pending, started):
+        # Workers take items in submission order, so the oldest `extract_workers` pending items are
+        # the ones running; an item's clock starts once it is among them, not while it is queued
+        now = time.monotonic()
+        expired = False
+        for future in list(pending)[:self.extract_workers]:
+            started.setdefault(future, now)
+            if now - started[future] < self.extract_timeout:
+                continue
+            item = pending.pop(future)
+            del started[future]
+            future.cancel()
+            expired = True
+            self._count("timed_out")
+            self._fail(item, "extract", TimeoutError(f"Extraction took longer than {self.extract_timeout} seconds"))
+        return expired
+
+    def _replace_executor(self, executor, pending, started):
+        # The worker stuck on an expired item would never take another one, so the pool is torn down
+        # and the items still pending start over in a fresh one. Threads cannot be stopped, so with a
+        # thread pool an expired item only stops counting against the pipeline.
+        for process in list((getattr(executor, "_processes", None) or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=True, cancel_futures=True)
+        executor = ProcessPoolExecutor(max_workers=self.extract_workers)
+        for future, item in list(pending.items()):
+            del pending[future]
+            pending[executor.submit(self.extract_fn, item)] = item
+        started.clear()
+        return executor
+
+    def _stage_loop(self, stage, stage_fn, inbox, outbox):
+        while True:
+            entry = inbox.get()
+            if entry is _DONE:
+                return
+            item, value = entry
+            try:
+                result = stage_fn(item, value)
+            except Exception as e:
+                self._fail(item, stage, e)
+                continue
+            if outbox is not None:
+                outbox.put((item, result))  # Blocks while persistence is behind
+            else:
+                self._count("completed")
+                self.admission.release(item)
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _fail(self, item, stage, error):
+        self._count("failed")
+        self.admission.release(item)
+        if self.on_error is not None:
+            self.on_error(item, stage, error)
+        else:
+            logging.error(f"Failed to {stage} {item}: {error}")
+
 
-def run_parallel_pipeline(folder_path, batch_size=2):
-    pdf_files = [f for f in os.listdir(folder_path) if f.endswith('.pdf')]
+def run_parallel_pipeline(folder_path, extract_fn, infer_fn, persist_fn, **stage_options):
+    """Streams every PDF in the folder through the given stage functions."""
+    pdf_files = [os.path.join(folder_path, f) for f in os.listdir(folder_path) if f.endswith('.pdf')]
     total_files = len(pdf_files)
     start_time = time.time()  # Start timer for performance metrics
 
-    for i in range(0, total_files, batch_size):
-        batch = pdf_files[i:i + batch_size]
-        with ThreadPoolExecutor(max_workers=batch_size) as executor:
-            futures = {executor.submit(process_pdf, pdf): pdf for pdf in batch}
-            for future in as_completed(futures):
-                pdf = futures[future]
-                try:
-                    future.result()
-                except Exception as e:
-                    logging.error(f"Failed to process {pdf}: {e}")
+    pipeline = StagedPipeline(extract_fn, infer_fn, persist_fn, **stage_options)
+    stats = pipeline.run(pdf_files)
 
     # Performance metric
     end_time = time.time()
-    logging.info(f"Total time for processing {total_files} PDFs: {end_time - start_time:.2f} seconds")
+    logging.info(f"Total time for processing {total_files} PDFs: {end_time - start_time:.2f} seconds ({stats})")
+    return stats
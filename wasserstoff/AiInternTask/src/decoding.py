@@ -0,0 +1,72 @@
+# src/decoding.py
+import statistics
+import threading
+from collections import deque
+
+# Decoding strategies from best quality (and slowest) to fastest, with their beam counts
+STRATEGIES = (("full_beam", 4), ("small_beam", 2), ("greedy", 1))
+
+# Seconds per output token per document for greedy decoding before any batch has been timed
+DEFAULT_STEP_SECONDS = 0.005
+
+
+def strategy_name(num_beams):
+    """Returns the name of the strategy that decodes with `num_beams` beams."""
+    return next((name for name, beams in STRATEGIES if beams == num_beams), f"beam_{num_beams}")
+
+
+class DecodeCostModel:
+    """Predicts how long a summary batch takes for each decoding strategy, from recent batches.
+
+    Each timed batch is recorded as seconds per document per requested output token for its beam
+    count. A beam count that has not been timed yet is estimated from the closest one that has,
+    scaled by the number of beams.
+    """
+
+    def __init__(self, window=32, default_step_seconds=DEFAULT_STEP_SECONDS):
+        self.window = window
+        self.default_step_seconds = default_step_seconds
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, num_beams, batch_size, output_tokens, seconds):
+        """Records one timed batch of `batch_size` documents and `output_tokens` requested tokens."""
+        if batch_size <= 0 or output_tokens <= 0:
+            return
+        with self._lock:
+            samples = self._samples.setdefault(num_beams, deque(maxlen=self.window))
+            samples.append(seconds / (batch_size * output_tokens))
+
+    def step_seconds(self, num_beams):
+        """Returns the estimated seconds per document per output token at `num_beams`."""
+        with self._lock:
+            if num_beams in self._samples:
+                return statistics.median(self._samples[num_beams])
+            if not self._samples:
+                return self.default_step_seconds * num_beams
+            closest = min(self._samples, key=lambda beams: abs(beams - num_beams))
+            return statistics.median(self._samples[closest]) * num_beams / closest
+
+    def predict(self, num_beams, batch_size, output_lengths):
+        """Returns the estimated seconds to decode the batch at each of `output_lengths`."""
+        return self.step_seconds(num_beams) * batch_size * sum(output_lengths)
+
+    def plan(self, budget, batch_size, lengths, max_beams=4, safety=0.8, min_output_length=16):
+        """Returns the best-quality decoding plan predicted to finish within `budget` seconds.
+
+        The plan is the strategy name, its beam count, whether the summaries share one decode,
+        and the output lengths. Beam search is tried first, then greedy decoding, then one shared
+        greedy decode, and finally a shared greedy decode with every length shortened to fit.
+        """
+        available = budget * safety
+        longest = max(lengths.values())
+        for name, num_beams in STRATEGIES:
+            if num_beams <= max_beams and self.predict(num_beams, batch_size, lengths.values()) <= available:
+                return {"strategy": name, "num_beams": num_beams, "shared_decode": False, "lengths": dict(lengths)}
+
+        shared_cost = self.predict(1, batch_size, [longest])
+        if shared_cost <= available:
+            return {"strategy": "greedy", "num_beams": 1, "shared_decode": True, "lengths": dict(lengths)}
+        scale = available / shared_cost
+        shortened = {name: min(length, max(min_output_length, int(length * scale))) for name, length in lengths.items()}
+        return {"strategy": "greedy", "num_beams": 1, "shared_decode": True, "lengths": shortened}
@@ -1,5 +1,13 @@
-import requests
+import argparse
+import hashlib
+import json
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Define the dataset of PDF URLs
 pdf_urls = {
@@ -24,30 +32,148 @@ pdf_urls = {
 }
 
 
+# Records the ETag and checksum of every finished download so unchanged files can be skipped
+manifest_name = ".download_manifest.json"
+
+
+class DownloadManifest:
+    """Thread-safe record of downloaded files, saved next to them."""
+
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, manifest_name)
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(self.path):
+            with open(self.path) as file:
+                self.entries = json.load(file)
+
+    def get(self, name):
+        with self._lock:
+            return dict(self.entries.get(name, {}))
+
+    def update(self, name, **fields):
+        with self._lock:
+            self.entries.setdefault(name, {}).update(fields)
+            # Write to a temporary file first so a crash never leaves a half-written manifest
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as file:
+                json.dump(self.entries, file, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+def create_session(pool_size=8, retries=3):
+    """Returns a session whose connection pool and retry policy are shared by every download."""
+    retry = Retry(total=retries, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=frozenset(["GET", "HEAD"]))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _sha256_of(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def download_pdf(session, name, url, output_dir, manifest, chunk_size=1 << 16, timeout=(10, 60)):
+    """Streams one PDF to disk and returns (path, status), where status is "downloaded" or "unchanged".
+
+    A partial ".part" file left by an interrupted run is resumed with an HTTP Range request.
+    Files whose ETag or SHA-256 checksum did not change since the last run are reported as
+    "unchanged".
+    """
+    pdf_path = os.path.join(output_dir, f"{name}.pdf")
+    part_path = pdf_path + ".part"
+    entry = manifest.get(name)
+
+    headers = {}
+    if os.path.exists(pdf_path) and entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    resume_from = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    if resume_from:
+        headers["Range"] = f"bytes={resume_from}-"
+        if entry.get("partial_etag"):
+            # The server sends the whole file instead if it changed since the partial download
+            headers["If-Range"] = entry["partial_etag"]
+
+    with session.get(url, headers=headers, stream=True, timeout=timeout, allow_redirects=True) as response:
+        if response.status_code == 304:
+            return pdf_path, "unchanged"
+
+        etag = response.headers.get("ETag")
+        # 416 means the partial file already holds every byte
+        if not (resume_from and response.status_code == 416):
+            response.raise_for_status()
+            if response.status_code != 206:
+                resume_from = 0
+                manifest.update(name, partial_etag=etag)
+            with open(part_path, "ab" if resume_from else "wb") as pdf_file:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    pdf_file.write(chunk)
+        etag = etag or entry.get("partial_etag")
+
+    checksum = _sha256_of(part_path)
+    if os.path.exists(pdf_path) and entry.get("sha256") == checksum:
+        os.remove(part_path)
+        manifest.update(name, etag=etag or entry.get("etag"))
+        return pdf_path, "unchanged"
+
+    os.replace(part_path, pdf_path)
+    manifest.update(name, url=url, etag=etag, sha256=checksum, size=os.path.getsize(pdf_path), partial_etag=None)
+    return pdf_path, "downloaded"
 
-# Create a directory to save the PDFs
-output_dir = 'downloaded_pdfs'
-os.makedirs(output_dir, exist_ok=True)
 
-# Download each PDF
-for name, url in pdf_urls.items():
-    try:
-        response = requests.get(url, allow_redirects=True)
-        response.raise_for_status()  # Check if the request was successful
+def iter_downloads(urls, output_dir, max_workers=4, session=None):
+    """Downloads the PDFs concurrently and yields (name, path, status) as each one finishes.
 
-        # Define the file path for saving the PDF
-        pdf_path = os.path.join(output_dir, f"{name}.pdf")
+    Newly downloaded files can be handed to the processing pipeline while the rest are still
+    downloading.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    session = session or create_session(pool_size=max_workers)
+    manifest = DownloadManifest(output_dir)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(download_pdf, session, name, url, output_dir, manifest): name
+                   for name, url in urls.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                pdf_path, status = future.result()
+            except requests.HTTPError as e:
+                print(f"Failed to download {name}: {e}")
+                continue
+            except Exception as e:
+                print(f"An error occurred for {name}: {e}")
+                continue
+            yield name, pdf_path, status
 
-        # Write the content to a PDF file
-        with open(pdf_path, 'wb') as pdf_file:
-            pdf_file.write(response.content)
 
-        print(f"Downloaded: {name}.pdf")
+def download_all(urls, output_dir, max_workers=4):
+    """Downloads every PDF and returns the status of each one by name."""
+    statuses = {}
+    for name, _, status in iter_downloads(urls, output_dir, max_workers=max_workers):
+        statuses[name] = status
+        print(f"{'Downloaded' if status == 'downloaded' else 'Unchanged'}: {name}.pdf")
+    return statuses
 
-    except requests.HTTPError as e:
-        print(f"Failed to download {name}: {e}")
 
-    except Exception as e:
-        print(f"An error occurred for {name}: {e}")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download the PDF dataset.")
+    parser.add_argument("--output-dir", default="downloaded_pdfs", help="Directory to save the PDFs in")
+    parser.add_argument("--workers", type=int, default=4, help="Number of concurrent downloads")
+    parser.add_argument("--process", action="store_true",
+                        help="Run each newly downloaded PDF through the processing pipeline right away")
+    args = parser.parse_args()
 
-print("All downloads complete.")
+    if args.process:
+        from main import process_files
+        downloads = iter_downloads(pdf_urls, args.output_dir, max_workers=args.workers)
+        process_files(pdf_path for _, pdf_path, status in downloads if status == "downloaded")
+    else:
+        download_all(pdf_urls, args.output_dir, max_workers=args.workers)
+    print("All downloads complete.")
@@ -0,0 +1,141 @@
+# src/inference_scheduler.py
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from logger import log_info, log_error, log_exception
+
+
+class _Request:
+    def __init__(self, item, params):
+        self.item = item
+        self.params = params
+        self.future = Future()
+        self.enqueued_at = time.time()
+
+
+class InferenceScheduler:
+    """Batches inference requests from many caller threads into single model calls.
+
+    `batch_fn(items, **params)` must return one result per item, in order. Requests with the same
+    params are grouped until `max_batch_size` is reached or the oldest one has waited `max_wait`
+    seconds. `max_wait` is the throughput/latency knob: larger values form fuller batches, smaller
+    values return sooner under light load.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=8, max_wait=0.05, name="inference"):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.name = name
+        self._queue = queue.Queue()
+        self._pending = {}
+        self._thread = None
+        self._thread_lock = threading.Lock()  # Callers on many threads may start the dispatcher at once
+        self._stopping = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "batches": 0, "batch_sizes": {}, "total_queue_wait": 0.0,
+                       "max_queue_wait": 0.0}
+
+    def start(self):
+        """Starts the dispatcher thread unless it is running."""
+        with self._thread_lock:
+            if self._thread is None:
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name=f"{self.name}-scheduler", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        """Runs every queued request and stops the dispatcher thread."""
+        with self._thread_lock:
+            if self._thread is not None:
+                self._stopping.set()
+                self._queue.put(None)
+                self._thread.join()
+                self._thread = None
+
+    def submit(self, item, **params):
+        """Queues one request and returns a Future for its result."""
+        self.start()
+        request = _Request(item, params)
+        self._queue.put(request)
+        return request.future
+
+    def stats(self):
+        """Returns request, batch size and queue wait counters."""
+        with self._stats_lock:
+            stats = dict(self._stats, batch_sizes=dict(self._stats["batch_sizes"]))
+        stats["mean_batch_size"] = stats["requests"] / stats["batches"] if stats["batches"] else 0.0
+        stats["mean_queue_wait"] = stats["total_queue_wait"] / stats["requests"] if stats["requests"] else 0.0
+        return stats
+
+    def _run(self):
+        while True:
+            timeout = self._next_deadline()
+            try:
+                requests = [self._queue.get(timeout=timeout)]
+            except queue.Empty:
+                requests = []
+            # Take everything that queued up while the last batch ran before dispatching anything
+            while True:
+                try:
+                    requests.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for request in requests:
+                if request is None:
+                    continue
+                # Params may hold unhashable values (e.g. a dict of lengths), so group on their repr
+                key = repr(sorted(request.params.items()))
+                bucket = self._pending.setdefault(key, [])
+                bucket.append(request)
+                if len(bucket) >= self.max_batch_size:
+                    self._dispatch(key)
+
+            now = time.time()
+            for key, bucket in list(self._pending.items()):
+                if self._stopping.is_set() or now - bucket[0].enqueued_at >= self.max_wait:
+                    self._dispatch(key)
+
+            if self._stopping.is_set() and self._queue.empty() and not self._pending:
+                return
+
+    def _next_deadline(self):
+        if not self._pending:
+            return None
+        oldest = min(bucket[0].enqueued_at for bucket in self._pending.values())
+        return max(0.0, oldest + self.max_wait - time.time())
+
+    def _dispatch(self, key):
+        batch = self._pending.pop(key)
+        started_at = time.time()
+        waits = [started_at - request.enqueued_at for request in batch]
+        with self._stats_lock:
+            self._stats["requests"] += len(batch)
+            self._stats["batches"] += 1
+            self._stats["batch_sizes"][len(batch)] = self._stats["batch_sizes"].get(len(batch), 0) + 1
+            self._stats["total_queue_wait"] += sum(waits)
+            self._stats["max_queue_wait"] = max(self._stats["max_queue_wait"], max(waits))
+
+        try:
+            results = self.batch_fn([request.item for request in batch], **batch[0].params)
+        except Exception as e:
+            log_exception(e)
+            for request in batch:
+                request.future.set_exception(e)
+            return
+        if len(results) != len(batch):
+            # Requests left without a result would never resolve
+            error = RuntimeError(f"{self.name} batch_fn returned {len(results)} results for {len(batch)} requests")
+            log_error(str(error))
+            for request in batch:
+                request.future.set_exception(error)
+            return
+
+        for request, result in zip(batch, results):
+            request.future.set_result(result)
+        log_info(f"{self.name} batch of {len(batch)} ran in {time.time() - started_at:.2f} seconds "
+                 f"(max queue wait {max(waits):.3f} seconds)")
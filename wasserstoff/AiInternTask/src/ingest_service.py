@@ -0,0 +1,336 @@
+# src/ingest_service.py
+import json
+import os
+import signal
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from logger import log_info, log_error, log_exception
+from metrics import sink
+
+# Work item states: claimed items are "running", processed ones are "persisted" until the outputs they
+# wrote are flushed, and then "done". Items that failed max_attempts times are "failed".
+PENDING = "pending"
+RUNNING = "running"
+PERSISTED = "persisted"
+DONE = "done"
+FAILED = "failed"
+STATES = (PENDING, RUNNING, PERSISTED, DONE, FAILED)
+
+
+class WorkQueue:
+    """Durable queue of PDF work items in SQLite.
+
+    A file is one item, identified by its path, size and modification time; a file that changes
+    after it was processed is queued again. Failed items are retried `max_attempts` times with a
+    delay that doubles from `retry_delay` seconds. Items left running or persisted by a crash go
+    back to pending when the queue is recovered, so processing resumes where it stopped.
+    """
+
+    def __init__(self, path, max_attempts=3, retry_delay=30.0):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS items (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    path TEXT NOT NULL UNIQUE,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    state TEXT NOT NULL,
+                    status TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    available_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )""")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS items_state ON items (state, available_at)")
+
+    def enqueue(self, path, size, mtime):
+        """Queues a file unless it is already queued with the same size and modification time.
+
+        Returns True if the file was queued.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT size, mtime FROM items WHERE path = ?", (path,)).fetchone()
+            if row is not None and tuple(row) == (size, mtime):
+                return False
+            self._conn.execute("""
+                INSERT INTO items (path, size, mtime, state, available_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (path) DO UPDATE SET size = excluded.size, mtime = excluded.mtime,
+                    state = excluded.state, status = NULL, attempts = 0, last_error = NULL,
+                    available_at = excluded.available_at, updated_at = excluded.updated_at""",
+                               (path, size, mtime, PENDING, now, now))
+        return True
+
+    def claim(self):
+        """Marks the oldest pending item that is due as running and returns (id, path, attempt), or None."""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("""
+                SELECT id, path, attempts FROM items WHERE state = ? AND available_at <= ?
+                ORDER BY available_at, id LIMIT 1""", (PENDING, now)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE items SET state = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                               (RUNNING, now, row[0]))
+        return row[0], row[1], row[2] + 1
+
+    def persisted(self, item_id, status):
+        """Marks a running item as processed; it is done once its outputs are committed."""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE items SET state = ?, status = ?, updated_at = ? WHERE id = ?",
+                               (PERSISTED, status, time.time(), item_id))
+
+    def fail(self, item_id, error):
+        """Records a failed attempt and returns True if the item will be retried."""
+        now = time.time()
+        with self._lock, self._conn:
+            attempts = self._conn.execute("SELECT attempts FROM items WHERE id = ?", (item_id,)).fetchone()[0]
+            retry = attempts < self.max_attempts
+            self._conn.execute("""
+                UPDATE items SET state = ?, status = 'error', last_error = ?, available_at = ?, updated_at = ?
+                WHERE id = ?""", (PENDING if retry else FAILED, str(error),
+                                  now + self.retry_delay * 2 ** (attempts - 1), now, item_id))
+        return retry
+
+    def persisted_ids(self):
+        """Returns the ids of the items whose outputs are waiting to be committed."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT id FROM items WHERE state = ?", (PERSISTED,))]
+
+    def mark_done(self, item_ids):
+        """Marks persisted items as done once their outputs are committed."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE items SET state = ?, updated_at = ? WHERE id = ? AND state = ?",
+                                   [(DONE, now, item_id, PERSISTED) for item_id in item_ids])
+
+    def recover(self):
+        """Puts the items a crash left running or uncommitted back to pending and returns how many there were."""
+        with self._lock, self._conn:
+            return self._conn.execute("UPDATE items SET state = ?, updated_at = ? WHERE state IN (?, ?)",
+                                      (PENDING, time.time(), RUNNING, PERSISTED)).rowcount
+
+    def counts(self):
+        """Returns the number of items in each state."""
+        with self._lock:
+            rows = dict(self._conn.execute("SELECT state, COUNT(*) FROM items GROUP BY state").fetchall())
+        return {state: rows.get(state, 0) for state in STATES}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class IngestService:
+    """Long-running ingestion of the PDFs that appear in a set of folders.
+
+    A scanner thread queues every PDF in `folders` that has not changed for `settle_seconds`
+    (so files still being copied are left alone), and `workers` threads take items from the
+    queue and run `process_fn(pdf_path)`, which returns (status, error) like main.process_pdf.
+    Every `commit_interval` seconds `commit_fn` flushes the buffered outputs, and only then are
+    the items processed before the flush marked done. `stop` drains the service: no new items
+    are taken, the ones in progress finish, and their outputs are committed.
+    """
+
+    def __init__(self, folders, work_queue, process_fn, commit_fn, workers=2, scan_interval=5.0,
+                 settle_seconds=2.0, commit_interval=5.0, poll_interval=0.5):
+        self.folders = list(folders)
+        self.queue = work_queue
+        self.process_fn = process_fn
+        self.commit_fn = commit_fn
+        self.workers = workers
+        self.scan_interval = scan_interval
+        self.settle_seconds = settle_seconds
+        self.commit_interval = commit_interval
+        self.poll_interval = poll_interval
+        self._stopping = threading.Event()
+        self._threads = []
+        self._stats_lock = threading.Lock()
+        self._commit_lock = threading.Lock()
+        self._stats = {"queued": 0, "processed": 0, "failed_attempts": 0, "retries": 0, "failed": 0, "committed": 0,
+                       "commit_errors": 0, "inflight": 0, "processing_time": 0.0}
+        self._started_at = None
+        self._last_commit_at = None
+
+    def scan(self):
+        """Queues the settled PDFs in the watched folders and returns how many were new or changed."""
+        queued = 0
+        now = time.time()
+        for folder in self.folders:
+            try:
+                entries = sorted(os.scandir(folder), key=lambda entry: entry.name)
+            except OSError as e:
+                log_error(f"Cannot scan {folder}: {e}")
+                continue
+            for entry in entries:
+                if not entry.name.lower().endswith(".pdf") or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                if now - stat.st_mtime < self.settle_seconds:
+                    continue  # Picked up by a later scan, once it is no longer being written
+                queued += self.queue.enqueue(os.path.abspath(entry.path), stat.st_size, stat.st_mtime)
+        if queued:
+            self._count("queued", queued)
+            log_info(f"Queued {queued} new or changed PDFs")
+        return queued
+
+    def process_next(self):
+        """Processes the next due item, if any, and returns True if there was one."""
+        item = self.queue.claim()
+        if item is None:
+            return False
+        item_id, pdf_path, attempt = item
+        self._count("inflight")
+        start_time = time.time()
+        try:
+            status, error = self.process_fn(pdf_path)
+        except Exception as e:
+            status, error = "error", e
+        finally:
+            self._count("inflight", -1)
+            self._count("processing_time", time.time() - start_time)
+
+        if status == "error":
+            self._count("failed_attempts")
+            retry = self.queue.fail(item_id, error)
+            self._count("retries" if retry else "failed")
+            log_error(f"Attempt {attempt} at {pdf_path} failed{', will retry' if retry else ', giving up'}: {error}")
+        else:
+            self.queue.persisted(item_id, status)
+            self._count("processed")
+        return True
+
+    def commit(self):
+        """Flushes the outputs of the processed items and marks them done; returns how many were committed."""
+        with self._commit_lock:
+            # Items processed while the flush runs wait for the next commit
+            item_ids = self.queue.persisted_ids()
+            try:
+                # The writers keep whatever they failed to write buffered and raise, so these items stay
+                # persisted until a later flush has written their outputs
+                self.commit_fn()
+            except Exception as e:
+                self._count("commit_errors")
+                log_exception(e)
+                return 0
+            self.queue.mark_done(item_ids)
+            self._last_commit_at = time.time()
+        if item_ids:
+            self._count("committed", len(item_ids))
+            sink.emit("ingest", **self.health())
+        return len(item_ids)
+
+    def start(self):
+        """Recovers the queue and starts the scanner, worker and commit threads."""
+        recovered = self.queue.recover()
+        if recovered:
+            log_info(f"Resuming {recovered} PDFs that were in progress when the service last stopped")
+        self._stopping.clear()
+        self._started_at = time.time()
+        self._threads = [threading.Thread(target=self._scan_loop, name="ingest-scanner", daemon=True),
+                         threading.Thread(target=self._commit_loop, name="ingest-commit", daemon=True)]
+        self._threads += [threading.Thread(target=self._work_loop, name=f"ingest-{i}", daemon=True)
+                          for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+        log_info(f"Watching {', '.join(self.folders)} with {self.workers} workers")
+
+    def stop(self, timeout=None):
+        """Drains the service: stops taking items, waits for the ones in progress and commits their outputs."""
+        log_info("Draining the ingestion service")
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self.commit()
+        health = self.health()
+        sink.emit("ingest", **health)
+        log_info(f"Ingestion service stopped: {health}")
+        return health
+
+    def run(self):
+        """Runs until SIGINT or SIGTERM, then drains and returns the final counters.
+
+        Must be called from the main thread.
+        """
+        stop = threading.Event()
+        previous = {signum: signal.signal(signum, lambda signum, frame: stop.set())
+                    for signum in (signal.SIGINT, signal.SIGTERM)}
+        self.start()
+        try:
+            while not stop.wait(1.0):
+                pass
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+        return self.stop()
+
+    def health(self):
+        """Returns the queue and throughput counters."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        if self._threads and not self._stopping.is_set():
+            status = "running"
+        elif any(thread.is_alive() for thread in self._threads):
+            status = "draining"
+        else:
+            status = "stopped"
+        uptime = time.time() - self._started_at if self._started_at else 0.0
+        stats.update(status=status, uptime=uptime, queue=self.queue.counts(), last_commit_at=self._last_commit_at,
+                     documents_per_minute=stats["processed"] / uptime * 60 if uptime else 0.0)
+        return stats
+
+    def _scan_loop(self):
+        while not self._stopping.is_set():
+            try:
+                self.scan()
+            except Exception as e:
+                log_exception(e)
+            self._stopping.wait(self.scan_interval)
+
+    def _work_loop(self):
+        while not self._stopping.is_set():
+            try:
+                busy = self.process_next()
+            except Exception as e:  # The queue itself failed; back off instead of spinning
+                log_exception(e)
+                busy = False
+            if not busy:
+                self._stopping.wait(self.poll_interval)
+
+    def _commit_loop(self):
+        while not self._stopping.wait(self.commit_interval):
+            self.commit()
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+
+def make_health_server(service, host="127.0.0.1", port=8766):
+    """Returns an HTTP server answering GET /health with the service's counters as JSON."""
+
+    class HealthHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/health":
+                self.send_error(404)
+                return
+            health = service.health()
+            body = json.dumps(health).encode()
+            self.send_response(200 if health["status"] == "running" else 503)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), HealthHandler)
@@ -0,0 +1,171 @@
+# src/keybert_keywords.py
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Sentence-transformer that KeyBERT() loads by default; cached embeddings are only valid for it
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def mmr(document_similarity, candidate_vectors, top_n, diversity):
+    """Returns the indices of `top_n` candidates picked by maximal marginal relevance.
+
+    Each pick maximizes (1 - diversity) * similarity to the document minus diversity * the
+    highest similarity to an already picked candidate. `candidate_vectors` must be normalized.
+    """
+    top_n = min(top_n, len(document_similarity))
+    if top_n == 0:
+        return []
+    candidate_similarity = candidate_vectors @ candidate_vectors.T
+    selected = [int(np.argmax(document_similarity))]
+    redundancy = candidate_similarity[selected[0]].copy()
+    for _ in range(top_n - 1):
+        scores = (1 - diversity) * document_similarity - diversity * redundancy
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        np.maximum(redundancy, candidate_similarity[best], out=redundancy)
+    return selected
+
+
+class EmbeddingCache:
+    """Bounded LRU of candidate-phrase embeddings that can be saved to and loaded from disk."""
+
+    def __init__(self, max_entries=100000, model_name=DEFAULT_EMBEDDING_MODEL):
+        self.max_entries = max_entries
+        self.model_name = model_name
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every put, so that unchanged caches are not saved again
+        self._generation = 0
+        self._saved_generation = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def dirty(self):
+        """Whether embeddings were cached since the last save or load."""
+        return self._generation != self._saved_generation
+
+    def get_many(self, phrases):
+        """Returns {phrase: embedding} for the cached phrases and the list of phrases that are not cached."""
+        found = {}
+        missing = []
+        with self._lock:
+            for phrase in phrases:
+                vector = self._entries.get(phrase)
+                if vector is None:
+                    missing.append(phrase)
+                else:
+                    self._entries.move_to_end(phrase)
+                    found[phrase] = vector
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing
+
+    def put_many(self, phrases, vectors):
+        """Caches the embeddings and evicts the least recently used ones over `max_entries`."""
+        with self._lock:
+            for phrase, vector in zip(phrases, vectors):
+                self._entries[phrase] = vector
+                self._entries.move_to_end(phrase)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._generation += 1
+
+    def save(self, path):
+        """Writes the cached embeddings to `path`, least recently used first, replacing it atomically."""
+        with self._lock:
+            phrases = np.array(list(self._entries), dtype=str)
+            vectors = np.array(list(self._entries.values()), dtype=np.float32)
+            generation = self._generation
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as file:
+            np.savez(file, phrases=phrases, vectors=vectors, model_name=self.model_name)
+        os.replace(tmp_path, path)
+        self._saved_generation = generation
+
+    @classmethod
+    def load(cls, path, max_entries=100000, model_name=DEFAULT_EMBEDDING_MODEL):
+        """Returns the cache saved at `path`, or an empty one if there is none for `model_name`."""
+        cache = cls(max_entries=max_entries, model_name=model_name)
+        if not os.path.exists(path):
+            return cache
+        with np.load(path) as state:
+            if str(state["model_name"]) != model_name:
+                return cache
+            cache.put_many(state["phrases"].tolist(), state["vectors"])
+        cache._saved_generation = cache._generation
+        return cache
+
+
+class BatchKeywordExtractor:
+    """KeyBERT-style keyword extraction over a batch of documents.
+
+    The candidate phrases of every document in the batch are collected once, the documents and
+    the phrases missing from the embedding cache are embedded in shared `embed_fn` calls, and
+    candidates are ranked by cosine similarity to their document (or picked with MMR when
+    `use_mmr` is set) with matrix products. `embed_fn(texts)` must return one vector per text.
+    """
+
+    def __init__(self, embed_fn, cache=None, ngram_range=(1, 1), stop_words="english", use_mmr=False,
+                 diversity=0.5):
+        self.embed_fn = embed_fn
+        self.cache = cache if cache is not None else EmbeddingCache()
+        self.ngram_range = ngram_range
+        self.stop_words = stop_words
+        self.use_mmr = use_mmr
+        self.diversity = diversity
+
+    def _candidates(self, texts):
+        # One vectorizer pass over the batch; its vocabulary is the de-duplicated candidate set
+        from sklearn.feature_extraction.text import CountVectorizer
+        vectorizer = CountVectorizer(ngram_range=self.ngram_range, stop_words=self.stop_words)
+        try:
+            counts = vectorizer.fit_transform(texts).tocsr()
+        except ValueError:  # Every text was empty or only stop words
+            return [], [np.zeros(0, dtype=np.int64) for _ in texts]
+        counts.sort_indices()
+        return vectorizer.get_feature_names_out().tolist(), np.split(counts.indices, counts.indptr[1:-1])
+
+    def _embed(self, phrases, texts):
+        # The documents and the phrases missing from the cache go through the model in one call
+        found, missing = self.cache.get_many(phrases)
+        vectors = _normalize(self.embed_fn(missing + list(texts)))
+        missing_vectors = vectors[:len(missing)].copy()  # Cached rows must not keep the whole batch alive
+        self.cache.put_many(missing, missing_vectors)
+        found.update(zip(missing, missing_vectors))
+        candidate_vectors = np.stack([found[phrase] for phrase in phrases]) if phrases else vectors[:0]
+        return candidate_vectors, vectors[len(missing):]
+
+    def extract_keywords(self, texts, top_n=5):
+        """Returns the `top_n` keywords of each text, best first."""
+        phrases, columns = self._candidates(texts)
+        candidate_vectors, document_vectors = self._embed(phrases, texts)
+
+        keywords = []
+        for document_vector, document_columns in zip(document_vectors, columns):
+            if len(document_columns) == 0:
+                keywords.append([])
+                continue
+            vectors = candidate_vectors[document_columns]
+            similarity = vectors @ document_vector
+            if self.use_mmr:
+                top = mmr(similarity, vectors, top_n, self.diversity)
+            else:
+                top = np.argpartition(-similarity, top_n - 1)[:top_n] if len(similarity) > top_n \
+                    else np.arange(len(similarity))
+                top = top[np.argsort(-similarity[top], kind="stable")]
+            keywords.append([phrases[document_columns[index]] for index in top])
+        return keywords
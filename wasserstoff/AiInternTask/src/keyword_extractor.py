@@ -1,8 +1,8 @@
 # keyword_extractor.py
-from keybert import KeyBERT
+from model_registry import registry
 
-def extract_keywords(content):
+def extract_keywords(content, top_n=5):
     """Extracts keywords from the provided text content."""
-    model = KeyBERT()
-    keywords = model.extract_keywords(content, top_n=5)
+    with registry.use("keybert") as model:
+        keywords = model.extract_keywords(content, top_n=top_n)
     return [kw[0] for kw in keywords]
@@ -1,12 +1,14 @@
 import logging
+import os
 from logging.handlers import RotatingFileHandler
 
 # Set up logging configuration
 log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-log_file = "pipeline.log"
+log_file = os.environ.get("PIPELINE_LOG_PATH", "pipeline.log")
 
-# Create a rotating file handler
-handler = RotatingFileHandler(log_file, maxBytes=5 * 1024 * 1024, backupCount=5)  # 5 MB per file, keep 5 backups
+# Create a rotating file handler (5 MB per file, keep 5 backups); the file is only opened once
+# something is logged
+handler = RotatingFileHandler(log_file, maxBytes=5 * 1024 * 1024, backupCount=5, delay=True)
 handler.setFormatter(log_formatter)
 
 # Create a logger and set the level
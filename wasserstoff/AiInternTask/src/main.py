@@ -1,18 +1,31 @@
-import fitz  # PyMuPDF
+import json
 import os
+import threading
 import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 import psutil  # To measure memory usage
-from transformers import T5Tokenizer, T5ForConditionalGeneration
-from concurrent.futures import ThreadPoolExecutor
+import concurrency  # Staged extract -> infer -> persist executor
+from admission import AdmissionController  # Cost-based, memory-aware admission of PDFs into the pipeline
 from keyword_extractor import extract_keywords  # Import the keyword extractor
-from src.mongodb_handler import insert_mongodb  # Import MongoDB handler functions
-from pymongo import MongoClient  # Import MongoClient
+from pdf_text import iter_page_text, iter_page_layout, iter_budgeted_pages, extract_text_from_pdf, count_words
+from page_store import get_page_store  # Extracted page texts, so unchanged PDFs are never parsed twice
+from triage import triage_pdf, time_limit  # Routes scanned, encrypted, corrupt and trivial PDFs around the models
+from near_duplicates import NearDuplicateIndex, minhash_signature  # Reuses the results of near-identical PDFs
+from metrics import sink  # Structured per-stage metrics
+from summarization import summarize_batch_multi_length, summarize_hierarchical, SUMMARY_LENGTHS
+from inference_scheduler import InferenceScheduler
+from decoding import DecodeCostModel, strategy_name  # Picks beam search or greedy decoding to meet a latency budget
+from result_cache import ResultCache, hash_file
+from search_index import SearchIndex  # On-disk BM25 index over pages, summaries and keywords
+from model_registry import registry, SUMMARIZER_BACKENDS  # Shared, lazily loaded models
+from mongodb_handler import get_client, get_writer  # Shared MongoDB connection pool and bulk writer
 from logger import log_info, log_error, log_debug, log_warning, log_exception
 
 # Connect to MongoDB
 def connect_to_mongodb(uri="mongodb://localhost:27017/", db_name="your_database_name"):
     """Connect to MongoDB and return the database."""
-    client = MongoClient(uri)
+    client = get_client(uri)  # Reuses the pipeline's connection pool
     return client[db_name]  # Return the database object
 
 
@@ -30,154 +43,714 @@ def print_mongodb_documents(db, collection_name):
             print(f"{key}: {value}")
 
 
-# Function to extract text from a PDF file
-def extract_text_from_pdf(pdf_path):
-    doc = fitz.open(pdf_path)  # Open the PDF
-    text = ""
-    for page_num in range(doc.page_count):
-        page = doc.load_page(page_num)  # Load each page
-        text += page.get_text("text")  # Extract text from page
-    return text
+# Pre-trained T5 model, loaded once through the model registry. The backend decides how it runs:
+# "fp32" as published, "int8" with dynamically quantized linear layers, or "onnx" as an exported,
+# graph-optimized ONNX Runtime model that decodes with a KV cache (needs optimum[onnxruntime])
+summary_backend = "fp32"
+
+
+def summary_model_name():
+    """Returns the registry name of the T5 model for the configured backend."""
+    return SUMMARIZER_BACKENDS[summary_backend]
+
+
+# Only the first characters of each PDF are summarized, so extraction stops reading pages once it has them
+summary_input_chars = 2000
+summary_page_sample = "head"  # "spread" samples pages from across the whole document instead
+
+summary_num_beams = 4
+# Seconds a document's summaries may take (None: no deadline, always summary_num_beams). With a budget,
+# the decoding strategy and output lengths come from decode_cost_model, which is calibrated on the
+# batches timed so far, and generation stops at the deadline with the best partial summaries
+summary_latency_budget = None
+decode_cost_model = DecodeCostModel()
+
+# "hierarchical" summarizes long documents chunk by chunk and then summarizes the chunk summaries,
+# instead of truncating them to summary_input_chars
+summary_mode = "truncate"
+hierarchical_input_chars = 400000  # Extraction budget for hierarchical mode
+hierarchical_max_depth = 2
+hierarchical_max_chunks = 32  # Caps the chunk summaries generated per document
+keyword_top_n = 5
+
+# "keybert" ranks candidate phrases with a sentence-transformer; "tfidf" is model-free and scores each
+# document against the document frequencies of every PDF processed so far, kept in keyword_state_path
+keyword_mode = "keybert"
+keyword_state_path = "tfidf_state.npz"
+_keyword_engine = None
+_keyword_engine_lock = threading.Lock()
+# "keybert-batch" ranks candidates with KeyBERT's model too, but batches documents from all worker threads
+# and keeps candidate-phrase embeddings in an LRU cache saved to keyword_embedding_cache_path
+keyword_batch_size = 8
+keyword_embedding_cache_path = "keyword_embeddings.npz"
+keyword_embedding_cache_entries = 100000
+_batch_keyword_extractor = None
+
+# Every processed PDF is added to this on-disk search index; None turns indexing off
+search_index_path = "search_index"
+search_index_flush_documents = 100  # Documents buffered per index segment
+search_index_merge_factor = 10  # Segments of about the same size that are merged into one
+_search_index = None
+_search_index_lock = threading.Lock()
+
+# Page texts of every parsed PDF are kept in this store, keyed by the PDF's hash, so later runs with
+# other summary or keyword settings read them instead of parsing the PDF again; None turns it off
+page_store_path = "page_store"
+
+# A PDF whose summary input is at least near_duplicate_threshold similar (estimated Jaccard similarity of
+# its word shingles) to that of an already processed PDF reuses that PDF's summaries and keywords instead
+# of running inference; a threshold of None turns the lookup off
+near_duplicate_threshold = 0.9
+near_duplicate_index_path = "near_duplicates.idx"
+_near_duplicate_index = None
+_near_duplicate_lock = threading.Lock()
+
+# Every PDF that is neither cached nor stored is triaged from its metadata and first pages before any
+# model runs, and its category picks the route: "process" runs the whole pipeline, "fast" uses the text
+# itself as every summary without loading a model, "queue" lists the PDF in triage_queue_path (e.g. for
+# OCR) and "skip" only records it
+triage_routes = {"text": "process", "trivial": "fast", "scanned": "queue", "encrypted": "skip", "corrupt": "skip",
+                 "empty": "skip"}
+triage_sample_pages = 3
+triage_queue_path = "triage_queue.jsonl"
+_triage_lock = threading.Lock()
+_triage_counts = {}
+# Seconds a PDF may spend in extraction (None: no limit). The extraction worker stops itself at the limit;
+# a worker stuck in native code is replaced once twice the limit has passed
+document_timeout = 120
+
+# PDFs are admitted largest first while their estimated memory fits under the budget (bytes; None
+# only keeps admission_memory_reserve of system memory free) and the CPU has room
+admission_memory_budget = None
+admission_memory_reserve = 0.15
+admission_cpu_budget = 90.0
+admission_lookahead = 16  # Upcoming PDFs estimated and ordered at a time
+
+# Summaries from all worker threads are batched into shared generate() calls
+summary_batch_size = 4
+summary_max_wait = 0.05  # Seconds a request may wait for a fuller batch
+
+# Results of unchanged PDFs are reused from this cache as long as the settings above stay the same
+result_cache_path = "result_cache.sqlite"
+result_cache_max_entries = 10000
+_result_cache = None
+_result_cache_pid = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """Opens the result cache on first use in each process."""
+    global _result_cache, _result_cache_pid
+    with _result_cache_lock:
+        # SQLite connections must not be shared with forked extraction workers
+        if _result_cache is not None and _result_cache_pid == os.getpid():
+            return _result_cache
+        settings = {
+            "model": summary_model_name(),
+            "num_beams": summary_num_beams,
+            "latency_budget": summary_latency_budget,
+            "lengths": SUMMARY_LENGTHS,
+            "mode": summary_mode,
+            "input_chars": summary_input_chars if summary_mode == "truncate" else hierarchical_input_chars,
+            "hierarchical": [hierarchical_max_depth, hierarchical_max_chunks],
+            "page_sample": summary_page_sample,
+            "keyword_model": keyword_mode,
+            "top_n": keyword_top_n,
+            "triage": triage_routes,
+        }
+        _result_cache = ResultCache(result_cache_path, settings, max_entries=result_cache_max_entries)
+        _result_cache_pid = os.getpid()
+        return _result_cache
+
+
+def get_keyword_engine():
+    """Loads the corpus-wide TF-IDF keyword engine on first use."""
+    global _keyword_engine
+    with _keyword_engine_lock:
+        if _keyword_engine is None:
+            from tfidf_keywords import TfidfKeywordEngine  # scikit-learn is only needed in tfidf mode
+            _keyword_engine = TfidfKeywordEngine.load(keyword_state_path)
+        return _keyword_engine
+
+
+def get_search_index():
+    """Opens the search index on first use."""
+    global _search_index
+    with _search_index_lock:
+        if _search_index is None:
+            _search_index = SearchIndex(search_index_path, flush_documents=search_index_flush_documents,
+                                        merge_factor=search_index_merge_factor)
+        return _search_index
+
+
+def get_near_duplicate_index():
+    """Loads the near-duplicate index on first use."""
+    global _near_duplicate_index
+    with _near_duplicate_lock:
+        if _near_duplicate_index is None:
+            _near_duplicate_index = NearDuplicateIndex(near_duplicate_index_path, threshold=near_duplicate_threshold)
+        return _near_duplicate_index
+
+
+def reuse_near_duplicate(pdf_name, pdf_hash, signature):
+    """Returns the cached results of an already processed near-duplicate of the PDF, or None."""
+    with sink.stage(pdf_name, "near_duplicate") as event:
+        match = get_near_duplicate_index().query(signature)
+        results = get_result_cache().get(match[0]) if match is not None else None
+        event.update(match=match[0] if match else None, similarity=match[1] if match else None,
+                     reused=results is not None)
+    if results is None:
+        # No match, or its results were evicted or made with other settings
+        return None
+    log_info(f"Reusing the results of near-duplicate {results.get('name', match[0])} ({match[1]:.2f} similar) "
+             f"for {pdf_name}")
+    results = dict(results, name=pdf_name, near_duplicate_of=match[0], similarity=match[1])
+    get_result_cache().put(pdf_hash, results)
+    return results
+
+
+def embed_with_keybert(texts):
+    """Embeds texts in batches with KeyBERT's sentence-transformer."""
+    with registry.use("keybert") as model:
+        return model.model.embed(texts)
+
+
+def get_batch_keyword_extractor():
+    """Loads the batched KeyBERT extractor and its saved embedding cache on first use."""
+    global _batch_keyword_extractor
+    with _keyword_engine_lock:
+        if _batch_keyword_extractor is None:
+            from keybert_keywords import BatchKeywordExtractor, EmbeddingCache
+            cache = EmbeddingCache.load(keyword_embedding_cache_path, max_entries=keyword_embedding_cache_entries)
+            _batch_keyword_extractor = BatchKeywordExtractor(embed_with_keybert, cache=cache)
+        return _batch_keyword_extractor
+
+
+def extract_keywords_batch(texts, top_n):
+    """Extracts the keywords of a batch of documents in shared forward passes."""
+    with sink.stage(None, "keyword_batch", batch_size=len(texts)) as event:
+        extractor = get_batch_keyword_extractor()
+        keywords = extractor.extract_keywords(texts, top_n=top_n)
+        event.update(cache_hits=extractor.cache.hits, cache_misses=extractor.cache.misses)
+    return keywords
+
+
+keyword_scheduler = InferenceScheduler(extract_keywords_batch, max_batch_size=keyword_batch_size,
+                                       max_wait=summary_max_wait, name="keywords")
+
+
+def extract_document_keywords(text):
+    """Extracts the keywords of one document with the configured keyword mode."""
+    if keyword_mode == "tfidf":
+        return get_keyword_engine().extract_keywords([text], top_n=keyword_top_n)[0]
+    if keyword_mode == "keybert-batch":
+        return keyword_scheduler.submit(text, top_n=keyword_top_n).result()
+    return extract_keywords(text, top_n=keyword_top_n)
+
+
+def summarize_batch(requests, lengths, latency_budget=None):
+    """Summarizes a batch of documents at every requested length with the shared T5 model.
+
+    `requests` are (text, deadline) pairs, with the deadline set when the document was submitted
+    so that time spent queued counts against its latency budget; the batch is planned for, and
+    stopped at, the earliest deadline. Returns one (summaries, timings, decoding) triple per text;
+    `decoding` records the strategy, beam count and output lengths used and whether the deadline
+    cut generation short.
+    """
+    texts = [text for text, _ in requests]
+    deadlines = [deadline for _, deadline in requests if deadline is not None]
+    start_time = time.time()
+    if latency_budget is None or not deadlines:
+        plan = {"strategy": strategy_name(summary_num_beams), "num_beams": summary_num_beams, "shared_decode": False,
+                "lengths": dict(lengths)}
+        deadline = None
+    else:
+        deadline = min(deadlines)
+        plan = decode_cost_model.plan(max(deadline - start_time, 0.0), len(texts), lengths,
+                                      max_beams=summary_num_beams)
+    with sink.stage(None, "summary_batch", batch_size=len(texts), lengths=lengths, strategy=plan["strategy"],
+                    num_beams=plan["num_beams"], latency_budget=latency_budget) as event:
+        with registry.use(summary_model_name()) as (model, tokenizer):
+            results = summarize_batch_multi_length(texts, model, tokenizer, lengths=plan["lengths"],
+                                                   num_beams=plan["num_beams"], shared_decode=plan["shared_decode"],
+                                                   deadline=deadline)
+        deadline_hit = deadline is not None and time.time() >= deadline
+        event.update(tokens=sum(count_words(text) for text in texts), deadline_hit=deadline_hit)
+
+    # Batches cut short by their deadline would make the strategy look faster than it is
+    if not deadline_hit:
+        decoded = [max(plan["lengths"].values())] if plan["shared_decode"] else plan["lengths"].values()
+        decode_cost_model.record(plan["num_beams"], len(texts), sum(decoded), sum(results[0][1].values()))
+    decoding = dict(plan, deadline_hit=deadline_hit)
+    return [(summaries, timings, decoding) for summaries, timings in results]
+
+
+summary_scheduler = InferenceScheduler(summarize_batch, max_batch_size=summary_batch_size,
+                                       max_wait=summary_max_wait, name="summarization")
+
+
+def summarize_through_scheduler(texts, lengths, latency_budget=None, deadline=None):
+    """Submits every text to the summarization scheduler at once so they share batches.
+
+    Requests only share a batch with requests of the same latency budget. The deadline, by default
+    `latency_budget` seconds from now, travels with each request, so the time it waits in the
+    scheduler's queue is part of its budget.
+    """
+    if deadline is None and latency_budget is not None:
+        deadline = time.time() + latency_budget
+    futures = [summary_scheduler.submit((text, deadline), lengths=lengths, latency_budget=latency_budget)
+               for text in texts]
+    return [future.result() for future in futures]
+
+
+def summarize_document(text, latency_budget=None):
+    """Summarizes one document at every length in SUMMARY_LENGTHS, using the configured summary_mode.
+
+    Returns the summaries, their timings and the decoding used for them (see `summarize_batch`).
+    `latency_budget` defaults to summary_latency_budget.
+    """
+    latency_budget = summary_latency_budget if latency_budget is None else latency_budget
+    if summary_mode == "hierarchical":
+        deadline = None if latency_budget is None else time.time() + latency_budget
+        decodings = []
+
+        def summarize_level(texts, lengths):
+            # Every level works to the document's deadline, so each gets what is left of the budget
+            results = summarize_through_scheduler(texts, lengths, latency_budget=latency_budget, deadline=deadline)
+            decodings.append(results[0][2])
+            return [(summaries, timings) for summaries, timings, _ in results]
+
+        _, tokenizer = registry.get(summary_model_name())
+        summaries, timings = summarize_hierarchical(text, tokenizer, summarize_level, lengths=SUMMARY_LENGTHS,
+                                                    max_depth=hierarchical_max_depth,
+                                                    max_chunks=hierarchical_max_chunks)
+        return summaries, timings, decodings[-1]
+    return summarize_through_scheduler([text], SUMMARY_LENGTHS, latency_budget=latency_budget)[0]
+
+
+# Stream PDFs through the extract, inference and persist stages without waiting on batch barriers
+def process_files(pdf_paths, extract_workers=2, infer_workers=summary_batch_size, persist_workers=1, queue_size=4):
+    """Processes PDF files through a pipelined executor with one worker pool per stage.
+
+    `pdf_paths` may be any iterable, including one that yields files as they finish downloading.
+    """
+    start_time = time.time()
+    _triage_counts.clear()
+    admission = AdmissionController(memory_budget=admission_memory_budget, reserve_fraction=admission_memory_reserve,
+                                    cpu_budget=admission_cpu_budget, lookahead=admission_lookahead)
+    # Inference threads only hand work to the summarization scheduler, so there are enough of
+    # them to fill one batch
+    pipeline = concurrency.StagedPipeline(extract_stage, infer_stage, persist_and_log_stage,
+                                          extract_workers=extract_workers, infer_workers=infer_workers,
+                                          persist_workers=persist_workers, queue_size=queue_size,
+                                          on_error=handle_stage_error, admission=admission,
+                                          extract_timeout=document_timeout * 2 if document_timeout else None)
+    stats = pipeline.run(pdf_paths)
+
+    flush_outputs()
+    log_info(f"MongoDB writer stats: {get_writer().stats()}")
+    total_time = time.time() - start_time
+    log_info(f"Total time for processing {stats['submitted']} PDFs: {total_time:.2f} seconds ({stats})")
+    log_info(f"Admission stats: {admission.stats()}")
+    log_info(f"Triage counts: {_triage_counts}")
+    sink.emit("run", wall_time=total_time, scheduler=summary_scheduler.stats(), admission=admission.stats(),
+              triage=dict(_triage_counts), **stats)
+    return stats
+
+
+def flush_outputs():
+    """Writes everything the pipeline buffers or keeps in memory for the processed PDFs."""
+    # Write whatever is still buffered for MongoDB
+    get_writer().flush()
+    # Write the documents still buffered for the search index
+    if _search_index is not None:
+        _search_index.flush()
+    # Keep the document frequencies for the next run, unless nothing changed since they were last saved
+    if _keyword_engine is not None and _keyword_engine.dirty:
+        _keyword_engine.save(keyword_state_path)
+    # Keep the phrase embeddings for the next run, which is the costly one to rewrite for a large cache
+    if _batch_keyword_extractor is not None and _batch_keyword_extractor.cache.dirty:
+        _batch_keyword_extractor.cache.save(keyword_embedding_cache_path)
+
+
+def run_parallel_pipeline(folder_path, **stage_options):
+    """Processes every PDF file in the folder."""
+    pdf_files = [f for f in os.listdir(folder_path) if f.endswith('.pdf')]
+    log_info(f"Found {len(pdf_files)} PDF files in {folder_path}.")
+    return process_files([os.path.join(folder_path, f) for f in pdf_files], **stage_options)
 
 
-# Function to summarize the extracted text
-def summarize_text(text, model, tokenizer, max_input_length=512, max_output_length=150):
-    # Tokenize input
-    inputs = tokenizer.encode("summarize: " + text, return_tensors="pt", max_length=max_input_length, truncation=True)
+def new_metrics():
+    """Returns the per-document performance metrics, all zeroed."""
+    return {
+        "extraction_time": 0,
+        "summary_time": 0,
+        "keyword_extraction_time": 0,
+        "mongodb_insertion_time": 0,
+        "memory_usage": 0
+    }
 
-    # Generate summary
-    summary_ids = model.generate(inputs, max_length=max_output_length, min_length=30, length_penalty=2.0, num_beams=4,
-                                 early_stopping=True)
 
-    # Decode summary
-    summary = tokenizer.decode(summary_ids[0], skip_special_tokens=True)
-    return summary
+def log_processing_error(pdf_name, error):
+    """Logs why a PDF could not be processed."""
+    if isinstance(error, MemoryError):
+        log_error(f"Error processing {pdf_name}: Not enough memory to process this PDF.")
+    elif isinstance(error, EOFError):
+        log_error(f"Error processing {pdf_name}: PDF is corrupted or incomplete.")
+    else:
+        log_error(f"Error processing {pdf_name}: {error}")
+
+
+def handle_stage_error(pdf_path, stage, error):
+    """Logs a PDF that failed in one of the pipeline stages and records it as failed."""
+    pdf_name = os.path.basename(pdf_path)
+    log_processing_error(pdf_name, error)
+    sink.emit("document", document=pdf_name, status="error", failed_stage=stage, error=str(error))
+
+
+def triage_document(pdf_path):
+    """Triages one PDF and adds the route its category takes."""
+    with sink.stage(os.path.basename(pdf_path), "triage") as event:
+        triage = triage_pdf(pdf_path, sample_pages=triage_sample_pages)
+        triage["route"] = triage_routes.get(triage["category"], "process")
+        event.update(category=triage["category"], route=triage["route"], reason=triage["reason"],
+                     pages=triage["pages"], images=triage["images"])
+    return triage
+
+
+# Step 1: Extract text from the current PDF (runs in an extraction worker process)
+def extract_stage(pdf_path):
+    """Extracts the text of one PDF for summarization, unless its results are already cached.
+
+    PDFs seen for the first time are triaged first; those routed around the models are not parsed any further.
+    """
+    extraction_start_time = time.time()
+    with time_limit(document_timeout), sink.stage(os.path.basename(pdf_path), "extraction") as event:
+        pdf_hash = hash_file(pdf_path)
+        cached = get_result_cache().get(pdf_hash)
+        extracted_text = None
+        page_texts = None
+        pages = 0
+        stored = False
+        new_pages = None
+        triage = None
+        max_chars = summary_input_chars if summary_mode == "truncate" else hierarchical_input_chars
+        if cached is None:
+            stored = bool(page_store_path) and pdf_hash in get_page_store(page_store_path)
+            if not stored:  # Stored PDFs were triaged when they were first parsed
+                triage = triage_document(pdf_path)
+        if triage is not None and triage["route"] != "process":
+            pages = triage["pages"]
+            sample = triage.pop("sample")
+            if triage["route"] == "fast":
+                # A trivial PDF's sample is the whole document
+                new_pages = sample if page_store_path else None
+                page_texts = [(page_number, text) for page_number, text, _ in sample] if search_index_path else None
+                extracted_text = "".join(text for _, text, _ in sample)[:max_chars]
+        elif cached is None and page_store_path:
+            store = get_page_store(page_store_path)
+            if stored:
+                page_texts = store.pages(pdf_hash) if search_index_path else None
+                extracted_text = store.text(pdf_hash, max_chars=max_chars, sample=summary_page_sample)
+                pages = store.page_count(pdf_hash)
+            else:
+                # The whole PDF is parsed once for the store (written by the inference stage, in the
+                # main process); the summary input is then cut from the parsed pages
+                new_pages = list(iter_page_layout(pdf_path))
+                page_texts = [(page_number, text) for page_number, text, _ in new_pages]
+                extracted_text = "".join(text for _, text in iter_budgeted_pages(
+                    len(page_texts), lambda index: page_texts[index][1], max_chars=max_chars,
+                    sample=summary_page_sample))[:max_chars]
+                pages = len(page_texts)
+                if not search_index_path:
+                    page_texts = None
+        elif cached is None:
+            if search_index_path:
+                # The search index covers every page, so the whole PDF is read; the summary input is
+                # still cut to its budget
+                page_texts = list(iter_page_text(pdf_path))
+                if summary_page_sample == "head":
+                    extracted_text = "".join(text for _, text in page_texts)[:max_chars]
+                else:
+                    extracted_text = extract_text_from_pdf(pdf_path, max_chars=max_chars, sample=summary_page_sample)
+            else:
+                page_texts = list(iter_page_text(pdf_path, max_chars=max_chars, sample=summary_page_sample))
+                extracted_text = "".join(text for _, text in page_texts)[:max_chars]
+            pages = len(page_texts)
+        if triage is not None:
+            triage.pop("sample", None)  # Only the pages parsed above travel back to the main process
+            event.update(category=triage["category"], route=triage["route"])
+        # The signature covers exactly the text that would be summarized; it is looked up in the main process
+        signature = None
+        if near_duplicate_threshold is not None and cached is None and extracted_text and extracted_text.strip() \
+                and (triage is None or triage["route"] == "process"):
+            signature = minhash_signature(extracted_text)
+        event.update(cached=cached is not None, stored=stored, pages=pages,
+                     tokens=count_words(extracted_text) if extracted_text else 0)
+    extraction_duration = time.time() - extraction_start_time  # Calculate duration
+    return {"pdf_hash": pdf_hash, "text": extracted_text, "extraction_time": extraction_duration, "cached": cached,
+            "pages": pages, "page_texts": page_texts, "new_pages": new_pages, "triage": triage,
+            "signature": signature}
+
+
+_extract_pools = []  # Idle single-worker process pools for extract_in_subprocess
+_extract_pools_lock = threading.Lock()
+
+
+def extract_in_subprocess(pdf_path):
+    """Runs extract_stage in a worker process, so document_timeout applies outside the main thread too.
+
+    time_limit only works in a process's main thread, which a thread that is not the main one (such
+    as an ingest worker) runs extract_stage in only through this. Each call borrows its own
+    single-worker pool; a worker still stuck once twice the limit has passed is killed with its pool.
+    """
+    if not document_timeout:
+        return extract_stage(pdf_path)
+    with _extract_pools_lock:
+        executor = _extract_pools.pop() if _extract_pools else ProcessPoolExecutor(max_workers=1)
+    future = executor.submit(extract_stage, pdf_path)
+    if not wait([future], timeout=document_timeout * 2).done:
+        for process in list((getattr(executor, "_processes", None) or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=True, cancel_futures=True)
+        raise TimeoutError(f"Extraction took longer than {document_timeout * 2} seconds")
+    if isinstance(future.exception(), BrokenProcessPool):
+        executor.shutdown(wait=False)  # The worker died; the next call starts a fresh pool
+    else:
+        with _extract_pools_lock:
+            _extract_pools.append(executor)
+    return future.result()
+
+
+def shutdown_extract_pools():
+    """Stops the worker processes of extract_in_subprocess."""
+    with _extract_pools_lock:
+        pools = list(_extract_pools)
+        _extract_pools.clear()
+    for executor in pools:
+        executor.shutdown()
+
+
+def queue_for_later(pdf_path, pdf_hash, triage):
+    """Appends a PDF routed to the "queue" route to the triage queue file."""
+    entry = {"path": os.path.abspath(pdf_path), "pdf_hash": pdf_hash, "category": triage["category"],
+             "reason": triage["reason"], "pages": triage["pages"], "queued_at": time.time()}
+    with _triage_lock, open(triage_queue_path, "a") as file:
+        file.write(json.dumps(entry) + "\n")
+
+
+def routed_status(results):
+    """Returns "skipped" or "queued" for results routed around the models by triage, otherwise None."""
+    return {"skip": "skipped", "queue": "queued"}.get(results.get("route"))
+
+
+# Steps 2 and 3: Summaries and keywords
+def infer_stage(pdf_path, extracted):
+    """Generates the summaries and keywords of one extracted PDF."""
+    pdf_name = os.path.basename(pdf_path)
+    extracted_text = extracted["text"]
+    metrics = new_metrics()
+    metrics["extraction_time"] = extracted["extraction_time"]
+
+    if extracted["cached"] is not None:
+        log_info(f"Reusing cached results for unchanged {pdf_name}")
+        return dict(extracted["cached"], metrics=metrics, pdf_hash=extracted["pdf_hash"], pages=0)
+    log_info(f"Text extraction took: {extracted['extraction_time']:.2f} seconds")
+    triage = extracted.get("triage")
+    route = "process"
+    if triage is not None:
+        route = triage["route"]
+        with _triage_lock:
+            _triage_counts[triage["category"]] = _triage_counts.get(triage["category"], 0) + 1
+        if route != "process":
+            log_info(f"Triage routed {pdf_name} to {route}: {triage['category']}, {triage['reason']}")
+    if route in ("skip", "queue"):
+        if route == "queue":
+            queue_for_later(pdf_path, extracted["pdf_hash"], triage)
+        return {"route": route, "triage": triage, "metrics": metrics, "pdf_hash": extracted["pdf_hash"],
+                "pages": extracted["pages"]}
+    if extracted.get("new_pages") is not None:
+        # Only this process writes to the page store; extraction workers just read from it
+        with sink.stage(pdf_name, "page_store", pages=len(extracted["new_pages"])):
+            get_page_store(page_store_path).put(extracted["pdf_hash"], extracted["new_pages"])
+
+    if route == "fast":
+        # Too short to summarize: the text is its own summary at every length, and no model is loaded
+        text = " ".join(extracted_text.split())
+        results = {"summaries": {name: text for name in SUMMARY_LENGTHS}, "keywords": [],
+                   "decoding": {"strategy": "fast_path", "num_beams": 0, "deadline_hit": False}}
+        get_result_cache().put(extracted["pdf_hash"], results)
+        return dict(results, route=route, triage=triage, metrics=metrics, pdf_hash=extracted["pdf_hash"],
+                    pages=extracted["pages"], page_texts=extracted["page_texts"])
+
+    signature = extracted.get("signature")
+    if signature is not None:
+        reused = reuse_near_duplicate(pdf_name, extracted["pdf_hash"], signature)
+        if reused is not None:
+            return dict(reused, metrics=metrics, pdf_hash=extracted["pdf_hash"], pages=extracted["pages"],
+                        page_texts=extracted["page_texts"])
+
+    # Step 2: Generate different lengths of summaries, batched with other documents through the scheduler
+    summary_start_time = time.time()
+    with sink.stage(pdf_name, "summarization", mode=summary_mode) as event:
+        summaries, summary_timings, decoding = summarize_document(extracted_text)
+        event.update(strategy=decoding["strategy"], deadline_hit=decoding["deadline_hit"])
+    for name, duration in summary_timings.items():
+        sink.emit("stage", document=pdf_name, stage=f"summary_{name}", status="ok", wall_time=duration)
+    summary_duration = time.time() - summary_start_time  # Calculate duration
+    metrics["summary_time"] = summary_duration
+    log_info(f"Summary generation took: {summary_duration:.2f} seconds ({decoding['strategy']} decoding"
+             f"{', cut short by the deadline' if decoding['deadline_hit'] else ''})")
+    log_info(f"Summary timings for {pdf_name}: " +
+             ", ".join(f"{name}={duration:.2f}s" for name, duration in summary_timings.items()))
+
+    # Step 3: Extract keywords from the extracted text
+    keyword_extraction_start_time = time.time()
+    # Hierarchical mode extracts far more text than keyword extraction needs, so keywords keep the summary
+    # input budget
+    keyword_text = extracted_text[:summary_input_chars]
+    with sink.stage(pdf_name, "keywords", tokens=count_words(keyword_text)):
+        keywords = extract_document_keywords(keyword_text)  # Call the keyword extraction function
+    keyword_extraction_duration = time.time() - keyword_extraction_start_time  # Calculate duration
+    metrics["keyword_extraction_time"] = keyword_extraction_duration
+    log_info(f"Keyword extraction took: {keyword_extraction_duration:.2f} seconds")
+
+    get_result_cache().put(extracted["pdf_hash"], {"name": pdf_name, "summaries": summaries, "keywords": keywords,
+                                                   "decoding": decoding})
+    if signature is not None:
+        # Indexed only once its results are cached, so every match has results to reuse
+        get_near_duplicate_index().add(extracted["pdf_hash"], signature)
+    return {"summaries": summaries, "keywords": keywords, "decoding": decoding, "metrics": metrics,
+            "pdf_hash": extracted["pdf_hash"], "pages": extracted["pages"], "page_texts": extracted["page_texts"]}
+
+
+# Step 4: Print, save and store the results
+def persist_stage(pdf_path, results):
+    """Prints the results of one PDF, saves them next to it and stores its metadata in MongoDB."""
+    folder_path, pdf_name = os.path.split(pdf_path)
+    short_summary = results["summaries"]["short"]
+    medium_summary = results["summaries"]["medium"]
+    long_summary = results["summaries"]["long"]
+    keywords = results["keywords"]
+    metrics = results["metrics"]
+
+    # Print structured output
+    print("=" * 50)
+    print(f"Summaries of {pdf_name}:")
+    print("=" * 50)
+    print("Short Summary:")
+    print(f"'{short_summary}'\n")
+    print("Medium Summary:")
+    print(f"'{medium_summary}'\n")
+    print("Long Summary:")
+    print(f"'{long_summary}'\n")
+    print("Keywords extracted:")
+    print(", ".join(keywords))  # Join keywords with commas
+    print("=" * 50)
+
+    # Save the summaries to a structured text file; it is written next to its final name and then renamed,
+    # so a crash never leaves a half-written summary file behind
+    summary_file_path = os.path.join(folder_path, f"{pdf_name}_summary.txt")
+    tmp_file_path = f"{summary_file_path}.tmp"
+    with sink.stage(pdf_name, "file_write"), open(tmp_file_path, "w") as file:
+        file.write(f"Summaries of {pdf_name}:\n")
+        file.write("=" * 50 + "\n")
+        file.write("Short Summary:\n")
+        file.write(f"{short_summary}\n\n")
+        file.write("Medium Summary:\n")
+        file.write(f"{medium_summary}\n\n")
+        file.write("Long Summary:\n")
+        file.write(f"{long_summary}\n\n")
+        file.write("Keywords extracted:\n")
+        file.write(", ".join(keywords) + "\n")
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_file_path, summary_file_path)
+
+    log_info(f"Summaries saved to {summary_file_path}")
+
+    # Prepare metadata for MongoDB
+    metadata = {
+        "content_key": results["pdf_hash"],
+        "name": pdf_name,
+        "short_summary": short_summary,
+        "medium_summary": medium_summary,
+        "long_summary": long_summary,
+        "keywords": keywords,
+        "decoding": results.get("decoding"),
+        "near_duplicate_of": results.get("near_duplicate_of"),
+        "processed_at": time.time()
+    }
 
+    # Queue the metadata for the next bulk upsert into MongoDB
+    mongodb_insertion_start_time = time.time()
+    with sink.stage(pdf_name, "mongodb"):
+        get_writer().write(metadata)
+    mongodb_insertion_duration = time.time() - mongodb_insertion_start_time  # Calculate duration
+    metrics["mongodb_insertion_time"] = mongodb_insertion_duration
+    log_info(f"MongoDB insertion took: {mongodb_insertion_duration:.2f} seconds")
 
-# Load pre-trained T5 model and tokenizer
-model_name = "t5-small"
-tokenizer = T5Tokenizer.from_pretrained(model_name)
-model = T5ForConditionalGeneration.from_pretrained(model_name)
+    # Add the pages, summaries and keywords to the search index (cached results were indexed already)
+    if search_index_path and results.get("page_texts") is not None:
+        with sink.stage(pdf_name, "search_index"):
+            get_search_index().add_document(pdf_name, results["page_texts"], results["summaries"], keywords,
+                                            pdf_hash=results["pdf_hash"])
 
 
-# Process PDFs in batches to avoid memory overload
-def run_parallel_pipeline(folder_path, batch_size=2):
-    """Processes PDF files in parallel batches."""
-    pdf_files = [f for f in os.listdir(folder_path) if f.endswith('.pdf')]
-    total_files = len(pdf_files)
+def log_metrics(pdf_name, metrics, pages=0, status="ok", category=None):
+    """Records the current memory usage and logs the performance metrics of one PDF."""
+    metrics["memory_usage"] = psutil.Process().memory_info().rss  # Get current memory usage
+    log_info(f"Performance metrics for {pdf_name}: {metrics}")
+    if category is not None:
+        metrics = dict(metrics, category=category)
+    sink.emit("document", document=pdf_name, status=status, pages=pages, **metrics)
 
-    log_info(f"Found {total_files} PDF files in {folder_path}.")
 
-    for i in range(0, total_files, batch_size):
-        batch = pdf_files[i:i + batch_size]
-        log_info(f"Processing batch {i // batch_size + 1}: {batch}")
+def persist_and_log_stage(pdf_path, results):
+    """Persists one PDF's results and logs its performance metrics.
 
-        with ThreadPoolExecutor(max_workers=batch_size) as executor:
-            executor.map(lambda pdf_name: process_pdf(folder_path, pdf_name), batch)
+    PDFs that triage skipped or queued have nothing to persist and are only recorded.
+    """
+    status = routed_status(results)
+    if status is None:
+        persist_stage(pdf_path, results)
+    triage = results.get("triage")
+    log_metrics(os.path.basename(pdf_path), results["metrics"], pages=results["pages"], status=status or "ok",
+                category=triage["category"] if triage else None)
 
 
 # Function to process each PDF file
-def process_pdf(folder_path, pdf_name):
-    """Processes a single PDF, extracts text, generates summary, and stores metadata."""
+def process_pdf(folder_path, pdf_name, extract_fn=extract_stage):
+    """Processes a single PDF, extracts text, generates summary, and stores metadata.
+
+    Returns (status, error): status is "ok", "skipped" or "queued" (see triage_routes), or "error"
+    with the exception that stopped processing. Callers on threads other than the main one pass
+    extract_in_subprocess as `extract_fn` for document_timeout to apply.
+    """
     pdf_path = os.path.join(folder_path, pdf_name)
     start_time = time.time()  # Track overall processing time
-
-    # Initialize performance metrics
-    metrics = {
-        "extraction_time": 0,
-        "summary_time": 0,
-        "keyword_extraction_time": 0,
-        "mongodb_insertion_time": 0,
-        "memory_usage": 0
-    }
+    metrics = new_metrics()
+    pages = 0
+    status = "error"
+    error = None
 
     try:
-        # Step 1: Extract text from the current PDF
-        extraction_start_time = time.time()
-        extracted_text = extract_text_from_pdf(pdf_path)
-        extraction_duration = time.time() - extraction_start_time  # Calculate duration
-        metrics["extraction_time"] = extraction_duration
-        log_info(f"Text extraction took: {extraction_duration:.2f} seconds")
-
-        # Optional: Trim the extracted text if it's too long
-        extracted_text = extracted_text[:2000]  # Use first 2000 characters for summarization
-
-        # Step 2: Generate different lengths of summaries
-        summary_start_time = time.time()
-        short_summary = summarize_text(extracted_text, model, tokenizer, max_output_length=50)  # Short summary
-        medium_summary = summarize_text(extracted_text, model, tokenizer, max_output_length=100)  # Medium summary
-        long_summary = summarize_text(extracted_text, model, tokenizer, max_output_length=200)  # Long summary
-        summary_duration = time.time() - summary_start_time  # Calculate duration
-        metrics["summary_time"] = summary_duration
-        log_info(f"Summary generation took: {summary_duration:.2f} seconds")
-
-        # Step 3: Extract keywords from the extracted text
-        keyword_extraction_start_time = time.time()
-        keywords = extract_keywords(extracted_text)  # Call the keyword extraction function
-        keyword_extraction_duration = time.time() - keyword_extraction_start_time  # Calculate duration
-        metrics["keyword_extraction_time"] = keyword_extraction_duration
-        log_info(f"Keyword extraction took: {keyword_extraction_duration:.2f} seconds")
-
-        # Step 4: Print structured output
-        print("=" * 50)
-        print(f"Summaries of {pdf_name}:")
-        print("=" * 50)
-        print("Short Summary:")
-        print(f"'{short_summary}'\n")
-        print("Medium Summary:")
-        print(f"'{medium_summary}'\n")
-        print("Long Summary:")
-        print(f"'{long_summary}'\n")
-        print("Keywords extracted:")
-        print(", ".join(keywords))  # Join keywords with commas
-        print("=" * 50)
-
-        # Save the summaries to a structured text file
-        summary_file_path = os.path.join(folder_path, f"{pdf_name}_summary.txt")
-        with open(summary_file_path, "w") as file:
-            file.write(f"Summaries of {pdf_name}:\n")
-            file.write("=" * 50 + "\n")
-            file.write("Short Summary:\n")
-            file.write(f"{short_summary}\n\n")
-            file.write("Medium Summary:\n")
-            file.write(f"{medium_summary}\n\n")
-            file.write("Long Summary:\n")
-            file.write(f"{long_summary}\n\n")
-            file.write("Keywords extracted:\n")
-            file.write(", ".join(keywords) + "\n")
-
-        log_info(f"Summaries saved to {summary_file_path}")
-
-        # Prepare metadata for MongoDB
-        metadata = {
-            "name": pdf_name,
-            "short_summary": short_summary,
-            "medium_summary": medium_summary,
-            "long_summary": long_summary,
-            "keywords": keywords,
-            "processed_at": time.time()
-        }
-
-        # Insert metadata into MongoDB
-        mongodb_insertion_start_time = time.time()
-        insert_mongodb(metadata)
-        mongodb_insertion_duration = time.time() - mongodb_insertion_start_time  # Calculate duration
-        metrics["mongodb_insertion_time"] = mongodb_insertion_duration
-        log_info(f"MongoDB insertion took: {mongodb_insertion_duration:.2f} seconds")
-
-    except MemoryError:
-        log_error(f"Error processing {pdf_name}: Not enough memory to process this PDF.")
-    except EOFError:
-        log_error(f"Error processing {pdf_name}: PDF is corrupted or incomplete.")
+        results = infer_stage(pdf_path, extract_fn(pdf_path))
+        metrics, pages = results["metrics"], results["pages"]
+        status = routed_status(results)
+        if status is None:
+            persist_stage(pdf_path, results)
+            status = "ok"
     except Exception as e:
-        log_error(f"Error processing {pdf_name}: {e}")
+        error = e
+        log_processing_error(pdf_name, e)
     finally:
         end_time = time.time()
-        metrics["memory_usage"] = psutil.Process().memory_info().rss  # Get current memory usage
         log_info(f"Overall processing time for {pdf_name}: {end_time - start_time:.2f} seconds")
 
         # Log performance metrics
-        log_info(f"Performance metrics for {pdf_name}: {metrics}")
+        log_metrics(pdf_name, metrics, pages=pages, status=status)
+    return status, error
 
 # Main execution
 if __name__ == "__main__":
@@ -189,7 +762,12 @@ if __name__ == "__main__":
     if not os.path.exists(folder_path):
         log_error(f"Folder path {folder_path} does not exist.")
     else:
+        # Load the shared models before the worker threads start
+        registry.warm_up([summary_model_name(), "keybert"])
         run_parallel_pipeline(folder_path)
+        summary_scheduler.stop()
+        keyword_scheduler.stop()
+        log_info(f"Summarization batching stats: {summary_scheduler.stats()}")
 
     # Print the MongoDB documents after processing the PDFs
     print_mongodb_documents(db, collection_name="your_collection_name")  # Replace with your collection name
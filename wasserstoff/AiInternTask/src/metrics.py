@@ -0,0 +1,108 @@
+# src/metrics.py
+import json
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+import psutil
+
+try:
+    import resource  # Not available on Windows
+except ImportError:
+    resource = None
+
+
+def peak_rss():
+    """Returns the process's peak resident memory in bytes, where the platform reports it."""
+    memory_info = psutil.Process().memory_info()
+    if hasattr(memory_info, "peak_wset"):  # Windows
+        return memory_info.peak_wset
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if psutil.MACOS else peak * 1024  # Linux reports kilobytes
+    return memory_info.rss
+
+
+class MetricsSink:
+    """Appends structured metric events to a JSON-lines file.
+
+    Every event is one line written with a single append, so the extraction worker processes
+    and the main process can share the file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+        self._lock = threading.Lock()
+        _sinks.add(self)
+
+    def emit(self, event, **fields):
+        """Writes one event with a timestamp, the process id and the given fields."""
+        record = {"ts": time.time(), "event": event, "pid": os.getpid()}
+        record.update(fields)
+        line = (json.dumps(record, default=str) + "\n").encode()
+        with self._lock:
+            if self._fd is None:
+                self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            os.write(self._fd, line)
+
+    @contextmanager
+    def stage(self, document, stage, **fields):
+        """Measures a pipeline stage and emits a "stage" event for it when the block exits.
+
+        Yields a dict the caller can fill with counts such as pages, tokens or batch_size.
+        """
+        event = dict(fields)
+        rss_before = psutil.Process().memory_info().rss
+        peak_before = peak_rss()
+        cpu_start_time = time.thread_time()
+        start_time = time.perf_counter()
+        status = "ok"
+        try:
+            yield event
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            event.update(
+                document=document,
+                stage=stage,
+                status=status,
+                wall_time=time.perf_counter() - start_time,
+                cpu_time=time.thread_time() - cpu_start_time,
+                rss_delta=psutil.Process().memory_info().rss - rss_before,
+                peak_memory_delta=peak_rss() - peak_before,
+            )
+            self.emit("stage", **event)
+
+    def close(self):
+        """Closes this process's handle on the metrics file."""
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+            self._fd = None
+
+    def _after_fork_in_child(self):
+        # Another thread of the parent may have held the lock when it forked, and the child
+        # would then wait on it forever; the parent's handle is dropped for one of its own
+        self._lock = threading.Lock()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+_sinks = weakref.WeakSet()
+
+
+def _reset_sinks_after_fork():
+    for each in list(_sinks):
+        each._after_fork_in_child()
+
+
+if hasattr(os, "register_at_fork"):  # Not available on Windows, which never forks
+    os.register_at_fork(after_in_child=_reset_sinks_after_fork)
+
+# Process-wide sink used by the pipeline stages
+sink = MetricsSink(os.environ.get("PIPELINE_METRICS_PATH", "metrics.jsonl"))
@@ -0,0 +1,201 @@
+# src/model_registry.py
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from logger import log_info, log_warning
+
+
+def estimate_model_bytes(obj):
+    """Estimates the resident size of a loaded model from its parameters and buffers."""
+    if isinstance(obj, (tuple, list)):
+        return sum(estimate_model_bytes(item) for item in obj)
+    if callable(getattr(obj, "parameters", None)) and callable(getattr(obj, "buffers", None)):
+        tensors = list(obj.parameters()) + list(obj.buffers())
+        # Dynamically quantized layers keep their int8 weights in packed params, not in parameters
+        for value in obj.state_dict().values():
+            if isinstance(value, tuple):
+                tensors.extend(item for item in value if hasattr(item, "element_size"))
+        return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+    # KeyBERT and HF pipelines wrap the underlying torch module
+    for attribute in ("model", "embedding_model"):
+        inner = getattr(obj, attribute, None)
+        if inner is not None and inner is not obj:
+            return estimate_model_bytes(inner)
+    return 0
+
+
+class _Entry:
+    def __init__(self, value, size, load_time):
+        self.value = value
+        self.size = size
+        self.load_time = load_time
+        self.pins = 0
+        self.lock = threading.Lock()
+
+
+class ModelRegistry:
+    """Loads each registered model once per process and shares it across worker threads.
+
+    Models are loaded lazily on first use (or up front with `warm_up`). When `max_bytes` is set,
+    the least recently used models that are not currently in use are evicted to stay under it.
+    """
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes
+        self._loaders = {}
+        self._exclusive = {}
+        self._entries = OrderedDict()
+        self._load_locks = {}
+        self._load_counts = {}
+        self._lock = threading.RLock()
+
+    def register(self, name, loader, exclusive=False):
+        """Registers a zero-argument loader. `exclusive` serializes calls for non thread-safe models."""
+        with self._lock:
+            self._loaders[name] = loader
+            self._exclusive[name] = exclusive
+            self._load_locks.setdefault(name, threading.Lock())
+
+    def _load(self, name, pin=False):
+        if name not in self._loaders:
+            raise KeyError(f"No model registered under '{name}'")
+
+        # Only one thread loads a given model; the others wait and then share it
+        with self._load_locks[name]:
+            with self._lock:
+                entry = self._entries.get(name)
+                if entry is not None:
+                    self._entries.move_to_end(name)
+                    if pin:
+                        entry.pins += 1
+                    return entry
+
+            if self._load_counts.get(name):
+                log_warning(f"Reloading model '{name}' after it was evicted")
+            load_start_time = time.time()
+            value = self._loaders[name]()
+            entry = _Entry(value, estimate_model_bytes(value), time.time() - load_start_time)
+            log_info(f"Loaded model '{name}' in {entry.load_time:.2f} seconds ({entry.size / 1e6:.1f} MB)")
+
+            with self._lock:
+                self._entries[name] = entry
+                self._load_counts[name] = self._load_counts.get(name, 0) + 1
+                if pin:
+                    entry.pins += 1
+                self._evict_over_budget(keep=name)
+            return entry
+
+    def _evict_over_budget(self, keep=None):
+        if not self.max_bytes:
+            return
+        for name in list(self._entries):
+            if self.memory_usage() <= self.max_bytes:
+                break
+            entry = self._entries[name]
+            if name != keep and entry.pins == 0:
+                self.evict(name)
+
+    def get(self, name):
+        """Returns the shared model, loading it on first use."""
+        return self._load(name).value
+
+    @contextmanager
+    def use(self, name):
+        """Yields the shared model and keeps it from being evicted while in use."""
+        entry = self._load(name, pin=True)
+        try:
+            if self._exclusive[name]:
+                with entry.lock:
+                    yield entry.value
+            else:
+                yield entry.value
+        finally:
+            with self._lock:
+                entry.pins -= 1
+                if self._entries.get(name) is entry:
+                    self._entries.move_to_end(name)
+                # Models that had to stay loaded while in use can be evicted now
+                self._evict_over_budget()
+
+    def warm_up(self, names=None):
+        """Loads the given models (or every registered model) before any work arrives."""
+        for name in names or list(self._loaders):
+            self._load(name)
+
+    def evict(self, name):
+        """Drops the registry's reference to a loaded model."""
+        with self._lock:
+            entry = self._entries.pop(name, None)
+        if entry is not None:
+            log_info(f"Evicted model '{name}' ({entry.size / 1e6:.1f} MB)")
+
+    def memory_usage(self):
+        """Returns the estimated bytes held by all loaded models."""
+        with self._lock:
+            return sum(entry.size for entry in self._entries.values())
+
+    def loaded(self):
+        """Returns the names of the currently loaded models, least recently used first."""
+        with self._lock:
+            return list(self._entries)
+
+
+def _load_t5(model_name):
+    from transformers import T5Tokenizer, T5ForConditionalGeneration
+    tokenizer = T5Tokenizer.from_pretrained(model_name)
+    model = T5ForConditionalGeneration.from_pretrained(model_name)
+    model.eval()
+    return model, tokenizer
+
+
+def _load_t5_int8(model_name):
+    import torch
+    model, tokenizer = _load_t5(model_name)
+    # Weights of the linear layers are stored as int8; activations are quantized on the fly per batch
+    model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model, tokenizer
+
+
+def _load_t5_onnx(model_name, export_dir):
+    from onnxruntime import GraphOptimizationLevel, SessionOptions
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    from transformers import T5Tokenizer
+    session_options = SessionOptions()
+    session_options.graph_optimization_level = GraphOptimizationLevel.ORT_ENABLE_ALL
+    if os.path.isdir(export_dir):
+        model = ORTModelForSeq2SeqLM.from_pretrained(export_dir, use_cache=True, session_options=session_options)
+    else:
+        # Exported once with a decoder that takes the past key/values, so each generated token
+        # only runs the decoder over the newest position
+        model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True, use_cache=True,
+                                                     session_options=session_options)
+        model.save_pretrained(export_dir)
+    return model, T5Tokenizer.from_pretrained(model_name)
+
+
+def _load_keybert():
+    from keybert import KeyBERT
+    return KeyBERT()
+
+
+def _load_pipeline(task):
+    from transformers import pipeline
+    return pipeline(task)
+
+
+# Registry name of the T5 summarizer for each backend. All of them return (model, tokenizer) and
+# work with the functions in summarization.py.
+SUMMARIZER_BACKENDS = {"fp32": "t5-small", "int8": "t5-small-int8", "onnx": "t5-small-onnx"}
+
+# Process-wide registry shared by every module in the pipeline
+registry = ModelRegistry(max_bytes=int(os.environ.get("MODEL_REGISTRY_MAX_BYTES", 0)) or None)
+registry.register("t5-small", lambda: _load_t5("t5-small"))
+registry.register("t5-small-int8", lambda: _load_t5_int8("t5-small"))
+registry.register("t5-small-onnx", lambda: _load_t5_onnx("t5-small", os.environ.get("T5_ONNX_DIR", "t5-small-onnx")))
+registry.register("keybert", _load_keybert)
+# HF pipelines use fast tokenizers, which are not safe to call from several threads at once
+registry.register("hf-summarization", lambda: _load_pipeline("summarization"), exclusive=True)
+registry.register("hf-ner", lambda: _load_pipeline("ner"), exclusive=True)
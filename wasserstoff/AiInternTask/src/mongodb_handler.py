@@ -1,19 +1,158 @@
 # src/mongodb_handler.py
-from pymongo import MongoClient
+import atexit
+import threading
+import time
+
+from pymongo import MongoClient, UpdateOne
+
+from logger import log_info, log_exception
+
+# MongoDB connection settings (adjust the connection string accordingly)
+mongodb_uri = 'mongodb://localhost:27017/'
+database_name = 'pdf_database'
+collection_name = 'pdf_metadata'
+max_pool_size = 20
+
+_clients = {}
+_writer = None
+_lock = threading.RLock()
+
+
+def get_client(uri=None):
+    """Returns the process-wide MongoClient for `uri` (default: mongodb_uri), created on first use.
+
+    Every caller of the same server shares one connection pool.
+    """
+    uri = uri or mongodb_uri
+    with _lock:
+        if uri not in _clients:
+            _clients[uri] = MongoClient(uri, maxPoolSize=max_pool_size)
+        return _clients[uri]
+
+
+def get_collection():
+    """Returns the collection that holds the PDF metadata."""
+    return get_client()[database_name][collection_name]
+
+
+def _document_filter(metadata, key_field):
+    # Documents are upserted on their content key so re-runs replace instead of duplicating
+    if metadata.get(key_field) is not None:
+        return {key_field: metadata[key_field]}
+    return {"name": metadata["name"]}
+
+
+class BulkMongoWriter:
+    """Buffers metadata documents and writes them with one unordered bulk upsert.
+
+    The buffer is flushed once it holds `max_batch_size` documents or its oldest document has
+    waited `max_latency` seconds. Documents are upserted on `key_field`, so writing the same
+    PDF again updates its document instead of adding a duplicate; the first flush creates a
+    unique index on it, so upserts do not scan the collection and concurrent ones cannot both insert.
+    """
+
+    def __init__(self, collection, key_field="content_key", max_batch_size=100, max_latency=1.0):
+        self.collection = collection
+        self.key_field = key_field
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self._buffer = []
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._indexed = False
+        self._stats = {"documents": 0, "flushes": 0, "total_flush_latency": 0.0, "max_flush_latency": 0.0}
+        self._timer = threading.Thread(target=self._flush_periodically, name="mongodb-writer", daemon=True)
+        self._timer.start()
+
+    def write(self, metadata):
+        """Adds one document to the buffer, flushing if the buffer is full."""
+        with self._lock:
+            if not self._buffer:
+                self._oldest = time.time()
+            self._buffer.append(metadata)
+            full = len(self._buffer) >= self.max_batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Writes every buffered document in one bulk upsert.
+
+        The documents stay buffered until the write succeeds, so a failed flush raises and the
+        next flush writes them again.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._buffer)
+            if not batch:
+                return
+
+            if not self._indexed:
+                # Documents without a key (upserted on their name) are left out of the index
+                self.collection.create_index(self.key_field, unique=True,
+                                             partialFilterExpression={self.key_field: {"$type": "string"}})
+                self._indexed = True
+
+            flush_start_time = time.time()
+            requests = [UpdateOne(_document_filter(metadata, self.key_field), {"$set": metadata}, upsert=True)
+                        for metadata in batch]
+            self.collection.bulk_write(requests, ordered=False)
+            flush_latency = time.time() - flush_start_time
+
+            with self._lock:
+                # Only flush removes documents, so the batch is still the head of the buffer
+                del self._buffer[:len(batch)]
+                if self._buffer:
+                    self._oldest = flush_start_time
+                self._stats["documents"] += len(batch)
+                self._stats["flushes"] += 1
+                self._stats["total_flush_latency"] += flush_latency
+                self._stats["max_flush_latency"] = max(self._stats["max_flush_latency"], flush_latency)
+            log_info(f"MongoDB bulk write of {len(batch)} documents took: {flush_latency:.2f} seconds")
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.max_latency / 2):
+            with self._lock:
+                due = self._buffer and time.time() - self._oldest >= self.max_latency
+            if due:
+                try:
+                    self.flush()
+                except Exception as e:
+                    log_exception(e)
+
+    def close(self):
+        """Flushes the remaining documents and stops the background flusher."""
+        self._closed.set()
+        self._timer.join()
+        self.flush()
+
+    def stats(self):
+        """Returns document, flush and flush latency counters."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["mean_flush_latency"] = stats["total_flush_latency"] / stats["flushes"] if stats["flushes"] else 0.0
+        return stats
+
+
+def get_writer():
+    """Returns the process-wide buffered writer for the metadata collection."""
+    global _writer
+    with _lock:
+        if _writer is None:
+            _writer = BulkMongoWriter(get_collection())
+            atexit.register(_writer.close)
+        return _writer
 
-# Initialize MongoDB connection (adjust the connection string accordingly)
-client = MongoClient('mongodb://localhost:27017/')
-db = client['pdf_database']
-collection = db['pdf_metadata']
 
 def insert_mongodb(metadata):
-    # Insert the PDF metadata initially
-    result = collection.insert_one(metadata)
-    return result.inserted_id
+    # Upsert the PDF metadata so re-running the pipeline does not duplicate it
+    result = get_collection().update_one(_document_filter(metadata, "content_key"), {"$set": metadata}, upsert=True)
+    return result.upserted_id
 
 def update_mongodb(document_name, summary_and_keywords):
     # Find the document by name and update the summary and keywords
-    result = collection.update_one(
+    result = get_collection().update_one(
         {"name": document_name},
         {"$set": {
             "summary": summary_and_keywords['summary'],
@@ -0,0 +1,168 @@
+# src/near_duplicates.py
+import hashlib
+import os
+import re
+import threading
+
+import numpy as np
+
+# MinHash with (a * x + b) mod p over 32-bit shingle hashes; a stays below 2**29 so a * x + b fits in 64 bits
+_PRIME = (1 << 61) - 1
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_BLOCK = 4096  # Shingles hashed per block, so long documents do not build one huge matrix
+_MAGIC = b"MINHASH1"
+
+
+def shingle_hashes(text, shingle_words=5):
+    """Returns the distinct 32-bit hashes of the text's overlapping `shingle_words`-word shingles."""
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return np.zeros(0, dtype=np.uint64)
+    # Each distinct word is hashed once; Python's hash() is salted per process, so blake2b is used
+    vocabulary, inverse = np.unique(words, return_inverse=True)
+    word_hashes = np.array([int.from_bytes(hashlib.blake2b(word.encode(), digest_size=4).digest(), "little")
+                            for word in vocabulary], dtype=np.uint64)[inverse]
+    width = min(shingle_words, len(words))
+    count = len(words) - width + 1
+    hashes = np.zeros(count, dtype=np.uint64)
+    for offset in range(width):
+        hashes = (hashes * np.uint64(1000003) + word_hashes[offset:offset + count]) & _MAX_HASH
+    return np.unique(hashes)
+
+
+class MinHasher:
+    """Computes MinHash signatures of texts' word shingles.
+
+    The share of equal entries in two signatures estimates the Jaccard similarity of the two
+    texts' shingle sets. Signatures are only comparable between hashers with the same settings.
+    """
+
+    def __init__(self, num_perm=128, shingle_words=5, seed=1):
+        self.num_perm = num_perm
+        self.shingle_words = shingle_words
+        self.seed = seed
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 1 << 29, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.int64).astype(np.uint64)
+
+    def signature(self, text):
+        """Returns the text's signature as a uint32 array of `num_perm` entries."""
+        signature = np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        shingles = shingle_hashes(text, self.shingle_words)
+        for start in range(0, len(shingles), _BLOCK):
+            block = shingles[start:start + _BLOCK, None]
+            values = ((block * self._a + self._b) % np.uint64(_PRIME)) & _MAX_HASH
+            np.minimum(signature, values.min(axis=0), out=signature)
+        return signature.astype(np.uint32)
+
+
+_default_hasher = None
+
+
+def minhash_signature(text):
+    """Returns the text's signature with the default MinHasher settings that NearDuplicateIndex uses."""
+    global _default_hasher
+    if _default_hasher is None:
+        _default_hasher = MinHasher()
+    return _default_hasher.signature(text)
+
+
+class NearDuplicateIndex:
+    """Incremental locality-sensitive hashing index of MinHash signatures.
+
+    Each signature is cut into `bands` bands, and a document becomes a candidate for a query
+    when any whole band matches; only the candidates' signatures are compared. With 16 bands of
+    8 rows, a document with similarity 0.8 is a candidate with 95% probability and one with 0.5
+    with 6%, so lookups stay at a few dictionary probes however many documents are indexed.
+
+    Signatures are appended to the file at `path` as documents are added and loaded back on
+    open; None keeps the index in memory only.
+    """
+
+    def __init__(self, path=None, threshold=0.9, num_perm=128, bands=16, shingle_words=5, seed=1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.path = path
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm=num_perm, shingle_words=shingle_words, seed=seed)
+        self._record = np.dtype([("key", "S64"), ("signature", "<u4", (num_perm,))])
+        self._header = _MAGIC + np.array([num_perm, shingle_words, seed], dtype="<u4").tobytes()
+        self._keys = []
+        self._positions = {}
+        self._signatures = np.zeros((1024, num_perm), dtype=np.uint32)
+        self._buckets = [{} for _ in range(bands)]
+        self._lock = threading.Lock()
+        if path is not None:
+            self._load()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    def _load(self):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            with open(self.path, "wb") as file:
+                file.write(self._header)
+            return
+        with open(self.path, "rb") as file:
+            if file.read(len(self._header)) != self._header:
+                raise ValueError(f"{self.path} was built with other MinHash settings")
+            data = file.read()
+        # A crash during an append leaves a partial record at the end, which is cut off
+        whole = len(data) - len(data) % self._record.itemsize
+        if whole != len(data):
+            os.truncate(self.path, len(self._header) + whole)
+        for record in np.frombuffer(data[:whole], dtype=self._record):
+            self._insert(record["key"].decode(), record["signature"])
+
+    def _band_keys(self, signature):
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def _insert(self, key, signature):
+        position = len(self._keys)
+        if position == len(self._signatures):
+            self._signatures = np.concatenate([self._signatures, np.zeros_like(self._signatures)])
+        self._signatures[position] = signature
+        self._keys.append(key)
+        self._positions[key] = position
+        for bucket, band_key in zip(self._buckets, self._band_keys(signature)):
+            bucket.setdefault(band_key, []).append(position)
+
+    def add(self, key, signature):
+        """Indexes a document's signature under `key` (at most 64 bytes); a key that is indexed already is skipped.
+
+        Returns True if the signature was added.
+        """
+        signature = np.asarray(signature, dtype=np.uint32)
+        with self._lock:
+            if key in self._positions:
+                return False
+            if self.path is not None:
+                record = np.zeros(1, dtype=self._record)
+                record["key"] = key.encode()
+                record["signature"] = signature
+                with open(self.path, "ab") as file:
+                    file.write(record.tobytes())
+            self._insert(key, signature)
+        return True
+
+    def query(self, signature, threshold=None):
+        """Returns (key, similarity) of the most similar indexed document at or above the threshold, or None."""
+        threshold = self.threshold if threshold is None else threshold
+        signature = np.asarray(signature, dtype=np.uint32)
+        with self._lock:
+            candidates = set()
+            for bucket, band_key in zip(self._buckets, self._band_keys(signature)):
+                candidates.update(bucket.get(band_key, ()))
+            if not candidates:
+                return None
+            positions = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            similarities = (self._signatures[positions] == signature).mean(axis=1)
+            best = int(np.argmax(similarities))
+            if similarities[best] < threshold:
+                return None
+            return self._keys[positions[best]], float(similarities[best])
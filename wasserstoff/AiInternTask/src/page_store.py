@@ -0,0 +1,198 @@
+# src/page_store.py
+import mmap
+import os
+import threading
+import zlib
+
+import numpy as np
+
+from pdf_text import count_words, iter_budgeted_pages, iter_page_layout
+
+# One fixed-size index record per stored page. Records of a document are contiguous and point at
+# its zlib-compressed page texts in the data file.
+PAGE_RECORD = np.dtype([("pdf_hash", "S64"), ("page_number", "<u4"), ("offset", "<u8"), ("length", "<u4"),
+                        ("chars", "<u4"), ("words", "<u4"), ("images", "<u2"), ("width", "<f4"),
+                        ("height", "<f4")])
+DATA_FILE = "pages.dat"
+INDEX_FILE = "pages.idx"
+
+
+class PageStore:
+    """Append-only store of extracted page texts and layout stats, keyed by the PDF's content hash.
+
+    Page texts are compressed one page at a time into `pages.dat`, and `pages.idx` holds a fixed-size
+    record per page. Both are memory-mapped, so any page range of a document is a slice of the index
+    and of the data file, and only the pages asked for are decompressed. Only one process may write
+    to a store; readers in other processes pick up documents added since they opened it, and never
+    modify the files.
+    """
+
+    def __init__(self, path, compression_level=6):
+        self.path = path
+        self.compression_level = compression_level
+        self._data_path = os.path.join(path, DATA_FILE)
+        self._index_path = os.path.join(path, INDEX_FILE)
+        self._lock = threading.RLock()
+        self._records = np.zeros(0, dtype=PAGE_RECORD)
+        self._data = b""
+        self._documents = {}
+        self._recovered = False
+        os.makedirs(path, exist_ok=True)
+        for name in (DATA_FILE, INDEX_FILE):
+            open(os.path.join(self.path, name), "ab").close()
+        self.refresh()
+
+    def _recover(self):
+        # A crash between the two appends leaves a partial index record or page data that no record
+        # points at; both are cut off before the first append so it starts from a consistent end.
+        # Only the writer does this: a reader would cut off the page data of an append in progress.
+        index_size = os.path.getsize(self._index_path)
+        whole = index_size - index_size % PAGE_RECORD.itemsize
+        if whole != index_size:
+            os.truncate(self._index_path, whole)
+        records = np.fromfile(self._index_path, dtype=PAGE_RECORD)
+        data_end = int((records["offset"] + records["length"]).max()) if len(records) else 0
+        if os.path.getsize(self._data_path) > data_end:
+            os.truncate(self._data_path, data_end)
+
+    def refresh(self):
+        """Maps any pages appended to the files since the store was opened or last refreshed."""
+        with self._lock:
+            rows = os.path.getsize(self._index_path) // PAGE_RECORD.itemsize
+            if rows == len(self._records):
+                return
+            records = np.memmap(self._index_path, dtype=PAGE_RECORD, mode="r", shape=(rows,))
+            with open(self._data_path, "rb") as file:
+                # Every stored page has a non-empty compressed blob, so the data file is not empty here
+                data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            hashes, starts, counts = np.unique(records["pdf_hash"], return_index=True, return_counts=True)
+            self._documents = {pdf_hash.decode(): (int(start), int(count))
+                               for pdf_hash, start, count in zip(hashes, starts, counts)}
+            self._records = records
+            self._data = data
+
+    def __len__(self):
+        return len(self._documents)
+
+    def __contains__(self, pdf_hash):
+        return self._rows(pdf_hash, refresh=True) is not None
+
+    def _rows(self, pdf_hash, refresh=False):
+        rows = self._documents.get(pdf_hash)
+        if rows is None and refresh:
+            # Another process may have added the document after this one mapped the files
+            self.refresh()
+            rows = self._documents.get(pdf_hash)
+        return rows
+
+    def _slice(self, pdf_hash, start, stop):
+        rows = self._rows(pdf_hash, refresh=True)
+        if rows is None:
+            raise KeyError(pdf_hash)
+        first, count = rows
+        return self._records[first:first + count][start:stop]
+
+    def page_count(self, pdf_hash):
+        """Returns the number of pages stored for the PDF."""
+        return len(self._slice(pdf_hash, None, None))
+
+    def layout(self, pdf_hash, start=None, stop=None):
+        """Returns the index records of a page range; a read-only view of the memory-mapped index."""
+        return self._slice(pdf_hash, start, stop)
+
+    def compressed_pages(self, pdf_hash, start=None, stop=None):
+        """Returns zero-copy memoryviews of the compressed texts of a page range."""
+        records = self.layout(pdf_hash, start, stop)
+        data = memoryview(self._data)
+        return [data[offset:offset + length] for offset, length in
+                zip(records["offset"].tolist(), records["length"].tolist())]
+
+    def pages(self, pdf_hash, start=None, stop=None):
+        """Returns (page_number, text) for each page of a page range."""
+        records = self.layout(pdf_hash, start, stop)
+        return [(page_number, self._decompress(offset, length)) for page_number, offset, length in
+                zip(records["page_number"].tolist(), records["offset"].tolist(), records["length"].tolist())]
+
+    def _decompress(self, offset, length):
+        return zlib.decompress(self._data[offset:offset + length]).decode("utf-8")
+
+    def iter_page_text(self, pdf_hash, max_chars=None, max_tokens=None, count_tokens=count_words, sample="head"):
+        """Yields (page_number, text) under the same budgets and sampling as `pdf_text.iter_page_text`.
+
+        Only the pages the budget reaches are decompressed.
+        """
+        records = self.layout(pdf_hash)
+        offsets, lengths = records["offset"].tolist(), records["length"].tolist()
+        page_numbers = records["page_number"].tolist()
+        for index, text in iter_budgeted_pages(len(records), lambda index: self._decompress(offsets[index],
+                                                                                            lengths[index]),
+                                               max_chars=max_chars, max_tokens=max_tokens,
+                                               count_tokens=count_tokens, sample=sample):
+            yield page_numbers[index], text
+
+    def text(self, pdf_hash, max_chars=None, sample="head"):
+        """Returns the stored text of the PDF, cut to `max_chars` like `pdf_text.extract_text_from_pdf`."""
+        text = "".join(text for _, text in self.iter_page_text(pdf_hash, max_chars=max_chars, sample=sample))
+        return text if max_chars is None else text[:max_chars]
+
+    def put(self, pdf_hash, pages):
+        """Appends the (page_number, text, stats) pages of a PDF; a PDF that is already stored is skipped.
+
+        Returns True if the pages were written.
+        """
+        blobs = [zlib.compress(text.encode("utf-8"), self.compression_level) for _, text, _ in pages]
+        with self._lock:
+            if pdf_hash in self._documents:
+                return False
+            if not self._recovered:
+                self._recover()
+                self._recovered = True
+            offset = os.path.getsize(self._data_path)
+            records = np.zeros(len(pages), dtype=PAGE_RECORD)
+            for record, (page_number, _, stats), blob in zip(records, pages, blobs):
+                record["pdf_hash"] = pdf_hash.encode()
+                record["page_number"] = page_number
+                record["offset"] = offset
+                record["length"] = len(blob)
+                for field in ("chars", "words", "images", "width", "height"):
+                    record[field] = stats.get(field, 0)
+                offset += len(blob)
+            # The page data goes to disk before the index records that point at it
+            with open(self._data_path, "ab") as file:
+                file.write(b"".join(blobs))
+                file.flush()
+                os.fsync(file.fileno())
+            with open(self._index_path, "ab") as file:
+                file.write(records.tobytes())
+            # Mapped before the lock is released, so a thread storing the same PDF next sees it stored
+            self.refresh()
+        return True
+
+    def add_pdf(self, pdf_path, pdf_hash):
+        """Extracts every page of a PDF into the store unless it is already there."""
+        if pdf_hash in self:
+            return False
+        return self.put(pdf_hash, list(iter_page_layout(pdf_path)))
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_page_store(path=None):
+    """Returns this process's store at `path` (default: PAGE_STORE_PATH, or "page_store")."""
+    path = path or os.environ.get("PAGE_STORE_PATH", "page_store")
+    with _stores_lock:
+        store = _stores.get((os.getpid(), path))
+        if store is None:
+            store = _stores[(os.getpid(), path)] = PageStore(path)
+    return store
+
+
+def document_text(pdf_path, max_chars=None, sample="head", store_path=None):
+    """Returns the text of a PDF from the page store, extracting it into the store on first use."""
+    from result_cache import hash_file
+    store = get_page_store(store_path)
+    pdf_hash = hash_file(pdf_path)
+    store.add_pdf(pdf_path, pdf_hash)
+    return store.text(pdf_hash, max_chars=max_chars, sample=sample)
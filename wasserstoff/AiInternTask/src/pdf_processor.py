@@ -1,12 +1,11 @@
 import os
 import PyPDF2
-import pandas as pd
-from gensim.summarization.summarizer import summarize
-from sklearn.feature_extraction.text import TfidfVectorizer
-from nltk.corpus import stopwords
-import nltk
+from page_store import document_text  # Page texts are parsed once and then read from the store
 
-nltk.download('stopwords')
+# gensim, nltk and scikit-learn are imported on first use, and the NLTK stopwords are only
+# downloaded when they are not already in the NLTK data path (never when PIPELINE_OFFLINE=1)
+_stop_words = None
+_keyword_engine = None
 
 def extract_text_from_pdf(pdf_path):
     text = ""
@@ -17,26 +16,39 @@ def extract_text_from_pdf(pdf_path):
     return text
 
 def summarize_text(text, word_count=100):
+    from gensim.summarization.summarizer import summarize
     try:
         return summarize(text, word_count=word_count)
     except ValueError:
         return text  # Return original text if summarization fails
 
-def extract_keywords(text, top_n=10):
-    stop_words = set(stopwords.words('english'))
-    vectorizer = TfidfVectorizer(stop_words=stop_words)
-    tfidf_matrix = vectorizer.fit_transform([text])
-    feature_names = vectorizer.get_feature_names_out()
-    dense = tfidf_matrix.todense()
-    denselist = dense.tolist()
-    df = pd.DataFrame(denselist, columns=feature_names)
+def english_stop_words():
+    global _stop_words
+    if _stop_words is None:
+        import nltk
+        from nltk.corpus import stopwords
+        try:
+            _stop_words = set(stopwords.words('english'))
+        except LookupError:
+            if os.environ.get("PIPELINE_OFFLINE") == "1":
+                raise
+            nltk.download('stopwords', quiet=True)
+            _stop_words = set(stopwords.words('english'))
+    return _stop_words
+
+def keyword_engine():
+    global _keyword_engine
+    if _keyword_engine is None:
+        from tfidf_keywords import TfidfKeywordEngine
+        _keyword_engine = TfidfKeywordEngine(stop_words=sorted(english_stop_words()))
+    return _keyword_engine
 
-    # Get the top N keywords
-    keywords = df.T.nlargest(top_n, 0).index.tolist()
-    return keywords
+def extract_keywords(text, top_n=10):
+    # Scored against the document frequencies of every PDF processed so far, not just this one
+    return keyword_engine().extract_keywords([text], top_n=top_n)[0]
 
 def process_pdf(pdf_path):
-    text = extract_text_from_pdf(pdf_path)
+    text = document_text(pdf_path)
     summary = summarize_text(text)
     keywords = extract_keywords(text)
     return summary, keywords
@@ -55,18 +67,19 @@ def save_results_to_file(filename, summary, keywords, output_dir):
 pdf_directory = r"C:\Users\91730\pythonProject\pdfsummarizer\pythonProject1\src\downloaded_pdfs"
 output_directory = r"C:\Users\91730\pythonProject\pdfsummarizer\output_results"
 
-# Create output directory if it doesn't exist
-os.makedirs(output_directory, exist_ok=True)
+if __name__ == "__main__":
+    # Create output directory if it doesn't exist
+    os.makedirs(output_directory, exist_ok=True)
 
-for filename in os.listdir(pdf_directory):
-    if filename.endswith('.pdf'):
-        pdf_path = os.path.join(pdf_directory, filename)
-        summary, keywords = process_pdf(pdf_path)
+    for filename in os.listdir(pdf_directory):
+        if filename.endswith('.pdf'):
+            pdf_path = os.path.join(pdf_directory, filename)
+            summary, keywords = process_pdf(pdf_path)
 
-        # Save the results to a dynamically named output file
-        save_results_to_file(filename, summary, keywords, output_directory)
+            # Save the results to a dynamically named output file
+            save_results_to_file(filename, summary, keywords, output_directory)
 
-        # Optionally, update MongoDB (if needed)
-        # update_pdf_metadata(filename, summary, keywords)  # Uncomment if needed
+            # Optionally, update MongoDB (if needed)
+            # update_pdf_metadata(filename, summary, keywords)  # Uncomment if needed
 
-print("Processing completed and results saved.")
+    print("Processing completed and results saved.")
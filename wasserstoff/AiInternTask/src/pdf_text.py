@@ -0,0 +1,87 @@
+# src/pdf_text.py
+import math
+
+import fitz  # PyMuPDF
+
+
+def count_words(text):
+    """Cheap token estimate used when no tokenizer is given."""
+    return len(text.split())
+
+
+def _spread_pages(page_count, pages_needed):
+    # Evenly spaced page numbers after the first page, in document order
+    remaining = page_count - 1
+    pages_needed = min(pages_needed, remaining)
+    if pages_needed <= 0:
+        return []
+    step = remaining / pages_needed
+    return sorted({1 + int(i * step) for i in range(pages_needed)})
+
+
+def iter_budgeted_pages(page_count, load_text, max_chars=None, max_tokens=None, count_tokens=count_words,
+                        sample="head"):
+    """Yields (page_number, text) for each page until the character or token budget is met.
+
+    `load_text(page_number)` is only called for the pages that are yielded. With sample="head"
+    pages are read from the start; with sample="spread" the first page is read and the rest of
+    the budget is spread evenly across the document, so later sections are represented as well.
+    """
+    if sample not in ("head", "spread"):
+        raise ValueError(f"Unknown page sampling mode '{sample}'")
+
+    budgeted = max_chars is not None or max_tokens is not None
+    page_numbers = list(range(page_count))
+    chars = 0
+    tokens = 0
+    position = 0
+    while position < len(page_numbers):
+        page_number = page_numbers[position]
+        position += 1
+        text = load_text(page_number)
+        chars += len(text)
+        if max_tokens is not None:
+            tokens += count_tokens(text)
+        yield page_number, text
+
+        if (max_chars is not None and chars >= max_chars) or (max_tokens is not None and tokens >= max_tokens):
+            return
+        if sample == "spread" and page_number == 0 and budgeted:
+            # Estimate from the first page how many more pages the budget needs
+            if max_chars is not None:
+                pages_needed = math.ceil((max_chars - chars) / max(chars, 1))
+            else:
+                pages_needed = math.ceil((max_tokens - tokens) / max(tokens, 1))
+            page_numbers = [0] + _spread_pages(page_count, pages_needed)
+
+
+def iter_page_text(pdf_path, max_chars=None, max_tokens=None, count_tokens=count_words, sample="head",
+                   max_pages=None):
+    """Yields (page_number, text) for each page of a PDF until the character or token budget is met.
+
+    Pages past the budget are never loaded; see `iter_budgeted_pages` for the sampling modes.
+    """
+    with fitz.open(pdf_path) as doc:
+        page_count = doc.page_count if max_pages is None else min(doc.page_count, max_pages)
+        yield from iter_budgeted_pages(page_count, lambda page_number: doc.load_page(page_number).get_text("text"),
+                                       max_chars=max_chars, max_tokens=max_tokens, count_tokens=count_tokens,
+                                       sample=sample)
+
+
+def iter_page_layout(pdf_path):
+    """Yields (page_number, text, stats) for every page, with basic layout stats of each page."""
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            text = page.get_text("text")
+            yield page.number, text, {"chars": len(text), "words": count_words(text),
+                                      "images": len(page.get_images()), "width": page.rect.width,
+                                      "height": page.rect.height}
+
+
+# Function to extract text from a PDF file
+def extract_text_from_pdf(pdf_path, max_chars=None, max_tokens=None, count_tokens=count_words, sample="head"):
+    """Extracts the text of a PDF, stopping once the character or token budget is met."""
+    pages = [text for _, text in iter_page_text(pdf_path, max_chars=max_chars, max_tokens=max_tokens,
+                                               count_tokens=count_tokens, sample=sample)]
+    text = "".join(pages)
+    return text[:max_chars] if max_chars is not None else text
@@ -0,0 +1,86 @@
+# src/result_cache.py
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+def hash_file(path, chunk_size=1 << 20):
+    """Returns the SHA-256 of a file's bytes, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def settings_fingerprint(settings):
+    """Returns a stable hash of the model name and parameters that produced a result."""
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()
+
+
+class ResultCache:
+    """Persistent cache of per-PDF results keyed by the PDF's content hash and the model settings.
+
+    Entries written under other settings are stale and are removed when the cache is opened.
+    Once more than `max_entries` are stored, the least recently used entries are evicted.
+    """
+
+    def __init__(self, path, settings, max_entries=10000):
+        self.path = path
+        self.settings_key = settings_fingerprint(settings)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    pdf_hash TEXT NOT NULL,
+                    settings_key TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (pdf_hash, settings_key)
+                )""")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+        self.purge_stale()
+
+    def get(self, pdf_hash):
+        """Returns the stored results for the PDF, or None on a miss."""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT payload FROM results WHERE pdf_hash = ? AND settings_key = ?",
+                                     (pdf_hash, self.settings_key)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE results SET last_used = ? WHERE pdf_hash = ? AND settings_key = ?",
+                               (time.time(), pdf_hash, self.settings_key))
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, pdf_hash, results):
+        """Stores the results for the PDF and evicts the least recently used entries over the limit."""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                               (pdf_hash, self.settings_key, json.dumps(results), time.time()))
+            self._conn.execute("""
+                DELETE FROM results WHERE rowid IN (
+                    SELECT rowid FROM results ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )""", (self.max_entries,))
+
+    def purge_stale(self):
+        """Removes entries produced with different model settings."""
+        with self._lock, self._conn:
+            removed = self._conn.execute("DELETE FROM results WHERE settings_key != ?",
+                                         (self.settings_key,)).rowcount
+        return removed
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
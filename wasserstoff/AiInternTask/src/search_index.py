@@ -0,0 +1,392 @@
+# src/search_index.py
+import json
+import os
+import re
+import shutil
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+# Lowercased words of two or more characters, cut to a fixed width so the lexicon can be mapped
+TOKEN_PATTERN = re.compile(r"\w\w+")
+MAX_TERM_LENGTH = 32
+
+# Keyword filters are indexed as whole phrases under this prefix, which query tokens never carry
+KEYWORD_PREFIX = "kw:"
+
+# A match in a summary or keyword counts for more than a match in the page text
+FIELD_WEIGHTS = {"text": 1.0, "summary": 2.0, "keyword": 3.0}
+
+MANIFEST_NAME = "manifest.json"
+
+
+def tokenize(text):
+    """Splits text into the index's search terms."""
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_PATTERN.findall(text.lower())]
+
+
+def keyword_term(keyword):
+    """Returns the filter term of a whole keyword phrase."""
+    return (KEYWORD_PREFIX + " ".join(keyword.lower().split()))[:MAX_TERM_LENGTH]
+
+
+def _concat_ranges(starts, counts):
+    # Indices start..start+count-1 of every range, concatenated, without a Python loop
+    total = int(counts.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    ends = np.cumsum(counts)
+    return np.repeat(starts - (ends - counts), counts) + np.arange(total)
+
+
+def _load_array(path):
+    try:
+        return np.load(path, mmap_mode="r")
+    except ValueError:  # Empty arrays cannot be memory-mapped
+        return np.load(path)
+
+
+def _write_segment(path, terms, docs, weights, page_starts, page_counts, pages, documents):
+    """Writes one immutable segment from postings given in any order.
+
+    Each posting is a (term, segment-local document, weighted term frequency) triple whose page
+    numbers are `pages[page_starts[i]:page_starts[i] + page_counts[i]]`. `documents` describes
+    the segment's documents in local id order.
+    """
+    lexicon, term_ids = np.unique(np.asarray(terms, dtype=str), return_inverse=True)
+    order = np.lexsort((docs, term_ids))
+    term_ids, docs, weights, page_counts = term_ids[order], docs[order], weights[order], page_counts[order]
+    pages = pages[_concat_ranges(page_starts[order], page_counts)]
+
+    offsets = np.zeros(len(lexicon) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(term_ids, minlength=len(lexicon)))
+    page_offsets = np.zeros(len(docs) + 1, dtype=np.int64)
+    page_offsets[1:] = np.cumsum(page_counts)
+
+    # Built next to the final path and renamed into place, so readers never see half a segment
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    arrays = {
+        "lexicon": lexicon,
+        "offsets": offsets,
+        "docs": docs.astype(np.int32),
+        "weights": weights.astype(np.float32),
+        "page_offsets": page_offsets,
+        "pages": pages.astype(np.int32),
+        "lengths": np.array([document["length"] for document in documents], dtype=np.float32),
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), array)
+    with open(os.path.join(tmp_path, "documents.json"), "w") as file:
+        json.dump(documents, file)
+    os.replace(tmp_path, path)
+
+
+class _Segment:
+    def __init__(self, path, deleted):
+        for name in ("lexicon", "offsets", "docs", "weights", "page_offsets", "pages", "lengths"):
+            setattr(self, name, _load_array(os.path.join(path, f"{name}.npy")))
+        with open(os.path.join(path, "documents.json")) as file:
+            self.documents = json.load(file)
+        self.alive = np.ones(len(self.documents), dtype=bool)
+        self.alive[list(deleted)] = False
+
+    def postings(self, term):
+        """Returns the (start, end) range of a term's postings, or None if it does not occur."""
+        index = int(np.searchsorted(self.lexicon, term))
+        if index == len(self.lexicon) or self.lexicon[index] != term:
+            return None
+        return int(self.offsets[index]), int(self.offsets[index + 1])
+
+    def postings_arrays(self, base):
+        # Live postings with documents renumbered from `base`, for merging segments
+        remap = np.full(len(self.documents), -1, dtype=np.int64)
+        remap[self.alive] = np.arange(int(self.alive.sum())) + base
+        keep = self.alive[self.docs]
+        terms = np.repeat(np.asarray(self.lexicon), np.diff(self.offsets))[keep]
+        page_offsets = np.asarray(self.page_offsets)
+        return (terms, remap[self.docs][keep], np.asarray(self.weights)[keep], page_offsets[:-1][keep],
+                np.diff(page_offsets)[keep])
+
+
+class SearchIndex:
+    """On-disk inverted index over page text, summaries and keywords, ranked with BM25.
+
+    Added documents are buffered and written as immutable segments once `flush_documents` of
+    them are waiting (or on `flush`). Queries run on the memory-mapped segment arrays. Adding a
+    document under a key that is already indexed replaces the earlier version. Every
+    `merge_factor` segments of about the same size are merged into one as they are flushed (None
+    turns this off), and `merge` folds every segment into one. Only one process should write to
+    an index at a time.
+    """
+
+    def __init__(self, path, flush_documents=100, merge_factor=10, k1=1.2, b=0.75):
+        self.path = path
+        self.flush_documents = flush_documents
+        self.merge_factor = merge_factor
+        self.k1 = k1
+        self.b = b
+        self._buffer = {}
+        self._lock = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+        self._open()
+
+    def _open(self):
+        manifest_path = os.path.join(self.path, MANIFEST_NAME)
+        if os.path.exists(manifest_path):
+            self._manifest_mtime = os.stat(manifest_path).st_mtime_ns
+            with open(manifest_path) as file:
+                self._manifest = json.load(file)
+        else:
+            self._manifest_mtime = None
+            self._manifest = {"segments": [], "next_segment": 0}
+        self._segments = [_Segment(os.path.join(self.path, entry["name"]), entry["deleted"])
+                          for entry in self._manifest["segments"]]
+        self._locations = {}
+        for segment_index, segment in enumerate(self._segments):
+            for local, document in enumerate(segment.documents):
+                if segment.alive[local]:
+                    self._locations[document["key"]] = (segment_index, local)
+
+    def _save_manifest(self, manifest):
+        manifest_path = os.path.join(self.path, MANIFEST_NAME)
+        with open(f"{manifest_path}.tmp", "w") as file:
+            json.dump(manifest, file)
+        os.replace(f"{manifest_path}.tmp", manifest_path)
+        self._manifest = manifest
+
+    def _new_segment_name(self):
+        # A crash after a segment was renamed into place but before the manifest listed it leaves the
+        # directory behind under the next name; no reader maps it, so the writer replaces it
+        name = f"segment-{self._manifest['next_segment']:06d}"
+        shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+        return name
+
+    def reload(self):
+        """Picks up segments written by another process since the index was last opened."""
+        manifest_path = os.path.join(self.path, MANIFEST_NAME)
+        mtime = os.stat(manifest_path).st_mtime_ns if os.path.exists(manifest_path) else None
+        with self._lock:
+            if mtime != self._manifest_mtime:
+                self._open()
+
+    def __len__(self):
+        with self._lock:
+            return len(set(self._locations) | set(self._buffer))
+
+    def add_document(self, key, pages, summaries=None, keywords=None, name=None, pdf_hash=None):
+        """Queues a document for the next segment.
+
+        `pages` is a list of (page_number, text) pairs and `summaries` a dict of summary texts.
+        """
+        with self._lock:
+            self._buffer.pop(key, None)
+            self._buffer[key] = {"key": key, "name": name or key, "pdf_hash": pdf_hash, "pages": pages,
+                                 "summaries": summaries or {}, "keywords": list(keywords or [])}
+            if len(self._buffer) >= self.flush_documents:
+                self.flush()
+
+    def flush(self):
+        """Writes the queued documents as a new segment; they stay queued if writing it fails."""
+        with self._lock:
+            if not self._buffer:
+                return
+            documents = list(self._buffer.values())
+
+            terms, docs, weights, page_lists, table = [], [], [], [], []
+            for local, document in enumerate(documents):
+                postings = {}
+                for page_number, text in document["pages"]:
+                    for term in tokenize(text):
+                        entry = postings.setdefault(term, [0.0, []])
+                        entry[0] += FIELD_WEIGHTS["text"]
+                        if not entry[1] or entry[1][-1] != page_number:
+                            entry[1].append(page_number)
+                fields = [("summary", summary) for summary in document["summaries"].values()]
+                fields += [("keyword", keyword) for keyword in document["keywords"]]
+                for field, text in fields:
+                    for term in tokenize(text):
+                        postings.setdefault(term, [0.0, []])[0] += FIELD_WEIGHTS[field]
+                length = sum(weight for weight, _ in postings.values())
+                for keyword in document["keywords"]:
+                    postings.setdefault(keyword_term(keyword), [0.0, []])
+
+                for term, (weight, term_pages) in postings.items():
+                    terms.append(term)
+                    docs.append(local)
+                    weights.append(weight)
+                    page_lists.append(term_pages)
+                table.append({"key": document["key"], "name": document["name"], "pdf_hash": document["pdf_hash"],
+                              "keywords": document["keywords"], "length": length})
+
+            page_counts = np.array([len(term_pages) for term_pages in page_lists], dtype=np.int64)
+            page_starts = np.zeros(len(page_counts), dtype=np.int64)
+            page_starts[1:] = np.cumsum(page_counts)[:-1]
+            pages = np.array([page for term_pages in page_lists for page in term_pages], dtype=np.int64)
+
+            name = self._new_segment_name()
+            _write_segment(os.path.join(self.path, name), terms, np.array(docs, dtype=np.int64),
+                           np.array(weights, dtype=np.float64), page_starts, page_counts, pages, table)
+
+            # Earlier versions of the re-added documents are deleted in the same manifest update, which
+            # only replaces the one in memory once it is saved
+            segments = [dict(entry, deleted=list(entry["deleted"])) for entry in self._manifest["segments"]]
+            for document in table:
+                if document["key"] in self._locations:
+                    segment_index, local = self._locations[document["key"]]
+                    segments[segment_index]["deleted"].append(local)
+            segments.append({"name": name, "deleted": []})
+            self._save_manifest({"segments": segments, "next_segment": self._manifest["next_segment"] + 1})
+            self._buffer = {}
+            self._open()
+            self._merge_policy()
+
+    def merge(self):
+        """Rewrites every segment into one, dropping deleted documents."""
+        with self._lock:
+            self.flush()
+            deleted = sum(len(entry["deleted"]) for entry in self._manifest["segments"])
+            if len(self._segments) > 1 or deleted:
+                self._merge_segments(list(range(len(self._segments))))
+
+    def _merge_policy(self):
+        # Tiered merging: a segment's tier is how many times merge_factor its live documents reach
+        # past flush_documents, and once merge_factor segments share a tier they become one segment
+        # of the next. Queries then scan O(log n) segments and each document is rewritten O(log n)
+        # times, however small the flushes are.
+        if not self.merge_factor:
+            return
+        while True:
+            tiers = {}
+            for position, segment in enumerate(self._segments):
+                size, tier, limit = int(segment.alive.sum()), 0, self.flush_documents * self.merge_factor
+                while size >= limit:
+                    tier, limit = tier + 1, limit * self.merge_factor
+                tiers.setdefault(tier, []).append(position)
+            full = [positions for positions in tiers.values() if len(positions) >= self.merge_factor]
+            if not full:
+                return
+            self._merge_segments(full[0][:self.merge_factor])
+
+    def _merge_segments(self, positions):
+        # Rewrites the segments at `positions` into one, dropping their deleted documents
+        parts, documents, page_arrays, page_base = [], [], [], 0
+        for position in positions:
+            segment = self._segments[position]
+            terms, docs, weights, page_starts, page_counts = segment.postings_arrays(len(documents))
+            parts.append((terms, docs, weights, page_starts + page_base, page_counts))
+            documents.extend(document for document, alive in zip(segment.documents, segment.alive) if alive)
+            page_arrays.append(np.asarray(segment.pages, dtype=np.int64))
+            page_base += len(segment.pages)
+
+        entries = self._manifest["segments"]
+        old_names = [entries[position]["name"] for position in positions]
+        merged = set(positions)
+        segments = [entry for position, entry in enumerate(entries) if position not in merged]
+        if documents:
+            name = self._new_segment_name()
+            _write_segment(os.path.join(self.path, name), np.concatenate([part[0] for part in parts]),
+                           *[np.concatenate([part[index] for part in parts]) for index in range(1, 5)],
+                           np.concatenate(page_arrays), documents)
+            segments.append({"name": name, "deleted": []})
+        self._save_manifest({"segments": segments, "next_segment": self._manifest["next_segment"] + 1})
+        self._open()
+        for old_name in old_names:
+            # Readers in other processes may still map the old files; on Windows they stay behind
+            shutil.rmtree(os.path.join(self.path, old_name), ignore_errors=True)
+
+    def search(self, query, top_k=10, keywords=None):
+        """Returns the best `top_k` documents for the query, optionally only those with all `keywords`.
+
+        Each result carries its BM25 score and, per query term, the pages the term occurs on.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            segments = list(self._segments)
+        if not segments:
+            return []
+
+        # Corpus statistics over the live documents of every segment
+        live_documents = sum(int(segment.alive.sum()) for segment in segments)
+        if not live_documents:
+            return []
+        average_length = sum(float(segment.lengths[segment.alive].sum()) for segment in segments) / live_documents
+        spans = [[segment.postings(term) for term in terms] for segment in segments]
+        document_frequency = np.zeros(len(terms))
+        for segment, segment_spans in zip(segments, spans):
+            for index, span in enumerate(segment_spans):
+                if span is not None:
+                    document_frequency[index] += segment.alive[segment.docs[span[0]:span[1]]].sum()
+        idf = np.log(1 + (live_documents - document_frequency + 0.5) / (document_frequency + 0.5))
+
+        candidates = []
+        for segment_index, (segment, segment_spans) in enumerate(zip(segments, spans)):
+            scores = np.zeros(len(segment.documents), dtype=np.float64)
+            matched = np.zeros(len(segment.documents), dtype=bool) if terms else segment.alive.copy()
+            for index, span in enumerate(segment_spans):
+                if span is None:
+                    continue
+                docs = segment.docs[span[0]:span[1]]
+                frequency = segment.weights[span[0]:span[1]]
+                norm = self.k1 * (1 - self.b + self.b * segment.lengths[docs] / average_length)
+                scores[docs] += idf[index] * frequency * (self.k1 + 1) / (frequency + norm)
+                matched[docs] = True
+            matched &= segment.alive
+            for keyword in keywords or []:
+                span = segment.postings(keyword_term(keyword))
+                allowed = np.zeros(len(segment.documents), dtype=bool)
+                if span is not None:
+                    allowed[segment.docs[span[0]:span[1]]] = True
+                matched &= allowed
+
+            hits = np.flatnonzero(matched)
+            if len(hits) > top_k:
+                hits = hits[np.argpartition(-scores[hits], top_k - 1)[:top_k]]
+            candidates.extend((scores[local], segment_index, local) for local in hits)
+
+        candidates.sort(key=lambda candidate: -candidate[0])
+        results = []
+        for score, segment_index, local in candidates[:top_k]:
+            segment = segments[segment_index]
+            document = segment.documents[local]
+            pages = {}
+            for term, span in zip(terms, spans[segment_index]):
+                if span is None:
+                    continue
+                position = span[0] + int(np.searchsorted(segment.docs[span[0]:span[1]], local))
+                if position < span[1] and segment.docs[position] == local:
+                    start, end = segment.page_offsets[position], segment.page_offsets[position + 1]
+                    if end > start:
+                        pages[term] = segment.pages[start:end].tolist()
+            results.append({"key": document["key"], "name": document["name"], "pdf_hash": document["pdf_hash"],
+                            "keywords": document["keywords"], "score": float(score), "pages": pages})
+        return results
+
+
+def make_server(index, host="127.0.0.1", port=8765):
+    """Returns an HTTP server answering GET /search?q=...&keyword=...&k=10 with JSON results."""
+
+    class SearchHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != "/search":
+                self.send_error(404)
+                return
+            params = parse_qs(url.query)
+            index.reload()
+            results = index.search(params.get("q", [""])[0], top_k=int(params.get("k", ["10"])[0]),
+                                   keywords=params.get("keyword"))
+            body = json.dumps(results).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), SearchHandler)
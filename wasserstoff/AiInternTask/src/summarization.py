@@ -0,0 +1,248 @@
+# src/summarization.py
+import time
+
+# Output lengths (in tokens) used for the short, medium and long summaries
+SUMMARY_LENGTHS = {"short": 50, "medium": 100, "long": 200}
+
+
+# Function to summarize the extracted text
+def summarize_text(text, model, tokenizer, max_input_length=512, max_output_length=150, num_beams=4, max_time=None):
+    # Tokenize input
+    inputs = tokenizer.encode("summarize: " + text, return_tensors="pt", max_length=max_input_length, truncation=True)
+
+    # Generate summary; with max_time, generation stops after that many seconds with the best beam so far
+    options = {} if max_time is None else {"max_time": max_time}
+    summary_ids = model.generate(inputs, max_length=max_output_length, min_length=30, length_penalty=2.0,
+                                 num_beams=num_beams, early_stopping=True, **options)
+
+    # Decode summary
+    summary = tokenizer.decode(summary_ids[0], skip_special_tokens=True)
+    return summary
+
+
+def encode_texts(texts, model, tokenizer, max_input_length=512):
+    """Tokenizes a batch of texts once, padded to the longest, and runs the T5 encoder over it."""
+    import torch  # Deferred so that importing this module stays cheap
+    inputs = tokenizer(["summarize: " + text for text in texts], return_tensors="pt", max_length=max_input_length,
+                       truncation=True, padding=True)
+    with torch.no_grad():
+        encoder_outputs = model.get_encoder()(input_ids=inputs["input_ids"], attention_mask=inputs["attention_mask"])
+    return encoder_outputs.last_hidden_state, inputs["attention_mask"]
+
+
+def _generate_from_encoding(model, hidden_state, attention_mask, max_output_length, min_length=30, num_beams=4,
+                            length_penalty=2.0, max_time=None):
+    import torch
+    from transformers.modeling_outputs import BaseModelOutput
+    options = {} if max_time is None else {"max_time": max_time}
+    # generate() expands encoder_outputs in place for beam search, so every call gets a fresh wrapper
+    # around the shared hidden state instead of reusing one output object.
+    with torch.no_grad():
+        return model.generate(encoder_outputs=BaseModelOutput(last_hidden_state=hidden_state),
+                              attention_mask=attention_mask, max_length=max_output_length, min_length=min_length,
+                              length_penalty=length_penalty, num_beams=num_beams, early_stopping=True, **options)
+
+
+def _truncate_at_sentence(text):
+    # Cut a checkpointed summary back to its last complete sentence, if it has one
+    end = text.rfind(".")
+    return text[:end + 1] if end > 0 else text
+
+
+def _strip_padding(ids, tokenizer):
+    # Padding after EOS must not count toward a checkpoint
+    return ids[ids != tokenizer.pad_token_id] if tokenizer.pad_token_id is not None else ids
+
+
+def _decode_checkpoints(summary_ids, tokenizer, names):
+    # Cuts each (name, max_output_length) summary from a longer decode at its token checkpoint
+    checkpoints = [{} for _ in summary_ids]
+    for index, ids in enumerate(summary_ids):
+        ids = _strip_padding(ids, tokenizer)
+        for name, max_output_length in names:
+            checkpoint = tokenizer.decode(ids[:max_output_length], skip_special_tokens=True)
+            checkpoints[index][name] = checkpoint if len(ids) <= max_output_length \
+                else _truncate_at_sentence(checkpoint)
+    return checkpoints
+
+
+def _decode(summary_ids, tokenizer, stopped_early):
+    # A summary cut off by the deadline ends mid-sentence; return it up to its last complete sentence
+    summaries = []
+    for ids in summary_ids:
+        summary = tokenizer.decode(ids, skip_special_tokens=True)
+        if stopped_early and _strip_padding(ids, tokenizer)[-1] != tokenizer.eos_token_id:
+            summary = _truncate_at_sentence(summary)
+        summaries.append(summary)
+    return summaries
+
+
+def summarize_batch_multi_length(texts, model, tokenizer, lengths=None, max_input_length=512, min_length=30,
+                                 num_beams=4, length_penalty=2.0, shared_decode=False, deadline=None):
+    """Summarizes a batch of texts at several output lengths from a single encoder pass.
+
+    Returns one (summaries, timings) pair per text, with summaries keyed by the names in
+    `lengths`. Timings cover the whole batch. With `shared_decode`, only the longest summary is
+    decoded and the shorter ones are cut from it at their token checkpoints, trading some
+    fidelity to independent beam searches for a single decode.
+
+    With a `deadline` (a time.time() value), generation stops when it is reached and returns
+    the best partial summaries; lengths not decoded by then are cut from a longer one.
+    """
+    lengths = lengths or SUMMARY_LENGTHS
+    timings = {}
+
+    def time_left():
+        return None if deadline is None else max(deadline - time.time(), 0.0)
+
+    encode_start_time = time.time()
+    hidden_state, attention_mask = encode_texts(texts, model, tokenizer, max_input_length=max_input_length)
+    timings["encode"] = time.time() - encode_start_time
+
+    summaries = [{} for _ in texts]
+    ordered = sorted(lengths.items(), key=lambda item: item[1], reverse=True)
+    if shared_decode:
+        longest_name, longest_length = ordered[0]
+        decode_start_time = time.time()
+        summary_ids = _generate_from_encoding(model, hidden_state, attention_mask, longest_length,
+                                              min_length=min_length, num_beams=num_beams,
+                                              length_penalty=length_penalty, max_time=time_left())
+        timings[longest_name] = time.time() - decode_start_time
+
+        for index, summary in enumerate(_decode(summary_ids, tokenizer, time_left() == 0.0)):
+            summaries[index][longest_name] = summary
+        for index, checkpoints in enumerate(_decode_checkpoints(summary_ids, tokenizer, ordered[1:])):
+            summaries[index].update(checkpoints)
+        for name, _ in ordered[1:]:
+            timings[name] = 0.0
+    else:
+        longest_ids = None
+        for position, (name, max_output_length) in enumerate(ordered):
+            if longest_ids is not None and time_left() == 0.0:
+                # Out of time: the remaining, shorter summaries come from the longest one
+                for index, checkpoints in enumerate(_decode_checkpoints(longest_ids, tokenizer, ordered[position:])):
+                    summaries[index].update(checkpoints)
+                for skipped, _ in ordered[position:]:
+                    timings[skipped] = 0.0
+                break
+            decode_start_time = time.time()
+            summary_ids = _generate_from_encoding(model, hidden_state, attention_mask, max_output_length,
+                                                  min_length=min_length, num_beams=num_beams,
+                                                  length_penalty=length_penalty, max_time=time_left())
+            for index, summary in enumerate(_decode(summary_ids, tokenizer, time_left() == 0.0)):
+                summaries[index][name] = summary
+            timings[name] = time.time() - decode_start_time
+            longest_ids = summary_ids if longest_ids is None else longest_ids
+
+    return [(document_summaries, dict(timings)) for document_summaries in summaries]
+
+
+def summarize_multi_length(text, model, tokenizer, lengths=None, max_input_length=512, min_length=30, num_beams=4,
+                           length_penalty=2.0, shared_decode=False):
+    """Summarizes one text at several output lengths from a single encoder pass.
+
+    Returns a (summaries, timings) pair keyed by the names in `lengths`; see
+    `summarize_batch_multi_length` for the `shared_decode` trade-off.
+    """
+    return summarize_batch_multi_length([text], model, tokenizer, lengths=lengths, max_input_length=max_input_length,
+                                        min_length=min_length, num_beams=num_beams, length_penalty=length_penalty,
+                                        shared_decode=shared_decode)[0]
+
+
+def chunk_text(text, tokenizer, chunk_tokens=480, overlap_tokens=32):
+    """Splits text into overlapping chunks of at most `chunk_tokens` tokens each."""
+    ids = tokenizer.encode(text, add_special_tokens=False)
+    step = max(1, chunk_tokens - overlap_tokens)
+    return [tokenizer.decode(ids[start:start + chunk_tokens], skip_special_tokens=True)
+            for start in range(0, max(len(ids) - overlap_tokens, 1), step)]
+
+
+def _spread(items, count):
+    # Evenly spaced subset that keeps the beginning, the end and the document order
+    if count >= len(items):
+        return items
+    if count <= 1:
+        return items[:1]
+    step = (len(items) - 1) / (count - 1)
+    return [items[round(i * step)] for i in range(count)]
+
+
+def _reduce_cost(count, chunk_tokens, overlap_tokens, chunk_output_length, levels):
+    # Chunk summaries the later levels need to shrink `count` chunk summaries into one window, or None
+    # if `levels` more levels cannot do it
+    tokens = count * chunk_output_length
+    if tokens <= chunk_tokens:
+        return 0
+    if levels <= 0:
+        return None
+    step = max(1, chunk_tokens - overlap_tokens)
+    chunks = max(1, -(-(tokens - overlap_tokens) // step))
+    rest = _reduce_cost(chunks, chunk_tokens, overlap_tokens, chunk_output_length, levels - 1)
+    return None if rest is None else chunks + rest
+
+
+def _level_chunks(available, chunks_left, levels_after, chunk_tokens, overlap_tokens, chunk_output_length):
+    # The most chunks this level can summarize while leaving the budget the later levels need
+    for count in range(min(available, chunks_left), 0, -1):
+        cost = _reduce_cost(count, chunk_tokens, overlap_tokens, chunk_output_length, levels_after)
+        if cost is not None and count + cost <= chunks_left:
+            return count
+    return 0
+
+
+def _fit_window(summaries, tokenizer, chunk_tokens):
+    # Joins the chunk summaries, dropping evenly spaced ones until the result fits one window
+    for count in range(len(summaries), 0, -1):
+        text = " ".join(_spread(summaries, count))
+        if len(tokenizer.encode(text, add_special_tokens=False)) <= chunk_tokens:
+            return text
+    return text
+
+
+def summarize_hierarchical(text, tokenizer, summarize_batch_fn, lengths=None, chunk_tokens=480, overlap_tokens=32,
+                           chunk_output_length=100, max_depth=2, max_chunks=32):
+    """Summarizes a long text by summarizing its chunks and then the joined chunk summaries.
+
+    `summarize_batch_fn(texts, lengths)` must return one (summaries, timings) pair per text, as
+    `summarize_batch_multi_length` does; all chunks of a level are handed to it at once so they
+    can run in parallel batches. Each level shrinks the text until it fits one chunk of
+    `chunk_tokens` tokens, in at most `max_depth` levels, and the final summaries are made from
+    that chunk. At most `max_chunks` chunk summaries are produced in total: each level takes
+    only as many chunks, sampled evenly across the text, as leaves the later levels enough of
+    the budget to reduce their summaries to one chunk.
+    """
+    lengths = lengths or SUMMARY_LENGTHS
+    timings = {}
+    chunks_left = max_chunks
+    chunk_summaries = None
+
+    for depth in range(1, max_depth + 1):
+        chunks = chunk_text(text, tokenizer, chunk_tokens=chunk_tokens, overlap_tokens=overlap_tokens)
+        if len(chunks) <= 1:
+            break
+        count = _level_chunks(len(chunks), chunks_left, max_depth - depth, chunk_tokens, overlap_tokens,
+                              chunk_output_length)
+        if count == 0:
+            break
+        chunks = _spread(chunks, count)
+        chunks_left -= len(chunks)
+
+        map_start_time = time.time()
+        partials = summarize_batch_fn(chunks, {"chunk": chunk_output_length})
+        chunk_summaries = [summaries["chunk"] for summaries, _ in partials]
+        text = " ".join(chunk_summaries)
+        timings[f"map_level_{depth}"] = time.time() - map_start_time
+
+    # Summaries can tokenize a little longer once joined; whatever still does not fit is left out evenly
+    # rather than cut off at the end by the encoder
+    if len(tokenizer.encode(text, add_special_tokens=False)) > chunk_tokens:
+        if chunk_summaries:
+            text = _fit_window(chunk_summaries, tokenizer, chunk_tokens)
+        else:
+            text = chunk_text(text, tokenizer, chunk_tokens=chunk_tokens, overlap_tokens=0)[0]
+
+    reduce_start_time = time.time()
+    summaries, reduce_timings = summarize_batch_fn([text], lengths)[0]
+    timings.update(reduce_timings)
+    timings["reduce"] = time.time() - reduce_start_time
+    return summaries, timings
@@ -1,36 +1,184 @@
 # src/summarizer.py
-from transformers import pipeline
+import re
 
-# Load pre-trained models for summarization and keyword extraction
-summarizer = pipeline("summarization")
-keyword_extractor = pipeline("ner")
+from model_registry import registry
+from page_store import document_text  # Page texts are parsed once and then read from the store
 
+# Pre-trained pipelines for summarization and keyword extraction, loaded on first use
+summarizer_name = "hf-summarization"
+keyword_extractor_name = "hf-ner"
 
-def summarize_pdf(pdf_path):
-    # For simplicity, we assume that the content is passed as a string.
-    with open(pdf_path, "rb") as f:
-        content = f.read().decode(errors='ignore')  # Simplified content loading
+# Long documents are fed to the pipelines as overlapping token windows, batched across documents
+window_overlap_tokens = 64
+pipeline_batch_size = 8
+window_summary_lengths = (30, 120)  # min/max length of each window's partial summary
+max_summary_depth = 2  # Rounds of summarizing joined partial summaries before the final one
+keyword_min_score = 0.8
 
-    # Adjust the length of the summary based on the document length
+
+def summary_lengths(content):
+    """Returns the (min_length, max_length) of a summary, based on the document length."""
     if len(content) < 500:  # Short PDF
-        min_length = 30
-        max_length = 50
+        return 30, 50
     elif len(content) < 1500:  # Medium PDF
-        min_length = 50
-        max_length = 100
-    else:  # Long PDF
-        min_length = 100
-        max_length = 300
+        return 50, 100
+    return 100, 300  # Long PDF
+
+
+def window_size(tokenizer):
+    """Returns the input tokens per window that fit the pipeline's model."""
+    # Tokenizers without a configured limit report a huge model_max_length
+    return min(tokenizer.model_max_length, 1024) - tokenizer.num_special_tokens_to_add()
+
+
+def split_windows(text, tokenizer, window_tokens, overlap_tokens=None):
+    """Splits text into overlapping windows of at most `window_tokens` tokens.
+
+    Returns (start, end) character spans, so entities found in a window map back onto the text.
+    """
+    offsets = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+    if len(offsets) <= window_tokens:
+        return [(0, len(text))]
+    overlap_tokens = window_overlap_tokens if overlap_tokens is None else overlap_tokens
+    # At most half of each window repeats the previous one
+    overlap_tokens = min(overlap_tokens, window_tokens // 2)
+    step = window_tokens - overlap_tokens
+    windows = []
+    for start in range(0, len(offsets) - overlap_tokens, step):
+        end = min(start + window_tokens, len(offsets))
+        windows.append((offsets[start][0], offsets[end - 1][1]))
+        if end == len(offsets):
+            break
+    return windows
+
+
+def _run_batched(pipe, texts, **params):
+    # One pipeline call over all windows; the pipeline batches them into `pipeline_batch_size` forward passes
+    if not texts:
+        return []
+    return pipe(texts, batch_size=pipeline_batch_size, **params)
+
+
+def merge_entities(entities):
+    """Merges entities found by overlapping windows into one entity per span of the text.
+
+    Entities whose character spans overlap are the same mention seen from two windows; the
+    longest span wins (a window boundary may have cut the other one) and the scores are averaged.
+    """
+    merged = []
+    for entity in sorted(entities, key=lambda entity: (entity["start"], -entity["end"])):
+        group = merged[-1] if merged else None
+        if group is not None and entity["start"] < group["end"]:
+            group["scores"].append(entity["score"])
+            if entity["end"] - entity["start"] > group["end"] - group["start"]:
+                group.update(word=entity["word"], start=entity["start"], end=entity["end"])
+        else:
+            merged.append(dict(word=entity["word"], start=entity["start"], end=entity["end"],
+                               scores=[entity["score"]]))
+    for group in merged:
+        scores = group.pop("scores")
+        group["score"] = sum(scores) / len(scores)
+    return merged
+
+
+def _keywords(entities):
+    # Each distinct entity once, in order of first mention, scored by its best mention
+    best = {}
+    for entity in entities:
+        best[entity["word"]] = max(best.get(entity["word"], 0), entity["score"])
+    return [word for word, score in best.items() if score > keyword_min_score]
+
+
+def extract_keywords_from_texts(texts):
+    """Returns the named-entity keywords of each text, inferring all texts' windows in shared batches."""
+    with registry.use(keyword_extractor_name) as keyword_extractor:
+        window_tokens = window_size(keyword_extractor.tokenizer)
+        windows = [(index, span) for index, text in enumerate(texts)
+                   for span in split_windows(text, keyword_extractor.tokenizer, window_tokens)]
+        results = _run_batched(keyword_extractor, [texts[index][start:end] for index, (start, end) in windows],
+                               aggregation_strategy="simple")
+
+    entities = [[] for _ in texts]
+    for (index, (window_start, _)), window_entities in zip(windows, results):
+        for entity in window_entities:
+            entities[index].append(dict(entity, start=window_start + entity["start"],
+                                        end=window_start + entity["end"]))
+    return [_keywords(merge_entities(document_entities)) for document_entities in entities]
+
+
+def _dedupe_sentences(partials):
+    # Overlapping windows often produce the same sentence at the end of one partial summary and the
+    # start of the next; keep the first occurrence only
+    seen = set()
+    sentences = []
+    for partial in partials:
+        for sentence in re.split(r"(?<=[.!?])\s+", partial.strip()):
+            key = " ".join(sentence.lower().split())
+            if key and key not in seen:
+                seen.add(key)
+                sentences.append(sentence)
+    return " ".join(sentences)
+
+
+def summarize_texts(texts):
+    """Returns a summary of each text, summarizing all texts' windows in shared batches.
+
+    A text longer than one window is summarized window by window; the de-duplicated partial
+    summaries are joined and summarized again until they fit one window (at most
+    `max_summary_depth` rounds), and the final pass uses the text's own summary lengths.
+    """
+    final_lengths = [summary_lengths(text) for text in texts]
+    current = list(texts)
+    summaries = [None] * len(texts)
+    with registry.use(summarizer_name) as summarizer:
+        window_tokens = window_size(summarizer.tokenizer)
+        for depth in range(max_summary_depth + 1):
+            windows = {index: split_windows(text, summarizer.tokenizer, window_tokens)
+                       for index, text in enumerate(current) if summaries[index] is None}
+            if depth == max_summary_depth:
+                # Out of rounds: the final pass reads the first window of what is left
+                windows = {index: spans[:1] for index, spans in windows.items()}
+
+            # Texts that fit one window get their final summary; longer ones are summarized per window
+            groups = {}
+            for index, spans in windows.items():
+                lengths = final_lengths[index] if len(spans) == 1 else window_summary_lengths
+                for start, end in spans:
+                    groups.setdefault(lengths, []).append((index, current[index][start:end]))
+            partials = {index: [] for index in windows}
+            for (min_length, max_length), entries in groups.items():
+                results = _run_batched(summarizer, [text for _, text in entries], min_length=min_length,
+                                       max_length=max_length, truncation=True)
+                for (index, _), result in zip(entries, results):
+                    partials[index].append((result[0] if isinstance(result, list) else result)["summary_text"])
+
+            for index, spans in windows.items():
+                if len(spans) == 1:
+                    summaries[index] = partials[index][0]
+                else:
+                    current[index] = _dedupe_sentences(partials[index])
+            if all(summary is not None for summary in summaries):
+                break
+    return summaries
+
+
+def read_texts(pdf_paths):
+    """Reads the extracted text of each PDF once, from the page store."""
+    return [document_text(pdf_path) for pdf_path in pdf_paths]
+
+
+def process_pdfs(pdf_paths):
+    """Returns (summary, keywords) for each PDF, reading each PDF's text once for both pipelines."""
+    texts = read_texts(pdf_paths)
+    return list(zip(summarize_texts(texts), extract_keywords_from_texts(texts)))
 
-    summary = summarizer(content, min_length=min_length, max_length=max_length)
-    return summary[0]['summary_text']
 
+def summarize_pdf(pdf_path, content=None):
+    content = document_text(pdf_path) if content is None else content
+    return summarize_texts([content])[0]
 
-def extract_keywords(pdf_path):
-    # For simplicity, we assume that the content is passed as a string.
-    with open(pdf_path, "rb") as f:
-        content = f.read().decode(errors='ignore')  # Simplified content loading
 
+def extract_keywords(pdf_path, content=None):
+    content = document_text(pdf_path) if content is None else content
     # Extract keywords (non-generic, domain-specific)
-    keywords = keyword_extractor(content)
-    return [kw['word'] for kw in keywords if kw['score'] > 0.8]
+    return extract_keywords_from_texts([content])[0]
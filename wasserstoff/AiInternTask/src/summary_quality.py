@@ -0,0 +1,109 @@
+# src/summary_quality.py
+import argparse
+import json
+import re
+import statistics
+import time
+from collections import Counter
+
+
+def _tokens(text):
+    return re.findall(r"\w+", text.lower())
+
+
+def _f1(overlap, reference_count, candidate_count):
+    if not overlap:
+        return 0.0
+    precision = overlap / candidate_count
+    recall = overlap / reference_count
+    return 2 * precision * recall / (precision + recall)
+
+
+def rouge_n(reference, candidate, n=1):
+    """Returns the ROUGE-N F1 score of a candidate summary against a reference summary."""
+    reference_tokens, candidate_tokens = _tokens(reference), _tokens(candidate)
+    reference_ngrams = Counter(tuple(reference_tokens[i:i + n]) for i in range(len(reference_tokens) - n + 1))
+    candidate_ngrams = Counter(tuple(candidate_tokens[i:i + n]) for i in range(len(candidate_tokens) - n + 1))
+    overlap = sum((reference_ngrams & candidate_ngrams).values())
+    return _f1(overlap, sum(reference_ngrams.values()), sum(candidate_ngrams.values()))
+
+
+def rouge_l(reference, candidate):
+    """Returns the ROUGE-L F1 score, based on the longest common token subsequence."""
+    reference_tokens, candidate_tokens = _tokens(reference), _tokens(candidate)
+    previous = [0] * (len(candidate_tokens) + 1)
+    for reference_token in reference_tokens:
+        current = [0]
+        for index, candidate_token in enumerate(candidate_tokens):
+            current.append(previous[index] + 1 if reference_token == candidate_token
+                           else max(previous[index + 1], current[index]))
+        previous = current
+    return _f1(previous[-1], len(reference_tokens), len(candidate_tokens))
+
+
+def rouge_scores(reference, candidate):
+    """Returns ROUGE-1, ROUGE-2 and ROUGE-L F1 scores of a candidate against a reference."""
+    return {"rouge1": rouge_n(reference, candidate, 1), "rouge2": rouge_n(reference, candidate, 2),
+            "rougeL": rouge_l(reference, candidate)}
+
+
+def summarize_with_backend(texts, backend, lengths=None, batch_size=4, num_beams=4):
+    """Summarizes the texts with one summarizer backend; returns the summaries and the time taken."""
+    from model_registry import registry, SUMMARIZER_BACKENDS
+    from summarization import summarize_batch_multi_length
+    with registry.use(SUMMARIZER_BACKENDS[backend]) as (model, tokenizer):
+        start_time = time.perf_counter()
+        summaries = []
+        for start in range(0, len(texts), batch_size):
+            results = summarize_batch_multi_length(texts[start:start + batch_size], model, tokenizer,
+                                                   lengths=lengths, num_beams=num_beams)
+            summaries.extend(document_summaries for document_summaries, _ in results)
+        return summaries, time.perf_counter() - start_time
+
+
+def compare_backends(texts, backends, reference_backend="fp32", lengths=None, batch_size=4, num_beams=4):
+    """Scores each backend's summaries against the reference backend's, per summary length.
+
+    Returns, for every backend, its summarization time, its speedup over the reference and the
+    mean ROUGE F1 scores of each summary length.
+    """
+    reference, reference_time = summarize_with_backend(texts, reference_backend, lengths=lengths,
+                                                       batch_size=batch_size, num_beams=num_beams)
+    report = {reference_backend: {"time": reference_time, "speedup": 1.0}}
+    for backend in backends:
+        if backend == reference_backend:
+            continue
+        summaries, backend_time = summarize_with_backend(texts, backend, lengths=lengths, batch_size=batch_size,
+                                                         num_beams=num_beams)
+        scores = {}
+        for name in reference[0] if reference else []:
+            per_document = [rouge_scores(expected[name], actual[name])
+                            for expected, actual in zip(reference, summaries)]
+            scores[name] = {metric: statistics.mean(score[metric] for score in per_document)
+                            for metric in ("rouge1", "rouge2", "rougeL")}
+        report[backend] = {"time": backend_time, "speedup": reference_time / backend_time if backend_time else None,
+                           "rouge": scores}
+    return report
+
+
+if __name__ == "__main__":
+    import main
+    from benchmark import corpus_files, default_corpus, set_thread_count
+    from pdf_text import extract_text_from_pdf
+
+    parser = argparse.ArgumentParser(description="Compares summarizer backends against fp32 output with ROUGE.")
+    parser.add_argument("--corpus", default=default_corpus, help="Folder holding the PDFs to summarize")
+    parser.add_argument("--backends", nargs="+", default=["int8", "onnx"], help="Backends to compare")
+    parser.add_argument("--reference", default="fp32", help="Backend whose summaries are the reference")
+    parser.add_argument("--threads", type=int, default=1, help="Torch/BLAS threads")
+    parser.add_argument("--output", help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    set_thread_count(args.threads)
+    texts = [extract_text_from_pdf(path, max_chars=main.summary_input_chars) for path in corpus_files(args.corpus)]
+    report = compare_backends(texts, args.backends, reference_backend=args.reference,
+                              batch_size=main.summary_batch_size, num_beams=main.summary_num_beams)
+    print(json.dumps(report, indent=4))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=4)
@@ -0,0 +1,130 @@
+# src/tfidf_keywords.py
+import os
+import threading
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+
+
+# Words of two or more characters with at least one letter; bare numbers make poor keywords
+TOKEN_PATTERN = r"(?u)\b(?=\w*[^\W\d_])\w\w+\b"
+
+
+class TfidfKeywordEngine:
+    """Model-free keyword extraction scored against corpus-wide document frequencies.
+
+    Every ingested document adds to the document frequencies, so a term that appears in most
+    PDFs ranks below one that is specific to the document being scored. Documents are counted
+    into sparse matrices and each row's top terms are picked with a partial sort; nothing is
+    densified.
+    """
+
+    def __init__(self, stop_words="english", token_pattern=TOKEN_PATTERN):
+        self.stop_words = stop_words
+        self.token_pattern = token_pattern
+        self.documents = 0
+        self._terms = []
+        self._vocabulary = {}
+        self._document_frequency = np.zeros(1024, dtype=np.int64)
+        self._lock = threading.Lock()
+        # Bumped by every change to the saved state, so that an unchanged engine is not saved again
+        self._generation = 0
+        self._saved_generation = 0
+
+    def __len__(self):
+        return len(self._terms)
+
+    @property
+    def dirty(self):
+        """Whether the vocabulary or document frequencies changed since the last save or load."""
+        return self._generation != self._saved_generation
+
+    def _count(self, texts, update):
+        # Each batch is counted with its own vocabulary (the costly part, done outside the lock),
+        # and its columns are then remapped onto the engine's term ids
+        vectorizer = CountVectorizer(stop_words=self.stop_words, token_pattern=self.token_pattern)
+        try:
+            counts = vectorizer.fit_transform(texts).tocsr()
+            batch_terms = vectorizer.get_feature_names_out()
+        except ValueError:  # Every text was empty or only stop words
+            counts, batch_terms = sparse.csr_matrix((len(texts), 0), dtype=np.int64), []
+
+        with self._lock:
+            columns = np.empty(len(batch_terms), dtype=np.int64)
+            known_terms = len(self._terms)
+            for index, term in enumerate(batch_terms):
+                column = self._vocabulary.get(term)
+                if column is None:
+                    column = self._vocabulary[term] = len(self._terms)
+                    self._terms.append(term)
+                columns[index] = column
+            if update or len(self._terms) > known_terms:
+                self._generation += 1
+
+            if len(self._terms) > len(self._document_frequency):
+                grown = np.zeros(max(len(self._terms), 2 * len(self._document_frequency)), dtype=np.int64)
+                grown[:len(self._document_frequency)] = self._document_frequency
+                self._document_frequency = grown
+
+            indices = columns[counts.indices]
+            if update:
+                # A CSR matrix holds one entry per (document, term) pair, so counting the entries
+                # of each column gives the number of documents that contain the term
+                self._document_frequency[:len(self._terms)] += np.bincount(indices, minlength=len(self._terms))
+                self.documents += len(texts)
+            idf = np.log((1 + self.documents) / (1 + self._document_frequency[:len(self._terms)])) + 1
+            terms = self._terms
+        return counts.indptr, indices, counts.data, idf, terms
+
+    def add_documents(self, texts):
+        """Adds the texts to the corpus document frequencies without scoring them."""
+        self._count(texts, update=True)
+
+    def extract_keywords(self, texts, top_n=5, update=True):
+        """Returns the `top_n` highest TF-IDF terms of each text, best first.
+
+        With `update`, the texts are added to the document frequencies before they are scored.
+        """
+        indptr, indices, counts, idf, terms = self._count(texts, update)
+        scores = counts * idf[indices]
+
+        keywords = []
+        for row in range(len(texts)):
+            start, end = indptr[row], indptr[row + 1]
+            row_scores = scores[start:end]
+            if end - start > top_n:
+                top = np.argpartition(-row_scores, top_n - 1)[:top_n]
+            else:
+                top = np.arange(end - start)
+            top = top[np.argsort(-row_scores[top], kind="stable")]
+            keywords.append([terms[indices[start + index]] for index in top])
+        return keywords
+
+    def save(self, path):
+        """Writes the vocabulary and document frequencies to `path`, replacing it atomically."""
+        with self._lock:
+            terms = np.array(self._terms, dtype=str)
+            document_frequency = self._document_frequency[:len(self._terms)].copy()
+            documents = self.documents
+            generation = self._generation
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as file:
+            np.savez_compressed(file, terms=terms, document_frequency=document_frequency, documents=documents)
+        os.replace(tmp_path, path)
+        self._saved_generation = generation
+
+    @classmethod
+    def load(cls, path, stop_words="english", token_pattern=TOKEN_PATTERN):
+        """Returns the engine saved at `path`, or an empty one if nothing was saved there yet."""
+        engine = cls(stop_words=stop_words, token_pattern=token_pattern)
+        if not os.path.exists(path):
+            return engine
+        with np.load(path) as state:
+            engine._terms = state["terms"].tolist()
+            engine._document_frequency = np.array(state["document_frequency"], dtype=np.int64)
+            engine.documents = int(state["documents"])
+        engine._vocabulary = {term: column for column, term in enumerate(engine._terms)}
+        if len(engine._document_frequency) == 0:
+            engine._document_frequency = np.zeros(1024, dtype=np.int64)
+        return engine
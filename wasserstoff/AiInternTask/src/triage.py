@@ -0,0 +1,90 @@
+# src/triage.py
+import signal
+import threading
+from contextlib import contextmanager
+
+import fitz  # PyMuPDF
+
+from pdf_text import count_words
+
+# Categories a PDF is sorted into before any model runs
+TEXT = "text"
+SCANNED = "scanned"
+ENCRYPTED = "encrypted"
+CORRUPT = "corrupt"
+TRIVIAL = "trivial"
+EMPTY = "empty"
+CATEGORIES = (TEXT, SCANNED, ENCRYPTED, CORRUPT, TRIVIAL, EMPTY)
+
+
+@contextmanager
+def time_limit(seconds):
+    """Raises TimeoutError inside the block once `seconds` have passed.
+
+    Uses SIGALRM, so the limit only applies in the main thread of a process on platforms that
+    have it (such as the extraction worker processes on Linux and macOS); elsewhere the block
+    runs unbounded.
+    """
+    if not seconds or not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def expire(signum, frame):
+        raise TimeoutError(f"Timed out after {seconds} seconds")
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def triage_pdf(pdf_path, sample_pages=3, min_chars_per_page=50, trivial_chars=500):
+    """Sorts a PDF into one of CATEGORIES from its metadata and the text of its first pages.
+
+    Returns a dict with the category, a short reason, the page count, and the sampled pages as
+    (page_number, text, stats) tuples like pdf_text.iter_page_layout yields. A sample with
+    almost no text but with images is a scanned PDF; a whole document shorter than
+    `trivial_chars` is trivial, and its sample is all of its pages; one without any text or
+    images at all is empty.
+    """
+    result = {"category": TEXT, "reason": "", "pages": 0, "sample": [], "images": 0}
+    try:
+        doc = fitz.open(pdf_path)
+    except Exception as e:
+        return dict(result, category=CORRUPT, reason=f"cannot be opened: {e}")
+
+    with doc:
+        if doc.needs_pass:
+            return dict(result, category=ENCRYPTED, reason="needs a password")
+        result["pages"] = doc.page_count
+        if doc.page_count == 0:
+            return dict(result, category=CORRUPT, reason="has no pages")
+
+        sample = result["sample"]
+        try:
+            for page_number in range(min(sample_pages, doc.page_count)):
+                page = doc.load_page(page_number)
+                text = page.get_text("text")
+                images = len(page.get_images())
+                sample.append((page_number, text, {"chars": len(text), "words": count_words(text), "images": images,
+                                                   "width": page.rect.width, "height": page.rect.height}))
+                result["images"] += images
+        except Exception as e:
+            return dict(result, category=CORRUPT, reason=f"page {len(sample)} cannot be read: {e}")
+
+    chars = sum(len(text.strip()) for _, text, _ in sample)
+    if chars < min_chars_per_page * len(sample):
+        if result["images"]:
+            return dict(result, category=SCANNED, reason=f"{chars} characters and {result['images']} images "
+                                                         f"on the first {len(sample)} pages")
+        if result["pages"] > len(sample):
+            # Sparse first pages (a cover, a blank page) in a longer document; let extraction decide
+            return dict(result, reason="sparse first pages")
+        if chars == 0:
+            return dict(result, category=EMPTY, reason=f"no text or images on {len(sample)} pages")
+    if result["pages"] <= len(sample) and chars < trivial_chars:
+        return dict(result, category=TRIVIAL, reason=f"{chars} characters in total")
+    return result
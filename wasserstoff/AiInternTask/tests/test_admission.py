@@ -0,0 +1,127 @@
+# tests/test_admission.py
+import collections
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import admission as admission_module  # noqa: E402
+from admission import AdmissionController, estimate_pdf_cost  # noqa: E402
+from metrics import MetricsSink  # noqa: E402
+from concurrency import StagedPipeline  # noqa: E402
+
+Memory = collections.namedtuple("Memory", "total available")
+MB = 1024 * 1024
+
+
+def controller(sizes, available=8000 * MB, **options):
+    return AdmissionController(estimate_fn=lambda item: {"memory": sizes[item] * MB, "work": sizes[item]},
+                               memory_fn=lambda: Memory(10000 * MB, available), cpu_fn=lambda: 0.0,
+                               cpu_count=8, **options)
+
+
+class TestAdmissionController(unittest.TestCase):
+
+    def setUp(self):
+        # Decisions go to a throwaway metrics file instead of metrics.jsonl in the working directory
+        self.tmp = tempfile.TemporaryDirectory()
+        self.sink = admission_module.sink
+        admission_module.sink = MetricsSink(os.path.join(self.tmp.name, "metrics.jsonl"))
+
+    def tearDown(self):
+        admission_module.sink.close()
+        admission_module.sink = self.sink
+        self.tmp.cleanup()
+
+    def offer_all(self, admission, items):
+        for item in items:
+            admission.offer(item)
+
+    def test_largest_documents_are_admitted_first(self):
+        sizes = {"small": 1, "large": 30, "medium": 10}
+        admission = controller(sizes)
+        self.offer_all(admission, sizes)
+        self.assertEqual([admission.next_item() for _ in range(4)], ["large", "medium", "small", None])
+
+    def test_memory_budget_defers_until_work_is_released(self):
+        sizes = {"a": 60, "b": 60, "c": 10}
+        admission = controller(sizes, memory_budget=100 * MB)
+        self.offer_all(admission, sizes)
+        self.assertEqual(admission.next_item(), "a")
+        # b does not fit next to a, so the smaller c passes it
+        self.assertEqual(admission.next_item(), "c")
+        self.assertIsNone(admission.next_item())
+        admission.release("a")
+        self.assertEqual(admission.next_item(), "b")
+        stats = admission.stats()
+        self.assertEqual(stats["admitted"], 3)
+        self.assertEqual(stats["defer_reasons"], {"memory_budget": 1})
+
+    def test_low_free_memory_slows_admission_but_never_stalls(self):
+        sizes = {"a": 10, "b": 10}
+        admission = controller(sizes, available=1505 * MB)
+        self.offer_all(admission, sizes)
+        # Nothing is in flight, so the first PDF is admitted even under memory pressure
+        self.assertEqual(admission.next_item(), "a")
+        self.assertIsNone(admission.next_item())
+        self.assertEqual(admission.stats()["defer_reasons"], {"memory_pressure": 1})
+        admission.release("a")
+        self.assertEqual(admission.next_item(), "b")
+        self.assertEqual(admission.stats()["forced"], 2)
+
+    def test_skipped_large_document_is_not_starved(self):
+        sizes = {"large": 90, "s1": 5, "s2": 5, "s3": 5, "held": 20}
+        admission = controller(sizes, memory_budget=100 * MB, max_skips=2)
+        self.offer_all(admission, ["held"])
+        self.assertEqual(admission.next_item(), "held")
+        self.offer_all(admission, ["large", "s1", "s2", "s3"])
+        self.assertEqual([admission.next_item(), admission.next_item(), admission.next_item()], ["s1", "s2", None])
+        admission.release("held")
+        admission.release("s1")
+        admission.release("s2")
+        self.assertEqual(admission.next_item(), "large")
+
+    def test_pipeline_stays_under_the_memory_budget(self):
+        sizes = {f"doc{i}": 10 + i for i in range(12)}
+        admission = controller(sizes, memory_budget=40 * MB)
+        lock = threading.Lock()
+        inflight = {"now": 0, "peak": 0}
+
+        def extract(item):
+            with lock:
+                inflight["now"] += sizes[item]
+                inflight["peak"] = max(inflight["peak"], inflight["now"])
+            return item
+
+        def persist(item, value):
+            with lock:
+                inflight["now"] -= sizes[item]
+
+        pipeline = StagedPipeline(extract, lambda item, value: value, persist, use_processes=False,
+                                  admission=admission, poll_interval=0.01)
+        self.assertEqual(pipeline.run(list(sizes))["completed"], 12)
+        self.assertLessEqual(inflight["peak"], 40)
+        self.assertEqual(admission.stats()["inflight"], 0)
+
+
+class TestEstimate(unittest.TestCase):
+
+    def test_estimate_reads_page_count(self):
+        import fitz
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, "doc.pdf")
+            with fitz.open() as doc:
+                for _ in range(3):
+                    doc.new_page()
+                doc.save(path)
+            cost = estimate_pdf_cost(path)
+            self.assertEqual(cost["pages"], 3)
+            self.assertEqual(cost["bytes"], os.path.getsize(path))
+            self.assertGreater(cost["memory"], cost["bytes"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+# tests/test_benchmark.py
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import fitz
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import benchmark  # noqa: E402
+import main  # noqa: E402
+import mongodb_handler  # noqa: E402
+from benchmark import compare_to_baseline, corpus_files, run_suite, time_benchmark  # noqa: E402
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_warmup_runs_are_not_timed(self):
+        calls = []
+        result = time_benchmark(lambda: calls.append(1), warmup=2, trials=3)
+        self.assertEqual(len(calls), 5)
+        self.assertEqual(len(result["trials"]), 3)
+        self.assertLessEqual(result["min"], result["median"])
+
+    def test_compare_to_baseline_flags_regressions_over_threshold(self):
+        baseline = {"benchmarks": {"fast": {"median": 1.0}, "slow": {"median": 1.0}, "same": {"median": 1.0}}}
+        results = {"benchmarks": {"fast": {"median": 0.5}, "slow": {"median": 1.5}, "same": {"median": 1.05},
+                                  "new": {"median": 1.0}, "skipped": {"skipped": "no model"}}}
+        comparison = compare_to_baseline(results, baseline, threshold=0.1)
+        self.assertEqual(comparison["fast"]["status"], "improvement")
+        self.assertEqual(comparison["slow"]["status"], "regression")
+        self.assertEqual(comparison["same"]["status"], "ok")
+        self.assertNotIn("new", comparison)
+        self.assertNotIn("skipped", comparison)
+
+    def test_suite_runs_over_a_corpus(self):
+        with tempfile.TemporaryDirectory() as corpus:
+            for name in ("pdf10.pdf", "pdf2.pdf"):
+                document = fitz.open()
+                document.new_page().insert_text((72, 72), f"Text of {name}")
+                document.save(os.path.join(corpus, name))
+                document.close()
+
+            self.assertEqual([os.path.basename(path) for path in corpus_files(corpus)], ["pdf2.pdf", "pdf10.pdf"])
+            results = run_suite(corpus, names=["extract_pymupdf", "storage_file_write"], warmup=0, trials=2)
+
+        for name in ("extract_pymupdf", "storage_file_write"):
+            self.assertEqual(results["benchmarks"][name]["documents"], 2)
+            self.assertEqual(len(results["benchmarks"][name]["trials"]), 2)
+        self.assertEqual(set(results["environment"]["corpus"]), {"pdf2.pdf", "pdf10.pdf"})
+
+    def test_end_to_end_trials_start_from_empty_stores_in_the_workdir(self):
+        paths = ("result_cache_path", "page_store_path", "search_index_path", "near_duplicate_index_path",
+                 "triage_queue_path")
+        # Restored afterwards, with the stores the benchmark resets
+        settings = {name: getattr(main, name)
+                    for name in paths + ("_result_cache", "_search_index", "_near_duplicate_index")}
+        trials = []
+        production = (mongodb_handler.mongodb_uri, mongodb_handler.collection_name, mongodb_handler._writer)
+
+        def process_files(files):
+            trials.append({name: getattr(main, name) for name in paths})
+            self.assertIsNone(main._search_index)
+            self.assertIsNone(main._near_duplicate_index)
+            # Metadata goes to the benchmark collection on the benchmark's server
+            self.assertEqual(main.get_writer().collection.full_name, "pdf_database.benchmark_metadata")
+            self.assertEqual(mongodb_handler.mongodb_uri, "mongodb://benchmark.invalid:27017/")
+
+        with tempfile.TemporaryDirectory() as workdir, \
+                mock.patch.multiple(main, process_files=process_files, **settings), \
+                mock.patch.object(benchmark, "_load_model"), mock.patch.object(benchmark, "_mongo_collection"):
+            run, count = benchmark.bench_end_to_end({"workdir": workdir, "files": [],
+                                                     "mongodb_uri": "mongodb://benchmark.invalid:27017/"})
+            run()
+            run()
+            self.assertEqual((mongodb_handler.mongodb_uri, mongodb_handler.collection_name, mongodb_handler._writer),
+                             production)
+            for trial in trials:
+                for path in trial.values():
+                    self.assertEqual(os.path.commonpath([path, workdir]), workdir)
+                    self.assertFalse(os.path.exists(path))
+            self.assertTrue(all(trials[0][name] != trials[1][name] for name in paths))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+# tests/test_cli.py
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+
+import cli  # noqa: E402
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_importing_pipeline_modules_loads_no_heavy_libraries(self):
+        code = ("import sys, main, summarizer, pdf_processor, pdf_summarizer, mongodb_handler, cli; "
+                "print([name for name in ('torch', 'transformers', 'nltk', 'gensim', 'pandas') "
+                "if name in sys.modules])")
+        with tempfile.TemporaryDirectory() as workdir:
+            output = subprocess.run([sys.executable, "-c", code], cwd=workdir, capture_output=True, text=True,
+                                    env=dict(os.environ, PYTHONPATH=SRC), check=True).stdout
+            # PyMuPDF may print a deprecation notice for the fitz name first
+            self.assertEqual(output.strip().splitlines()[-1], "[]")
+            # Nothing is written just by importing
+            self.assertEqual(os.listdir(workdir), [])
+
+
+class TestCli(unittest.TestCase):
+
+    def test_report_options_are_passed_through(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            metrics_path = os.path.join(workdir, "metrics.jsonl")
+            with open(metrics_path, "w") as file:
+                file.write(json.dumps({"ts": 1.0, "event": "stage", "stage": "extraction", "status": "ok",
+                                       "wall_time": 0.5}) + "\n")
+            output_path = os.path.join(workdir, "report.json")
+            self.assertEqual(cli.main(["report", "--metrics", metrics_path, "--output", output_path]), 0)
+            with open(output_path) as file:
+                self.assertEqual(json.load(file)["stages"]["extraction"]["count"], 1)
+
+    def test_offline_and_cache_options_set_the_environment(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            args, _ = cli.build_parser().parse_known_args(
+                ["--offline", "--model-cache", os.path.join(workdir, "models"), "--corpus-cache",
+                 os.path.join(workdir, "corpora"), "report"])
+            saved = dict(os.environ)
+            try:
+                cli.configure_environment(args)
+                self.assertEqual(os.environ["HF_HUB_OFFLINE"], "1")
+                self.assertEqual(os.environ["HF_HOME"], os.path.join(workdir, "models"))
+                self.assertEqual(os.environ["NLTK_DATA"], os.path.join(workdir, "corpora"))
+                self.assertTrue(os.path.isdir(os.path.join(workdir, "models")))
+            finally:
+                os.environ.clear()
+                os.environ.update(saved)
+
+    def test_unknown_options_are_rejected_for_pipeline_commands(self):
+        with self.assertRaises(SystemExit):
+            cli.main(["keywords", "a.pdf", "--bogus"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+# tests/test_concurrency.py
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from concurrency import StagedPipeline  # noqa: E402
+
+
+def extract_length(item):
+    if item == "corrupt":
+        raise EOFError("truncated file")
+    return len(item)
+
+
+def extract_or_hang(item):
+    if item == "hang":
+        time.sleep(60)
+    return len(item)
+
+
+class TestStagedPipeline(unittest.TestCase):
+    def run_pipeline(self, items, use_processes):
+        persisted = {}
+        errors = []
+        lock = threading.Lock()
+
+        def persist(item, value):
+            with lock:
+                persisted[item] = value
+
+        pipeline = StagedPipeline(extract_length, lambda item, length: length * 10, persist, extract_workers=2,
+                                  infer_workers=2, queue_size=1, use_processes=use_processes,
+                                  on_error=lambda item, stage, e: errors.append((item, stage)))
+        stats = pipeline.run(items)
+        return persisted, errors, stats
+
+    def test_items_flow_through_every_stage(self):
+        items = ["a" * n for n in range(1, 21)]
+        persisted, errors, stats = self.run_pipeline(items, use_processes=False)
+        self.assertEqual(persisted, {item: len(item) * 10 for item in items})
+        self.assertEqual(errors, [])
+        self.assertEqual(stats, {"submitted": 20, "completed": 20, "failed": 0})
+
+    def test_extraction_in_worker_processes(self):
+        persisted, _, stats = self.run_pipeline(["pdf", "pdf12"], use_processes=True)
+        self.assertEqual(persisted, {"pdf": 30, "pdf12": 50})
+        self.assertEqual(stats["completed"], 2)
+
+    def test_failures_are_reported_and_do_not_stop_the_pipeline(self):
+        persisted, errors, stats = self.run_pipeline(["good", "corrupt"], use_processes=False)
+        self.assertEqual(persisted, {"good": 40})
+        self.assertEqual(errors, [("corrupt", "extract")])
+        self.assertEqual(stats["failed"], 1)
+
+    def test_hung_extraction_times_out_and_its_worker_is_replaced(self):
+        persisted = {}
+        errors = []
+        pipeline = StagedPipeline(extract_or_hang, lambda item, length: length,
+                                  lambda item, value: persisted.update({item: value}), extract_workers=1,
+                                  poll_interval=0.05, extract_timeout=0.5,
+                                  on_error=lambda item, stage, e: errors.append((item, stage, type(e))))
+        start = time.monotonic()
+        stats = pipeline.run(["hang", "ok"])
+        self.assertLess(time.monotonic() - start, 20)
+        self.assertEqual(persisted, {"ok": 2})
+        self.assertEqual(errors, [("hang", "extract", TimeoutError)])
+        self.assertEqual(stats["timed_out"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+# tests/test_decoding.py
+import os
+import sys
+import tempfile
+import time
+import unittest
+from contextlib import contextmanager
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import main  # noqa: E402
+from decoding import DecodeCostModel, strategy_name  # noqa: E402
+from inference_scheduler import InferenceScheduler  # noqa: E402
+from metrics import MetricsSink  # noqa: E402
+from summarization import summarize_batch_multi_length  # noqa: E402
+
+LENGTHS = {"short": 50, "medium": 100, "long": 200}
+
+
+class TestDecodeCostModel(unittest.TestCase):
+
+    def test_uncalibrated_model_scales_the_default_by_beams(self):
+        model = DecodeCostModel(default_step_seconds=0.001)
+        self.assertAlmostEqual(model.predict(4, 2, [50, 100]), 0.001 * 4 * 2 * 150)
+
+    def test_untimed_beam_counts_are_scaled_from_the_closest_timed_one(self):
+        model = DecodeCostModel()
+        model.record(4, batch_size=2, output_tokens=350, seconds=1.4)
+        self.assertAlmostEqual(model.step_seconds(4), 0.002)
+        self.assertAlmostEqual(model.step_seconds(1), 0.0005)
+
+    def test_plan_picks_the_best_strategy_that_fits_the_budget(self):
+        model = DecodeCostModel()
+        model.record(4, 1, 350, 3.5)
+        model.record(2, 1, 350, 1.75)
+        model.record(1, 1, 350, 0.7)
+        self.assertEqual(model.plan(10.0, 1, LENGTHS)["strategy"], "full_beam")
+        self.assertEqual(model.plan(2.5, 1, LENGTHS)["strategy"], "small_beam")
+        plan = model.plan(1.0, 1, LENGTHS)
+        self.assertEqual((plan["strategy"], plan["shared_decode"]), ("greedy", False))
+        # One shared greedy decode of the longest summary, then shorter outputs
+        self.assertTrue(model.plan(0.5, 1, LENGTHS)["shared_decode"])
+        self.assertEqual(model.plan(0.5, 1, LENGTHS)["lengths"], LENGTHS)
+        self.assertEqual(model.plan(0.1, 1, LENGTHS)["lengths"], {"short": 16, "medium": 20, "long": 40})
+        self.assertEqual(model.plan(10.0, 1, LENGTHS, max_beams=2)["strategy"], "small_beam")
+
+    def test_strategy_names(self):
+        self.assertEqual([strategy_name(beams) for beams in (1, 2, 4, 8)],
+                         ["greedy", "small_beam", "full_beam", "beam_8"])
+
+
+class SlowModel:
+    """Stands in for T5: every generate() call takes `seconds` unless max_time stops it sooner."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.max_times = []
+
+    def get_encoder(self):
+        import torch
+        return lambda input_ids, attention_mask: type("Output", (), {
+            "last_hidden_state": torch.zeros(input_ids.shape[0], input_ids.shape[1], 4)})()
+
+    def generate(self, encoder_outputs, attention_mask, max_length, max_time=None, **options):
+        import torch
+        self.max_times.append(max_time)
+        time.sleep(self.seconds if max_time is None else min(self.seconds, max_time))
+        # Sentences of four tokens; only a decode that ran its full time reaches EOS (1)
+        ids = [3 + index % 4 for index in range(max_length)]
+        if max_time is None or max_time >= self.seconds:
+            ids[-1] = 1
+        return torch.tensor([ids] * attention_mask.shape[0])
+
+
+class WordTokenizer:
+    pad_token_id = 0
+    eos_token_id = 1
+
+    def __call__(self, texts, **options):
+        import torch
+        ids = torch.ones(len(texts), 3, dtype=torch.long)
+        return {"input_ids": ids, "attention_mask": ids}
+
+    def decode(self, ids, skip_special_tokens=True):
+        return " ".join("end." if int(i) == 6 else f"w{int(i)}" for i in ids if int(i) > 1)
+
+
+class TestDeadline(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # The first import of transformers takes seconds and must not eat into the deadlines below
+        import transformers.modeling_outputs  # noqa: F401
+
+    def test_without_a_deadline_every_length_is_decoded(self):
+        model = SlowModel(0.0)
+        summaries, _ = summarize_batch_multi_length(["text"], model, WordTokenizer(), lengths=LENGTHS)[0]
+        self.assertEqual(model.max_times, [None, None, None])
+        self.assertEqual(len(summaries["short"].split()), 49)
+
+    def test_deadline_stops_generation_and_fills_the_rest_from_checkpoints(self):
+        model = SlowModel(0.3)
+        started = time.time()
+        summaries, timings = summarize_batch_multi_length(["text"], model, WordTokenizer(), lengths=LENGTHS,
+                                                          deadline=time.time() + 0.1)[0]
+        self.assertLess(time.time() - started, 0.25)
+        # Only the longest summary was generated, within the time left
+        self.assertEqual(len(model.max_times), 1)
+        self.assertLessEqual(model.max_times[0], 0.1)
+        self.assertEqual(timings["short"], 0.0)
+        # The partial summaries end at a complete sentence
+        for summary in summaries.values():
+            self.assertTrue(summary.endswith("end."))
+        self.assertLess(len(summaries["short"].split()), len(summaries["long"].split()))
+
+
+class TestQueuedDeadline(unittest.TestCase):
+    """A document's latency budget starts when it is submitted, not when its batch runs."""
+
+    def test_deadline_is_set_at_submission(self):
+        batches = []
+
+        def batch_fn(requests, lengths, latency_budget):
+            batches.append((time.time(), requests))
+            return [({}, {}, {}) for _ in requests]
+
+        scheduler = InferenceScheduler(batch_fn, max_batch_size=8, max_wait=0.2)
+        with mock.patch.object(main, "summary_scheduler", scheduler):
+            submitted = time.time()
+            main.summarize_through_scheduler(["a", "b"], LENGTHS, latency_budget=5.0)
+        scheduler.stop()
+        (dispatched, requests), = batches
+        self.assertGreaterEqual(dispatched - submitted, 0.15)
+        for text, deadline in requests:
+            self.assertAlmostEqual(deadline, submitted + 5.0, delta=0.05)
+
+    def test_batch_is_planned_for_the_time_left_before_its_earliest_deadline(self):
+        calls = []
+
+        @contextmanager
+        def use(name):
+            yield None, None
+
+        def fake_summarize(texts, model, tokenizer, lengths, num_beams, shared_decode, deadline):
+            calls.append(deadline)
+            return [({name: "summary." for name in lengths}, {"encode": 0.0}) for _ in texts]
+
+        cost_model = DecodeCostModel()
+        now = time.time()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        sink = MetricsSink(os.path.join(tmp.name, "metrics.jsonl"))
+        self.addCleanup(sink.close)
+        with mock.patch.object(main, "sink", sink), mock.patch.object(main.registry, "use", use), \
+                mock.patch.object(main, "summarize_batch_multi_length", fake_summarize), \
+                mock.patch.object(main, "decode_cost_model", cost_model), \
+                mock.patch.object(cost_model, "plan", wraps=cost_model.plan) as plan:
+            results = main.summarize_batch([("a", now + 1.0), ("b", now + 3.0)], LENGTHS, latency_budget=3.0)
+        self.assertEqual(calls, [now + 1.0])
+        self.assertLessEqual(plan.call_args[0][0], 1.0)
+        self.assertEqual(len(results), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+# tests/test_download_pdfs.py
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from download_pdfs import DownloadManifest, create_session, download_pdf, iter_downloads  # noqa: E402
+
+FILES = {"/a.pdf": b"%PDF-1.4 " + b"a" * 5000, "/b.pdf": b"%PDF-1.4 " + b"b" * 3000}
+
+
+class PdfHandler(BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def do_GET(self):
+        self.requests_seen.append((self.path, self.headers.get("Range"), self.headers.get("If-None-Match")))
+        body = FILES[self.path]
+        etag = f'"{len(body)}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        range_header = self.headers.get("Range")
+        if range_header:
+            start = int(range_header.split("=")[1].rstrip("-"))
+            self.send_response(206)
+            body = body[start:]
+        else:
+            self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestDownloadPdfs(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), PdfHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        PdfHandler.requests_seen = []
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_downloads_concurrently_then_skips_unchanged_files(self):
+        urls = {"a": self.base_url + "/a.pdf", "b": self.base_url + "/b.pdf"}
+        first = {name: status for name, _, status in iter_downloads(urls, self.tmp.name, max_workers=2)}
+        self.assertEqual(first, {"a": "downloaded", "b": "downloaded"})
+        with open(os.path.join(self.tmp.name, "a.pdf"), "rb") as file:
+            self.assertEqual(file.read(), FILES["/a.pdf"])
+
+        second = {name: status for name, _, status in iter_downloads(urls, self.tmp.name, max_workers=2)}
+        self.assertEqual(second, {"a": "unchanged", "b": "unchanged"})
+
+    def test_resumes_partial_download_with_range_request(self):
+        part_path = os.path.join(self.tmp.name, "a.pdf.part")
+        with open(part_path, "wb") as file:
+            file.write(FILES["/a.pdf"][:1200])
+
+        manifest = DownloadManifest(self.tmp.name)
+        pdf_path, status = download_pdf(create_session(), "a", self.base_url + "/a.pdf", self.tmp.name, manifest)
+
+        self.assertEqual(status, "downloaded")
+        self.assertEqual(PdfHandler.requests_seen[-1][1], "bytes=1200-")
+        with open(pdf_path, "rb") as file:
+            self.assertEqual(file.read(), FILES["/a.pdf"])
+        self.assertFalse(os.path.exists(part_path))
+        self.assertEqual(manifest.get("a")["size"], len(FILES["/a.pdf"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+# tests/test_hierarchical_summary.py
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from summarization import _spread, chunk_text, summarize_hierarchical  # noqa: E402
+
+MAX_INPUT_LENGTH = 512
+PREFIX_TOKENS = len("summarize:".split())
+
+
+class WordTokenizer:
+    """One token per word, so token counts can be checked by counting words."""
+
+    def encode(self, text, add_special_tokens=False):
+        return text.split()
+
+    def decode(self, ids, skip_special_tokens=True):
+        return " ".join(ids)
+
+
+def words(count, start=0):
+    return " ".join(f"w{index}" for index in range(start, start + count))
+
+
+class FakeSummarizer:
+    """Returns summaries as long as they may be, and checks every input fits the encoder."""
+
+    def __init__(self, extra_words=0):
+        self.extra_words = extra_words
+        self.levels = []
+
+    def __call__(self, texts, lengths):
+        self.levels.append((list(texts), dict(lengths)))
+        for text in texts:
+            assert PREFIX_TOKENS + len(text.split()) <= MAX_INPUT_LENGTH, "input larger than the encoder window"
+        return [({name: words(length + self.extra_words, start=1000000 * len(self.levels) + 1000 * number)
+                  for name, length in lengths.items()}, {}) for number, _ in enumerate(texts)]
+
+    def chunk_summaries(self):
+        return sum(len(texts) for texts, lengths in self.levels if "chunk" in lengths)
+
+
+class TestChunking(unittest.TestCase):
+
+    def test_chunks_overlap_and_cover_the_text(self):
+        chunks = chunk_text(words(1000), WordTokenizer(), chunk_tokens=100, overlap_tokens=20)
+        self.assertEqual(len(chunks), 13)
+        self.assertTrue(all(len(chunk.split()) <= 100 for chunk in chunks))
+        self.assertEqual([chunk.split()[0] for chunk in chunks[:3]], ["w0", "w80", "w160"])
+        for previous, chunk in zip(chunks, chunks[1:]):
+            self.assertEqual(previous.split()[-20:], chunk.split()[:20])
+        self.assertEqual(chunks[-1].split()[-1], "w999")
+
+    def test_short_text_is_one_chunk(self):
+        self.assertEqual(chunk_text(words(100), WordTokenizer(), chunk_tokens=100, overlap_tokens=20), [words(100)])
+
+    def test_spread_keeps_the_ends_and_the_order(self):
+        items = list(range(10))
+        self.assertEqual(_spread(items, 4), [0, 3, 6, 9])
+        self.assertEqual(_spread(items, 1), [0])
+        self.assertEqual(_spread(items, 20), items)
+
+
+class TestHierarchicalSummary(unittest.TestCase):
+
+    def summarize(self, text, summarizer, **options):
+        return summarize_hierarchical(text, WordTokenizer(), summarizer, lengths={"short": 50}, **options)
+
+    def test_short_text_is_summarized_directly(self):
+        summarizer = FakeSummarizer()
+        self.summarize(words(300), summarizer)
+        self.assertEqual(summarizer.levels, [([words(300)], {"short": 50})])
+
+    def test_long_text_reduces_to_one_window_within_the_budget(self):
+        summarizer = FakeSummarizer()
+        _, timings = self.summarize(words(100000), summarizer, max_depth=2, max_chunks=32)
+        self.assertIn("map_level_2", timings)
+        self.assertLessEqual(summarizer.chunk_summaries(), 32)
+        # The first level leaves enough of the budget for the second to reduce its summaries
+        first_level, second_level = len(summarizer.levels[0][0]), len(summarizer.levels[1][0])
+        self.assertGreater(first_level, second_level)
+        final_input, = summarizer.levels[-1][0]
+        self.assertLessEqual(len(final_input.split()), 480)
+        self.assertEqual(len(final_input.split()), second_level * 100)
+
+    def test_first_level_chunks_are_spread_across_the_text(self):
+        summarizer = FakeSummarizer()
+        self.summarize(words(100000), summarizer, max_depth=2, max_chunks=32)
+        first_level = summarizer.levels[0][0]
+        self.assertEqual(first_level[0].split()[0], "w0")
+        self.assertEqual(first_level[-1].split()[-1], "w99999")
+
+    def test_single_level_takes_only_what_fits_one_window(self):
+        summarizer = FakeSummarizer()
+        self.summarize(words(100000), summarizer, max_depth=1, max_chunks=32)
+        self.assertEqual(summarizer.chunk_summaries(), 4)
+        self.assertLessEqual(len(summarizer.levels[-1][0][0].split()), 480)
+
+    def test_tight_budget_still_fits_the_window(self):
+        for max_chunks in (1, 3, 5, 9):
+            summarizer = FakeSummarizer()
+            self.summarize(words(20000), summarizer, max_depth=3, max_chunks=max_chunks)
+            self.assertLessEqual(summarizer.chunk_summaries(), max_chunks)
+            self.assertLessEqual(len(summarizer.levels[-1][0][0].split()), 480)
+
+    def test_summaries_longer_than_expected_are_dropped_evenly(self):
+        summarizer = FakeSummarizer(extra_words=30)
+        self.summarize(words(100000), summarizer, max_depth=1, max_chunks=32)
+        final_input = summarizer.levels[-1][0][0].split()
+        self.assertLessEqual(len(final_input), 480)
+        # The summaries of the first and the last chunk are both kept
+        self.assertEqual(final_input[0], "w1000000")
+        self.assertEqual(final_input[-1], f"w{1000000 + 3 * 1000 + 129}")
+
+    def test_no_budget_cuts_the_text_to_one_window(self):
+        summarizer = FakeSummarizer()
+        self.summarize(words(5000), summarizer, max_chunks=0)
+        self.assertEqual(summarizer.levels, [([words(480)], {"short": 50})])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+# tests/test_inference_scheduler.py
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from inference_scheduler import InferenceScheduler  # noqa: E402
+
+
+class TestInferenceScheduler(unittest.TestCase):
+    def test_batches_requests_and_routes_results(self):
+        batches = []
+
+        def batch_fn(items, suffix):
+            batches.append(list(items))
+            return [item + suffix for item in items]
+
+        scheduler = InferenceScheduler(batch_fn, max_batch_size=4, max_wait=0.5)
+        futures = [scheduler.submit(str(i), suffix="!") for i in range(4)]
+        results = [future.result(timeout=5) for future in futures]
+        scheduler.stop()
+
+        self.assertEqual(results, ["0!", "1!", "2!", "3!"])
+        self.assertEqual(batches, [["0", "1", "2", "3"]])
+        stats = scheduler.stats()
+        self.assertEqual(stats["batches"], 1)
+        self.assertEqual(stats["mean_batch_size"], 4)
+
+    def test_partial_batch_runs_after_max_wait(self):
+        scheduler = InferenceScheduler(lambda items: items, max_batch_size=8, max_wait=0.01)
+        self.assertEqual(scheduler.submit("only").result(timeout=5), "only")
+        scheduler.stop()
+        self.assertEqual(scheduler.stats()["batch_sizes"], {1: 1})
+
+    def test_requests_queued_during_a_batch_form_the_next_batch(self):
+        release = threading.Event()
+        batches = []
+
+        def batch_fn(items):
+            batches.append(list(items))
+            release.wait(timeout=5)
+            return items
+
+        scheduler = InferenceScheduler(batch_fn, max_batch_size=4, max_wait=0.01)
+        first = scheduler.submit("first")
+        while not batches:
+            time.sleep(0.01)
+        # These wait longer than max_wait while the first batch runs, but must still be batched together
+        rest = [scheduler.submit(str(i)) for i in range(3)]
+        time.sleep(0.05)
+        release.set()
+        for future in [first] + rest:
+            future.result(timeout=5)
+        scheduler.stop()
+
+        self.assertEqual(batches, [["first"], ["0", "1", "2"]])
+
+    def test_requests_with_different_params_are_not_mixed(self):
+        seen = []
+        lock = threading.Lock()
+
+        def batch_fn(items, lengths):
+            with lock:
+                seen.append((tuple(items), lengths["short"]))
+            return items
+
+        scheduler = InferenceScheduler(batch_fn, max_batch_size=2, max_wait=0.5)
+        first = scheduler.submit("a", lengths={"short": 10})
+        second = scheduler.submit("b", lengths={"short": 20})
+        third = scheduler.submit("c", lengths={"short": 10})
+        for future in (first, second, third):
+            future.result(timeout=5)
+        scheduler.stop()
+
+        self.assertIn((("a", "c"), 10), seen)
+        self.assertIn((("b",), 20), seen)
+
+    def test_batch_errors_reach_every_caller(self):
+        def batch_fn(items):
+            raise RuntimeError("model failed")
+
+        scheduler = InferenceScheduler(batch_fn, max_batch_size=1, max_wait=0.01)
+        with self.assertRaises(RuntimeError):
+            scheduler.submit("x").result(timeout=5)
+        scheduler.stop()
+
+    def test_a_short_result_list_fails_the_batch(self):
+        scheduler = InferenceScheduler(lambda items: items[:1], max_batch_size=2, max_wait=0.5)
+        futures = [scheduler.submit(item) for item in ("a", "b")]
+        for future in futures:
+            with self.assertRaises(RuntimeError):
+                future.result(timeout=5)
+        scheduler.stop()
+
+    def test_concurrent_submits_start_one_dispatcher(self):
+        batches = []
+
+        def batch_fn(items):
+            batches.append(len(items))
+            return items
+
+        scheduler = InferenceScheduler(batch_fn, max_batch_size=8, max_wait=0.5)
+
+        class SlowEvent(threading.Event):
+            def clear(self):
+                time.sleep(0.05)  # Widens the window in which a second caller could also start a dispatcher
+                super().clear()
+
+        scheduler._stopping = SlowEvent()
+        barrier = threading.Barrier(8)
+        futures = []
+
+        def submit(item):
+            barrier.wait()
+            futures.append(scheduler.submit(item))
+
+        threads = [threading.Thread(target=submit, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(future.result(timeout=5) for future in futures), list(range(8)))
+        dispatchers = [thread for thread in threading.enumerate() if thread.name == "inference-scheduler"]
+        self.assertEqual(len(dispatchers), 1)
+        scheduler.stop()
+        self.assertFalse(dispatchers[0].is_alive())
+        self.assertEqual(batches, [8])
+
+
+if __name__ == '__main__':
+    unittest.main()
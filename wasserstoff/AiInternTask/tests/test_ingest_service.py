@@ -0,0 +1,271 @@
+# tests/test_ingest_service.py
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import ingest_service  # noqa: E402
+import main  # noqa: E402
+from ingest_service import IngestService, WorkQueue  # noqa: E402
+from metrics import MetricsSink  # noqa: E402
+
+
+def wait_until(condition, timeout=10):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError("Timed out waiting for the service")
+        time.sleep(0.01)
+
+
+class TestWorkQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "queue.sqlite")
+        self.queue = WorkQueue(self.path, max_attempts=2, retry_delay=0.0)
+
+    def tearDown(self):
+        self.queue.close()
+        self.tmp.cleanup()
+
+    def test_a_file_is_queued_once_until_it_changes(self):
+        self.assertTrue(self.queue.enqueue("/in/a.pdf", 10, 1.0))
+        self.assertFalse(self.queue.enqueue("/in/a.pdf", 10, 1.0))
+        item_id, _, _ = self.queue.claim()
+        self.queue.persisted(item_id, "ok")
+        self.queue.mark_done([item_id])
+        self.assertFalse(self.queue.enqueue("/in/a.pdf", 10, 1.0))
+        self.assertTrue(self.queue.enqueue("/in/a.pdf", 12, 2.0))
+        self.assertEqual(self.queue.counts()["pending"], 1)
+
+    def test_items_are_claimed_in_order_and_only_once(self):
+        for name in ("a", "b"):
+            self.queue.enqueue(f"/in/{name}.pdf", 1, 1.0)
+        self.assertEqual(self.queue.claim()[1:], ("/in/a.pdf", 1))
+        self.assertEqual(self.queue.claim()[1:], ("/in/b.pdf", 1))
+        self.assertIsNone(self.queue.claim())
+
+    def test_failures_are_retried_and_then_given_up(self):
+        self.queue.enqueue("/in/a.pdf", 1, 1.0)
+        item_id, _, _ = self.queue.claim()
+        self.assertTrue(self.queue.fail(item_id, EOFError("truncated")))
+        self.assertEqual(self.queue.claim(), (item_id, "/in/a.pdf", 2))
+        self.assertFalse(self.queue.fail(item_id, EOFError("truncated")))
+        self.assertIsNone(self.queue.claim())
+        self.assertEqual(self.queue.counts()["failed"], 1)
+
+    def test_retries_wait_for_their_delay(self):
+        queue = WorkQueue(self.path, max_attempts=3, retry_delay=60.0)
+        queue.enqueue("/in/a.pdf", 1, 1.0)
+        queue.fail(queue.claim()[0], "error")
+        self.assertIsNone(queue.claim())
+        queue.close()
+
+    def test_recover_returns_interrupted_items_to_pending(self):
+        for name in ("a", "b", "c"):
+            self.queue.enqueue(f"/in/{name}.pdf", 1, 1.0)
+        running, _, _ = self.queue.claim()
+        persisted, _, _ = self.queue.claim()
+        self.queue.persisted(persisted, "ok")
+        self.queue.close()
+
+        # A new process opens the queue after a crash
+        self.queue = WorkQueue(self.path)
+        self.assertEqual(self.queue.recover(), 2)
+        self.assertEqual(self.queue.counts()["pending"], 3)
+        self.assertEqual(self.queue.claim()[0], running)
+
+
+class TestIngestService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.folder = os.path.join(self.tmp.name, "inbox")
+        os.makedirs(self.folder)
+        self.queue_path = os.path.join(self.tmp.name, "queue.sqlite")
+        self.processed = []
+        self.committed = []
+        self.lock = threading.Lock()
+        self.sink = MetricsSink(os.path.join(self.tmp.name, "metrics.jsonl"))
+        self.sink_patch = mock.patch.object(ingest_service, "sink", self.sink)
+        self.sink_patch.start()
+
+    def tearDown(self):
+        self.sink_patch.stop()
+        self.sink.close()
+        self.tmp.cleanup()
+
+    def add_pdfs(self, *names):
+        for name in names:
+            with open(os.path.join(self.folder, name), "wb") as file:
+                file.write(b"%PDF-1.4 " + name.encode())
+
+    def process(self, pdf_path):
+        name = os.path.basename(pdf_path)
+        with self.lock:
+            self.processed.append(name)
+        return ("error", EOFError("truncated")) if name.startswith("bad") else ("ok", None)
+
+    def commit(self):
+        with self.lock:
+            self.committed.append(list(self.processed))
+
+    def make_service(self, process_fn=None, **options):
+        queue = WorkQueue(self.queue_path, max_attempts=2, retry_delay=0.0)
+        options = dict(dict(workers=2, scan_interval=0.05, settle_seconds=0, commit_interval=0.05,
+                            poll_interval=0.01), **options)
+        return IngestService([self.folder], queue, process_fn or self.process, self.commit, **options)
+
+    def test_processes_commits_and_retries(self):
+        self.add_pdfs("a.pdf", "b.pdf", "bad.pdf", "notes.txt")
+        service = self.make_service()
+        service.start()
+        wait_until(lambda: service.health()["queue"]["done"] == 2 and service.health()["queue"]["failed"] == 1)
+        health = service.stop()
+        self.assertEqual(sorted(self.processed), ["a.pdf", "b.pdf", "bad.pdf", "bad.pdf"])
+        self.assertEqual(health["status"], "stopped")
+        self.assertEqual((health["processed"], health["retries"], health["failed"]), (2, 1, 1))
+        self.assertEqual(health["committed"], 2)
+        service.queue.close()
+
+    def test_restart_resumes_without_reprocessing(self):
+        self.add_pdfs("a.pdf", "b.pdf")
+        service = self.make_service()
+        service.start()
+        wait_until(lambda: service.health()["queue"]["done"] == 2)
+        service.stop()
+        service.queue.close()
+
+        self.add_pdfs("c.pdf")
+        service = self.make_service()
+        service.start()
+        wait_until(lambda: service.health()["queue"]["done"] == 3)
+        service.stop()
+        service.queue.close()
+        self.assertEqual(sorted(self.processed), ["a.pdf", "b.pdf", "c.pdf"])
+
+    def test_items_not_committed_before_a_crash_are_processed_again(self):
+        self.add_pdfs("a.pdf")
+        service = self.make_service(commit_interval=3600)
+        service.scan()
+        service.process_next()  # Processed, but the service dies before committing it
+        self.assertEqual(service.queue.counts()["persisted"], 1)
+        service.queue.close()
+
+        service = self.make_service()
+        service.start()
+        wait_until(lambda: service.health()["queue"]["done"] == 1)
+        service.stop()
+        service.queue.close()
+        self.assertEqual(self.processed, ["a.pdf", "a.pdf"])
+
+    def test_items_are_done_only_once_their_outputs_are_written(self):
+        self.add_pdfs("a.pdf")
+        buffered, written, failures = [], [], [1]
+
+        def process(pdf_path):
+            buffered.append(os.path.basename(pdf_path))
+            return "ok", None
+
+        def commit():
+            # Like BulkMongoWriter.flush, a failed write leaves the outputs buffered
+            if failures[0]:
+                failures[0] -= 1
+                raise ConnectionError("primary stepped down")
+            written.extend(buffered)
+            del buffered[:]
+
+        service = IngestService([self.folder], WorkQueue(self.queue_path), process, commit, settle_seconds=0)
+        service.scan()
+        service.process_next()
+        self.assertEqual(service.commit(), 0)
+        self.assertEqual(service.queue.counts()["persisted"], 1)
+        self.assertEqual(service.health()["commit_errors"], 1)
+        self.assertEqual(service.commit(), 1)
+        self.assertEqual(written, ["a.pdf"])
+        self.assertEqual(service.queue.counts()["done"], 1)
+        service.queue.close()
+
+    def test_stop_drains_the_items_in_progress(self):
+        self.add_pdfs("a_slow.pdf", "b_next.pdf")
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_process(pdf_path):
+            started.set()
+            release.wait(10)
+            return self.process(pdf_path)
+
+        service = self.make_service(slow_process, workers=1)
+        service.start()
+        self.assertTrue(started.wait(10))
+        threading.Timer(0.2, release.set).start()
+        health = service.stop()
+        # The item in progress finished and was committed; the next one waits for the next start
+        self.assertEqual(self.processed, ["a_slow.pdf"])
+        self.assertEqual(health["queue"]["done"], 1)
+        self.assertEqual(health["queue"]["pending"], 1)
+        service.queue.close()
+
+    def test_files_still_being_written_are_left_for_a_later_scan(self):
+        self.add_pdfs("copying.pdf")
+        service = self.make_service(settle_seconds=60)
+        self.assertEqual(service.scan(), 0)
+        os.utime(os.path.join(self.folder, "copying.pdf"), (time.time() - 120, time.time() - 120))
+        self.assertEqual(service.scan(), 1)
+        service.queue.close()
+
+
+def hang(pdf_path):
+    time.sleep(60)
+
+
+def reject(pdf_path):
+    raise EOFError(f"{pdf_path} is truncated")
+
+
+class TestExtractInSubprocess(unittest.TestCase):
+    """Ingest workers are threads, where time_limit cannot stop an extraction."""
+
+    def setUp(self):
+        patch = mock.patch.object(main, "document_timeout", 0.25)
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.addCleanup(main.shutdown_extract_pools)
+
+    def extract_on_a_thread(self, extract_fn):
+        outcome = []
+
+        def run():
+            try:
+                outcome.append(main.extract_in_subprocess("/in/a.pdf"))
+            except Exception as e:
+                outcome.append(e)
+
+        with mock.patch.object(main, "extract_stage", extract_fn):
+            thread = threading.Thread(target=run)
+            thread.start()
+            thread.join(10)
+        self.assertFalse(thread.is_alive())
+        return outcome[0]
+
+    def test_a_hung_extraction_is_killed(self):
+        started = time.time()
+        error = self.extract_on_a_thread(hang)
+        self.assertIsInstance(error, TimeoutError)
+        self.assertLess(time.time() - started, 5)
+        self.assertEqual(main._extract_pools, [])
+
+    def test_errors_are_raised_and_the_worker_is_reused(self):
+        self.assertIsInstance(self.extract_on_a_thread(reject), EOFError)
+        self.assertEqual(len(main._extract_pools), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
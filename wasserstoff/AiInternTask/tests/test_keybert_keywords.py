@@ -0,0 +1,103 @@
+# tests/test_keybert_keywords.py
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from keybert_keywords import BatchKeywordExtractor, EmbeddingCache, mmr  # noqa: E402
+
+# Toy embedding space: each word has a fixed direction, and a text embeds as the sum of its words
+WORD_VECTORS = {"tax": [1, 0, 0], "income": [0.9, 0.1, 0], "tribunal": [0, 1, 0], "workmen": [0, 0.2, 1],
+                "industrial": [0, 0.1, 0.9], "appeal": [0.3, 0.3, 0.3]}
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.array([np.sum([WORD_VECTORS.get(word, [0.01, 0.01, 0.01]) for word in text.split()], axis=0)
+                         for text in texts])
+
+
+class TestBatchKeywordExtractor(unittest.TestCase):
+
+    def test_batch_is_embedded_in_one_call_with_deduplicated_candidates(self):
+        embedder = CountingEmbedder()
+        extractor = BatchKeywordExtractor(embedder)
+        texts = ["income tax appeal tax", "workmen industrial tribunal appeal"]
+        keywords = extractor.extract_keywords(texts, top_n=2)
+        self.assertEqual(keywords, [["income", "tax"], ["workmen", "appeal"]])
+        call, = embedder.calls
+        # Every candidate once, then the documents
+        self.assertEqual(call[:-2], ["appeal", "income", "industrial", "tax", "tribunal", "workmen"])
+        self.assertEqual(call[-2:], texts)
+
+    def test_cached_candidates_are_not_embedded_again(self):
+        embedder = CountingEmbedder()
+        extractor = BatchKeywordExtractor(embedder)
+        extractor.extract_keywords(["income tax appeal"])
+        extractor.extract_keywords(["tax tribunal appeal"])
+        self.assertEqual(embedder.calls[1], ["tribunal", "tax tribunal appeal"])
+        self.assertEqual((extractor.cache.hits, extractor.cache.misses), (2, 4))
+
+    def test_mmr_trades_relevance_for_diversity(self):
+        embedder = CountingEmbedder()
+        text = "income tax tribunal"
+        self.assertEqual(BatchKeywordExtractor(embedder).extract_keywords([text], top_n=2), [["income", "tax"]])
+        diverse = BatchKeywordExtractor(embedder, use_mmr=True, diversity=0.7).extract_keywords([text], top_n=2)
+        self.assertEqual(diverse, [["income", "tribunal"]])
+
+    def test_documents_without_candidates(self):
+        extractor = BatchKeywordExtractor(CountingEmbedder())
+        self.assertEqual(extractor.extract_keywords(["the and of", "tax"]), [[], ["tax"]])
+        self.assertEqual(extractor.extract_keywords(["the"]), [[]])
+
+    def test_mmr_of_no_candidates(self):
+        self.assertEqual(mmr(np.zeros(0), np.zeros((0, 3)), 5, 0.5), [])
+
+
+class TestEmbeddingCache(unittest.TestCase):
+
+    def test_least_recently_used_phrases_are_evicted(self):
+        cache = EmbeddingCache(max_entries=2)
+        cache.put_many(["a", "b"], np.eye(2))
+        cache.get_many(["a"])
+        cache.put_many(["c"], np.ones((1, 2)))
+        found, missing = cache.get_many(["a", "b", "c"])
+        self.assertEqual((sorted(found), missing), (["a", "c"], ["b"]))
+
+    def test_cache_round_trips_through_disk_for_the_same_model(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, "embeddings.npz")
+            cache = EmbeddingCache(model_name="model-a")
+            cache.put_many(["tax", "tribunal"], np.eye(2, dtype=np.float32))
+            cache.save(path)
+            loaded = EmbeddingCache.load(path, model_name="model-a")
+            found, missing = loaded.get_many(["tax", "tribunal"])
+            self.assertEqual(missing, [])
+            np.testing.assert_array_equal(found["tribunal"], [0, 1])
+            self.assertEqual(len(EmbeddingCache.load(path, model_name="model-b")), 0)
+
+    def test_only_new_embeddings_make_the_cache_dirty(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, "embeddings.npz")
+            cache = EmbeddingCache()
+            cache.put_many(["tax"], np.eye(1, dtype=np.float32))
+            self.assertTrue(cache.dirty)
+            cache.save(path)
+            self.assertFalse(cache.dirty)
+            cache.get_many(["tax", "tribunal"])
+            self.assertFalse(cache.dirty)
+            cache.put_many(["tribunal"], np.eye(1, dtype=np.float32))
+            self.assertTrue(cache.dirty)
+            self.assertFalse(EmbeddingCache.load(path).dirty)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+# tests/test_metrics.py
+import json
+import os
+import signal
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from metrics import MetricsSink  # noqa: E402
+from performance_report import percentile, summarize_events  # noqa: E402
+
+
+class TestMetricsSink(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "metrics.jsonl")
+        self.sink = MetricsSink(self.path)
+
+    def tearDown(self):
+        self.sink.close()
+        self.tmp.cleanup()
+
+    def read_events(self):
+        with open(self.path) as file:
+            return [json.loads(line) for line in file]
+
+    def test_stage_records_timings_and_fields(self):
+        with self.sink.stage("pdf1.pdf", "extraction") as event:
+            event["pages"] = 3
+        record, = self.read_events()
+        self.assertEqual(record["event"], "stage")
+        self.assertEqual(record["document"], "pdf1.pdf")
+        self.assertEqual(record["stage"], "extraction")
+        self.assertEqual(record["status"], "ok")
+        self.assertEqual(record["pages"], 3)
+        for field in ("wall_time", "cpu_time", "rss_delta", "peak_memory_delta"):
+            self.assertIn(field, record)
+
+    def test_stage_marks_errors_and_reraises(self):
+        with self.assertRaises(ValueError):
+            with self.sink.stage("pdf1.pdf", "keywords"):
+                raise ValueError("boom")
+        self.assertEqual(self.read_events()[0]["status"], "error")
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs fork")
+    def test_child_forked_while_the_lock_is_held_can_emit(self):
+        self.sink.emit("parent")
+        with self.sink._lock:  # As if another thread of the parent was writing when it forked
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    signal.alarm(10)  # A deadlocked child is killed instead of hanging the test
+                    self.sink.emit("child")
+                finally:
+                    os._exit(0)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        self.sink.emit("parent")
+        self.assertEqual([record["event"] for record in self.read_events()], ["parent", "child", "parent"])
+
+    def test_report_aggregates_percentiles_and_throughput(self):
+        for index in range(1, 101):
+            self.sink.emit("stage", document=f"pdf{index}.pdf", stage="summarization", status="ok",
+                           wall_time=float(index))
+            self.sink.emit("document", document=f"pdf{index}.pdf", status="ok", pages=2)
+        self.sink.emit("run", wall_time=50.0)
+
+        report = summarize_events(self.read_events())
+        wall_time = report["stages"]["summarization"]["wall_time"]
+        self.assertAlmostEqual(wall_time["p50"], 50.5)
+        self.assertAlmostEqual(wall_time["p99"], 99.01)
+        self.assertEqual(report["documents"], 100)
+        self.assertAlmostEqual(report["throughput"]["pages_per_second"], 4.0)
+
+    def test_percentile_of_empty_values_is_none(self):
+        self.assertIsNone(percentile([], 95))
+
+
+if __name__ == '__main__':
+    unittest.main()
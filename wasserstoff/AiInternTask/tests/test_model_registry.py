@@ -0,0 +1,63 @@
+# tests/test_model_registry.py
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from model_registry import ModelRegistry  # noqa: E402
+
+
+class FakeModel:
+    def __init__(self, size):
+        self.size = size
+
+
+class TestModelRegistry(unittest.TestCase):
+    def test_loads_lazily_and_once_across_threads(self):
+        calls = []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.05)
+            return FakeModel(1)
+
+        registry = ModelRegistry()
+        registry.register("model", loader)
+        self.assertEqual(calls, [])
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(registry.get("model"))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_evicts_least_recently_used_model_over_budget(self):
+        registry = ModelRegistry(max_bytes=1)
+        registry.register("first", lambda: FakeModel(1))
+        registry.register("second", lambda: FakeModel(1))
+
+        import model_registry
+        original = model_registry.estimate_model_bytes
+        model_registry.estimate_model_bytes = lambda obj: obj.size
+        try:
+            with registry.use("first"):
+                registry.get("second")
+                # "first" is in use, so it must survive even though the budget is exceeded
+                self.assertEqual(registry.loaded(), ["first", "second"])
+            self.assertEqual(registry.loaded(), ["first"])
+        finally:
+            model_registry.estimate_model_bytes = original
+
+    def test_unknown_model_raises(self):
+        with self.assertRaises(KeyError):
+            ModelRegistry().get("missing")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+# tests/test_mongodb_handler.py
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import mongodb_handler  # noqa: E402
+from mongodb_handler import BulkMongoWriter  # noqa: E402
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+
+@unittest.skipIf(mongomock is None, "mongomock is not installed")
+class TestBulkMongoWriter(unittest.TestCase):
+    def setUp(self):
+        self.collection = mongomock.MongoClient()["pdf_database"]["pdf_metadata"]
+
+    def test_flushes_when_batch_is_full(self):
+        writer = BulkMongoWriter(self.collection, max_batch_size=2, max_latency=60)
+        writer.write({"content_key": "a", "name": "pdf1.pdf"})
+        self.assertEqual(self.collection.count_documents({}), 0)
+        writer.write({"content_key": "b", "name": "pdf2.pdf"})
+        self.assertEqual(self.collection.count_documents({}), 2)
+        writer.close()
+        self.assertEqual(writer.stats()["flushes"], 1)
+
+    def test_flushes_after_max_latency(self):
+        writer = BulkMongoWriter(self.collection, max_batch_size=100, max_latency=0.05)
+        writer.write({"content_key": "a", "name": "pdf1.pdf"})
+        deadline = time.time() + 5
+        while self.collection.count_documents({}) == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.collection.count_documents({}), 1)
+        writer.close()
+
+    def test_rewrites_are_idempotent(self):
+        writer = BulkMongoWriter(self.collection, max_batch_size=10, max_latency=60)
+        writer.write({"content_key": "a", "name": "pdf1.pdf", "keywords": ["old"]})
+        writer.flush()
+        writer.write({"content_key": "a", "name": "pdf1.pdf", "keywords": ["new"]})
+        writer.close()
+
+        documents = list(self.collection.find({}, {"_id": 0}))
+        self.assertEqual(documents, [{"content_key": "a", "name": "pdf1.pdf", "keywords": ["new"]}])
+        self.assertEqual(writer.stats()["documents"], 2)
+
+    def test_failed_flush_keeps_the_batch(self):
+        collection = self.collection
+
+        class FlakyCollection:
+            failures = 1
+
+            def create_index(self, *args, **options):
+                return collection.create_index(*args, **options)
+
+            def bulk_write(self, requests, ordered):
+                if self.failures:
+                    self.failures -= 1
+                    raise ConnectionError("primary stepped down")
+                return collection.bulk_write(requests, ordered=ordered)
+
+        writer = BulkMongoWriter(FlakyCollection(), max_batch_size=10, max_latency=60)
+        writer.write({"content_key": "a", "name": "pdf1.pdf"})
+        with self.assertRaises(ConnectionError):
+            writer.flush()
+        writer.write({"content_key": "b", "name": "pdf2.pdf"})
+        writer.close()
+        self.assertEqual(self.collection.count_documents({}), 2)
+        self.assertEqual(writer.stats()["documents"], 2)
+
+    def test_first_flush_creates_a_unique_key_index(self):
+        writer = BulkMongoWriter(self.collection, max_batch_size=10, max_latency=60)
+        writer.write({"content_key": "a", "name": "pdf1.pdf"})
+        writer.close()
+        index, = [index for index in self.collection.index_information().values() if index["key"] != [("_id", 1)]]
+        self.assertEqual(index["key"], [("content_key", 1)])
+        self.assertTrue(index["unique"])
+        # Documents without a key are upserted on their name and stay outside the index
+        self.collection.insert_many([{"name": "pdf2.pdf"}, {"name": "pdf3.pdf"}])
+        self.assertEqual(self.collection.count_documents({}), 3)
+
+
+class TestGetClient(unittest.TestCase):
+
+    def test_clients_are_shared_per_uri(self):
+        first = mongodb_handler.get_client("mongodb://first.invalid:27017/")
+        second = mongodb_handler.get_client("mongodb://second.invalid:27017/")
+        self.assertIsNot(first, second)
+        self.assertIs(mongodb_handler.get_client("mongodb://first.invalid:27017/"), first)
+        for uri in ("mongodb://first.invalid:27017/", "mongodb://second.invalid:27017/"):
+            mongodb_handler._clients.pop(uri).close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+# tests/test_multi_length_summary.py
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from summarization import _decode_checkpoints, summarize_batch_multi_length, summarize_multi_length  # noqa: E402
+
+LENGTHS = {"short": 50, "medium": 100, "long": 200}
+PAD, EOS, PERIOD = 0, 1, 6
+
+
+class CountingModel:
+    """Stands in for T5 and records every encoder and generate() call.
+
+    Decodes are sentences of four tokens ending in PERIOD, up to max_length tokens with EOS last;
+    `lengths` caps the decode of each text in the batch, which is then padded like generate() does.
+    """
+
+    def __init__(self, lengths=None):
+        self.lengths = lengths
+        self.encoder_batches = []
+        self.generate_lengths = []
+
+    def get_encoder(self):
+        import torch
+
+        def encode(input_ids, attention_mask):
+            self.encoder_batches.append(input_ids.shape[0])
+            return type("Output", (), {"last_hidden_state": torch.zeros(input_ids.shape[0], input_ids.shape[1], 4)})()
+        return encode
+
+    def generate(self, encoder_outputs, attention_mask, max_length, **options):
+        import torch
+        self.generate_lengths.append(max_length)
+        rows = []
+        for index in range(attention_mask.shape[0]):
+            length = min(max_length, self.lengths[index]) if self.lengths else max_length
+            ids = [3 + position % 4 for position in range(length - 1)] + [EOS]
+            rows.append(ids + [PAD] * (max_length - length))
+        return torch.tensor(rows)
+
+
+class WordTokenizer:
+    pad_token_id = PAD
+    eos_token_id = EOS
+
+    def __call__(self, texts, **options):
+        import torch
+        ids = torch.ones(len(texts), 3, dtype=torch.long)
+        return {"input_ids": ids, "attention_mask": ids}
+
+    def decode(self, ids, skip_special_tokens=True):
+        return " ".join("end." if int(i) == PERIOD else f"w{int(i)}" for i in ids if int(i) > EOS)
+
+
+def word_count(text):
+    return len(text.split())
+
+
+class TestMultiLengthSummary(unittest.TestCase):
+
+    def test_encoder_runs_once_and_each_length_is_decoded(self):
+        model = CountingModel()
+        summaries, timings = summarize_multi_length("text", model, WordTokenizer(), lengths=LENGTHS)
+        self.assertEqual(model.encoder_batches, [1])
+        self.assertEqual(model.generate_lengths, [200, 100, 50])
+        self.assertEqual({name: word_count(summary) for name, summary in summaries.items()},
+                         {"short": 49, "medium": 99, "long": 199})
+        self.assertEqual(set(timings), {"encode", "short", "medium", "long"})
+
+    def test_a_batch_shares_one_encoder_pass(self):
+        model = CountingModel()
+        results = summarize_batch_multi_length(["a", "b", "c"], model, WordTokenizer(), lengths=LENGTHS)
+        self.assertEqual(model.encoder_batches, [3])
+        self.assertEqual(len(results), 3)
+
+    def test_shared_decode_cuts_the_shorter_lengths_at_their_checkpoints(self):
+        model = CountingModel()
+        summaries, timings = summarize_multi_length("text", model, WordTokenizer(), lengths=LENGTHS,
+                                                    shared_decode=True)
+        self.assertEqual(model.encoder_batches, [1])
+        self.assertEqual(model.generate_lengths, [200])
+        self.assertEqual(word_count(summaries["long"]), 199)
+        # 50 tokens are twelve whole sentences and two words, which are cut back to the last sentence
+        self.assertEqual(word_count(summaries["short"]), 48)
+        self.assertTrue(summaries["short"].endswith("end."))
+        # 100 tokens end on a sentence
+        self.assertEqual(word_count(summaries["medium"]), 100)
+        self.assertTrue(summaries["long"].startswith(summaries["medium"]))
+        self.assertEqual((timings["short"], timings["medium"]), (0.0, 0.0))
+
+
+class TestDecodeCheckpoints(unittest.TestCase):
+
+    def test_padding_does_not_count_toward_a_checkpoint(self):
+        import torch
+        # The second decode ended after 30 tokens and was padded to the batch's 200
+        summary_ids = CountingModel(lengths=[200, 30]).generate(None, torch.ones(2, 3), 200)
+        checkpoints = _decode_checkpoints(summary_ids, WordTokenizer(), [("medium", 100), ("short", 50)])
+        self.assertEqual(word_count(checkpoints[0]["short"]), 48)
+        # A decode shorter than the checkpoint is kept whole, mid-sentence end included
+        self.assertEqual(word_count(checkpoints[1]["short"]), 29)
+        self.assertEqual(checkpoints[1]["short"], checkpoints[1]["medium"])
+        self.assertFalse(checkpoints[1]["short"].endswith("end."))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+# tests/test_near_duplicates.py
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from near_duplicates import MinHasher, NearDuplicateIndex, minhash_signature, shingle_hashes  # noqa: E402
+
+
+def make_text(seed, words=400):
+    rng = random.Random(seed)
+    return " ".join(f"w{rng.randrange(5000)}" for _ in range(words))
+
+
+def edit(text, changes, seed=0):
+    # Replaces `changes` words, as a reissue with a new date or reference number would
+    rng = random.Random(seed)
+    words = text.split()
+    for index in rng.sample(range(len(words)), changes):
+        words[index] = "changed"
+    return " ".join(words)
+
+
+class TestMinHash(unittest.TestCase):
+
+    def test_shingles_ignore_case_and_punctuation(self):
+        self.assertTrue(np.array_equal(shingle_hashes("The Circular, reissued."),
+                                       shingle_hashes("the circular reissued")))
+        self.assertEqual(len(shingle_hashes("")), 0)
+        # Texts shorter than one shingle are a single shingle
+        self.assertEqual(len(shingle_hashes("two words")), 1)
+
+    def test_signature_similarity_estimates_jaccard(self):
+        text = make_text(1)
+        near = edit(text, 4)
+        shingles, near_shingles = set(shingle_hashes(text).tolist()), set(shingle_hashes(near).tolist())
+        jaccard = len(shingles & near_shingles) / len(shingles | near_shingles)
+        similarity = (minhash_signature(text) == minhash_signature(near)).mean()
+        self.assertAlmostEqual(similarity, jaccard, delta=0.12)
+        self.assertLess((minhash_signature(text) == minhash_signature(make_text(2))).mean(), 0.1)
+
+    def test_signatures_are_stable_across_hashers(self):
+        text = make_text(3)
+        self.assertTrue(np.array_equal(MinHasher().signature(text), minhash_signature(text)))
+        self.assertFalse(np.array_equal(MinHasher(seed=2).signature(text), minhash_signature(text)))
+
+    def test_long_texts_are_hashed_in_blocks(self):
+        text = make_text(4, words=20000)
+        hasher = MinHasher(num_perm=16)
+        shingles = shingle_hashes(text)
+        expected = (((shingles[:, None] * hasher._a + hasher._b) % np.uint64((1 << 61) - 1)) & np.uint64(0xFFFFFFFF))
+        self.assertTrue(np.array_equal(hasher.signature(text), expected.min(axis=0).astype(np.uint32)))
+
+
+class TestNearDuplicateIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "near_duplicates.idx")
+        self.texts = [make_text(seed) for seed in range(20)]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, **options):
+        index = NearDuplicateIndex(self.path, **options)
+        for number, text in enumerate(self.texts):
+            index.add(f"doc{number}", minhash_signature(text))
+        return index
+
+    def test_finds_the_near_duplicate_and_nothing_else(self):
+        index = self.build(threshold=0.8)
+        key, similarity = index.query(minhash_signature(edit(self.texts[7], 2)))
+        self.assertEqual(key, "doc7")
+        self.assertGreaterEqual(similarity, 0.8)
+        self.assertIsNone(index.query(minhash_signature(make_text(99))))
+        # Below the threshold even when it is a candidate
+        self.assertIsNone(index.query(minhash_signature(edit(self.texts[7], 60)), threshold=0.95))
+
+    def test_adding_a_key_twice_is_skipped(self):
+        index = self.build()
+        self.assertFalse(index.add("doc0", minhash_signature(self.texts[1])))
+        self.assertEqual(index.query(minhash_signature(self.texts[0])), ("doc0", 1.0))
+
+    def test_reopened_index_has_every_signature(self):
+        self.build()
+        reopened = NearDuplicateIndex(self.path)
+        self.assertEqual(len(reopened), len(self.texts))
+        self.assertIn("doc19", reopened)
+        self.assertEqual(reopened.query(minhash_signature(self.texts[19]))[0], "doc19")
+
+    def test_torn_append_is_cut_off(self):
+        self.build()
+        with open(self.path, "ab") as file:
+            file.write(b"partial record")
+        self.assertEqual(len(NearDuplicateIndex(self.path)), len(self.texts))
+        self.assertEqual(len(NearDuplicateIndex(self.path)), len(self.texts))
+
+    def test_other_minhash_settings_are_rejected(self):
+        self.build()
+        with self.assertRaises(ValueError):
+            NearDuplicateIndex(self.path, num_perm=64)
+
+    def test_grows_past_its_initial_capacity(self):
+        index = NearDuplicateIndex()
+        rng = np.random.default_rng(0)
+        signatures = rng.integers(0, 1 << 32, size=(3000, 128), dtype=np.uint32)
+        for number, signature in enumerate(signatures):
+            index.add(f"doc{number}", signature)
+        self.assertEqual(index.query(signatures[2500]), ("doc2500", 1.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+# tests/test_page_store.py
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import fitz
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from page_store import PageStore, PAGE_RECORD, document_text  # noqa: E402
+from pdf_text import extract_text_from_pdf  # noqa: E402
+
+
+def make_pages(count):
+    return [(number, f"Page {number} " + "word " * (20 * (number + 1)),
+             {"chars": 10, "words": 2, "images": number % 2, "width": 612.0, "height": 792.0})
+            for number in range(count)]
+
+
+class TestPageStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "store")
+        self.store = PageStore(self.path)
+        self.pages = make_pages(5)
+        self.store.put("a" * 64, self.pages)
+        self.store.put("b" * 64, make_pages(2))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_page_ranges_round_trip(self):
+        self.assertEqual(self.store.page_count("a" * 64), 5)
+        self.assertEqual(self.store.pages("a" * 64, 1, 3), [(number, text) for number, text, _ in self.pages[1:3]])
+        self.assertEqual(self.store.text("b" * 64), "".join(text for _, text, _ in make_pages(2)))
+        self.assertEqual(self.store.layout("a" * 64)["images"].tolist(), [0, 1, 0, 1, 0])
+        self.assertEqual(len(self.store.compressed_pages("a" * 64, 2)), 3)
+        with self.assertRaises(KeyError):
+            self.store.pages("c" * 64)
+
+    def test_budget_matches_pdf_extraction_rules(self):
+        full = self.store.text("a" * 64)
+        self.assertEqual(self.store.text("a" * 64, max_chars=100), full[:100])
+        self.assertEqual([number for number, _ in self.store.iter_page_text("a" * 64, max_chars=100)], [0])
+
+    def test_stored_documents_are_not_appended_twice(self):
+        size = os.path.getsize(os.path.join(self.path, "pages.dat"))
+        self.assertFalse(self.store.put("a" * 64, make_pages(1)))
+        self.assertEqual(os.path.getsize(os.path.join(self.path, "pages.dat")), size)
+
+    def test_threads_storing_the_same_document_append_it_once(self):
+        barrier = threading.Barrier(8)
+        refresh = self.store.refresh
+
+        def slow_refresh():
+            time.sleep(0.05)  # Widens the window in which another thread could append the document again
+            refresh()
+
+        def put(_):
+            barrier.wait()
+            return self.store.put("c" * 64, make_pages(3))
+
+        with mock.patch.object(self.store, "refresh", slow_refresh), ThreadPoolExecutor(8) as executor:
+            written = list(executor.map(put, range(8)))
+        self.assertEqual(sum(written), 1)
+        self.assertEqual(self.store.page_count("c" * 64), 3)
+
+    def test_other_instances_see_new_documents(self):
+        reader = PageStore(self.path)
+        self.store.put("c" * 64, make_pages(3))
+        self.assertIn("c" * 64, reader)
+        self.assertEqual(len(reader), 3)
+
+    def test_torn_append_is_cut_off_before_the_first_write(self):
+        with open(os.path.join(self.path, "pages.dat"), "ab") as file:
+            file.write(b"unindexed page data")
+        with open(os.path.join(self.path, "pages.idx"), "ab") as file:
+            file.write(b"\0" * (PAGE_RECORD.itemsize // 2))
+        reopened = PageStore(self.path)
+        self.assertEqual(len(reopened), 2)
+        reopened.put("c" * 64, make_pages(1))
+        self.assertEqual(os.path.getsize(os.path.join(self.path, "pages.idx")), 8 * PAGE_RECORD.itemsize)
+        self.assertEqual(reopened.pages("c" * 64), [(0, make_pages(1)[0][1])])
+
+    def test_readers_leave_an_append_in_progress_alone(self):
+        # The writer has appended page data but not yet the index records that point at it
+        data_path = os.path.join(self.path, "pages.dat")
+        with open(data_path, "ab") as file:
+            file.write(b"page data of the next document")
+        size = os.path.getsize(data_path)
+        PageStore(self.path)
+        self.assertEqual(os.path.getsize(data_path), size)
+
+    def test_document_text_extracts_a_pdf_once(self):
+        pdf_path = os.path.join(self.tmp.name, "doc.pdf")
+        with fitz.open() as doc:
+            for number in range(3):
+                doc.new_page().insert_text((72, 72), f"Text of page {number}")
+            doc.save(pdf_path)
+        text = document_text(pdf_path, store_path=self.path)
+        self.assertEqual(text, extract_text_from_pdf(pdf_path))
+        self.assertEqual(len(PageStore(self.path)), 3)
+        self.assertEqual(document_text(pdf_path, max_chars=10, store_path=self.path), text[:10])
+
+
+if __name__ == '__main__':
+    unittest.main()
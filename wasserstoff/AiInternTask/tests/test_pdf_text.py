@@ -0,0 +1,50 @@
+# tests/test_pdf_text.py
+import os
+import sys
+import tempfile
+import unittest
+
+import fitz
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from pdf_text import extract_text_from_pdf, iter_page_text  # noqa: E402
+
+
+class TestPdfText(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.pdf_path = os.path.join(cls.tmp.name, "pages.pdf")
+        doc = fitz.open()
+        for page_number in range(20):
+            page = doc.new_page()
+            page.insert_textbox(fitz.Rect(72, 72, 540, 770), f"page {page_number} " + "word " * 40)
+        doc.save(cls.pdf_path)
+        doc.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_stops_reading_pages_once_char_budget_is_met(self):
+        pages = list(iter_page_text(self.pdf_path, max_chars=300))
+        self.assertEqual([page_number for page_number, _ in pages], [0, 1])
+
+    def test_token_budget(self):
+        pages = list(iter_page_text(self.pdf_path, max_tokens=100))
+        self.assertEqual(len(pages), 3)
+
+    def test_spread_sampling_covers_the_whole_document(self):
+        page_numbers = [page_number for page_number, _ in iter_page_text(self.pdf_path, max_chars=900,
+                                                                        sample="spread")]
+        self.assertEqual(page_numbers[0], 0)
+        self.assertGreater(page_numbers[-1], 10)
+        self.assertEqual(page_numbers, sorted(page_numbers))
+
+    def test_extract_text_is_trimmed_to_budget(self):
+        full_text = extract_text_from_pdf(self.pdf_path)
+        self.assertEqual(extract_text_from_pdf(self.pdf_path, max_chars=500), full_text[:500])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+# tests/test_result_cache.py
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from result_cache import ResultCache, hash_file  # noqa: E402
+
+SETTINGS = {"model": "t5-small", "num_beams": 4, "lengths": {"short": 50}, "top_n": 5}
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.tmp.name, "cache.sqlite")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_hit_after_put_and_persists_across_instances(self):
+        cache = ResultCache(self.cache_path, SETTINGS)
+        self.assertIsNone(cache.get("abc"))
+        cache.put("abc", {"keywords": ["workmen"]})
+        cache.close()
+
+        reopened = ResultCache(self.cache_path, SETTINGS)
+        self.assertEqual(reopened.get("abc"), {"keywords": ["workmen"]})
+        self.assertEqual((reopened.hits, reopened.misses), (1, 0))
+        reopened.close()
+
+    def test_changed_settings_invalidate_entries(self):
+        cache = ResultCache(self.cache_path, SETTINGS)
+        cache.put("abc", {"keywords": []})
+        cache.close()
+
+        changed = ResultCache(self.cache_path, dict(SETTINGS, num_beams=2))
+        self.assertIsNone(changed.get("abc"))
+        self.assertEqual(len(changed), 0)
+        changed.close()
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = ResultCache(self.cache_path, SETTINGS, max_entries=2)
+        cache.put("first", {})
+        cache.put("second", {})
+        cache.get("first")
+        cache.put("third", {})
+
+        self.assertIsNotNone(cache.get("first"))
+        self.assertIsNone(cache.get("second"))
+        self.assertEqual(len(cache), 2)
+        cache.close()
+
+    def test_hash_depends_on_content_only(self):
+        paths = []
+        for name, content in (("a.pdf", b"%PDF-1"), ("b.pdf", b"%PDF-1"), ("c.pdf", b"%PDF-2")):
+            path = os.path.join(self.tmp.name, name)
+            with open(path, "wb") as file:
+                file.write(content)
+            paths.append(path)
+        self.assertEqual(hash_file(paths[0]), hash_file(paths[1]))
+        self.assertNotEqual(hash_file(paths[0]), hash_file(paths[2]))
+
+
+if __name__ == '__main__':
+    unittest.main()
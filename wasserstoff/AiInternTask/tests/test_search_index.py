@@ -0,0 +1,124 @@
+# tests/test_search_index.py
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+import urllib.request
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from search_index import MANIFEST_NAME, SearchIndex, make_server  # noqa: E402
+
+
+class TestSearchIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "index")
+        self.index = SearchIndex(self.path, flush_documents=2)
+        self.index.add_document("tax.pdf", [(1, "Income tax appeal"), (2, "The court held the tax was due")],
+                                {"short": "A tax case"}, ["income tax"])
+        self.index.add_document("murder.pdf", [(1, "Murder trial before a jury"), (4, "The court gave its verdict")],
+                                {"short": "A criminal case"}, ["murder"])
+        self.index.add_document("tribunal.pdf", [(1, "Sales tax tribunal")], {}, ["tribunal"])
+        self.index.flush()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def names(self, results):
+        return [result["name"] for result in results]
+
+    def test_bm25_ranks_documents_with_more_matches_first(self):
+        results = self.index.search("tax court")
+        self.assertEqual(self.names(results), ["tax.pdf", "tribunal.pdf", "murder.pdf"])
+        self.assertGreater(results[0]["score"], results[1]["score"])
+
+    def test_results_carry_page_level_hits(self):
+        result, = self.index.search("verdict")
+        self.assertEqual(result["pages"], {"verdict": [4]})
+        self.assertEqual(self.index.search("tax court")[0]["pages"], {"tax": [1, 2], "court": [2]})
+
+    def test_keyword_filter(self):
+        self.assertEqual(self.names(self.index.search("court", keywords=["murder"])), ["murder.pdf"])
+        self.assertEqual(self.names(self.index.search("", keywords=["Income  Tax"])), ["tax.pdf"])
+        self.assertEqual(self.index.search("court", keywords=["unknown"]), [])
+
+    def test_readding_a_document_replaces_it(self):
+        self.index.add_document("tax.pdf", [(1, "Nothing relevant")], {}, [])
+        self.index.flush()
+        self.assertEqual(self.names(self.index.search("tax")), ["tribunal.pdf"])
+        self.assertEqual(self.names(self.index.search("relevant")), ["tax.pdf"])
+        self.assertEqual(len(self.index), 3)
+
+    def test_merge_keeps_results_and_leaves_one_segment(self):
+        self.index.add_document("tax.pdf", [(1, "Nothing relevant")], {}, [])
+        self.index.flush()
+        before = self.index.search("court")
+        self.index.merge()
+        self.assertEqual(self.index.search("court"), before)
+        self.assertEqual([name for name in os.listdir(self.path) if name.startswith("segment-")], ["segment-000003"])
+
+    def test_failed_flush_keeps_the_documents_queued(self):
+        self.index.add_document("appeal.pdf", [(1, "Writ petition dismissed")], {}, [])
+        with mock.patch("search_index._write_segment", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self.index.flush()
+        self.index.flush()
+        self.assertEqual(self.names(self.index.search("petition")), ["appeal.pdf"])
+
+    def test_flush_after_a_crash_before_the_manifest_was_saved(self):
+        self.index.add_document("appeal.pdf", [(1, "Writ petition dismissed")], {}, [])
+        with mock.patch.object(self.index, "_save_manifest", side_effect=OSError("killed")):
+            with self.assertRaises(OSError):
+                self.index.flush()
+        # The segment is on disk, but the manifest never listed it
+        index = SearchIndex(self.path, flush_documents=2)
+        index.add_document("appeal.pdf", [(1, "Writ petition dismissed")], {}, [])
+        index.flush()
+        index.add_document("bail.pdf", [(1, "Bail granted")], {}, [])
+        index.flush()
+        self.assertEqual(self.names(index.search("petition")), ["appeal.pdf"])
+        self.assertEqual(self.names(SearchIndex(self.path).search("bail")), ["bail.pdf"])
+
+    def test_flushed_segments_are_merged_in_tiers(self):
+        index = SearchIndex(os.path.join(self.tmp.name, "tiered"), flush_documents=2, merge_factor=3)
+        unmerged = SearchIndex(os.path.join(self.tmp.name, "unmerged"), flush_documents=2, merge_factor=None)
+        for number in range(40):
+            for each in (index, unmerged):
+                each.add_document(f"doc{number}.pdf", [(1, f"common term{number}")], {}, [])
+                each.flush()  # As often as the ingest service commits
+        self.assertEqual(len(unmerged._segments), 40)
+        # Segments of one document merge at 3, of three at 9 and so on
+        self.assertLessEqual(len(index._segments), 8)
+        self.assertEqual(len(index.search("common", top_k=100)), 40)
+        self.assertEqual(self.names(index.search("term17")), ["doc17.pdf"])
+        reopened = SearchIndex(index.path)
+        self.assertEqual(len(reopened), 40)
+        # Merged segments are removed from disk
+        segment_names = [entry["name"] for entry in reopened._manifest["segments"]]
+        self.assertEqual(sorted(os.listdir(index.path)), sorted([MANIFEST_NAME] + segment_names))
+
+    def test_index_is_reopened_from_disk(self):
+        reopened = SearchIndex(self.path)
+        self.assertEqual(self.names(reopened.search("jury")), ["murder.pdf"])
+
+    def test_http_query_api(self):
+        server = make_server(SearchIndex(self.path), port=0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/search?q=court&keyword=murder"
+            with urllib.request.urlopen(url) as response:
+                results = json.load(response)
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(self.names(results), ["murder.pdf"])
+
+
+if __name__ == '__main__':
+    unittest.main()
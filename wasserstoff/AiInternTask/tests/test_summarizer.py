@@ -0,0 +1,122 @@
+# tests/test_summarizer.py
+import os
+import re
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import summarizer  # noqa: E402
+from model_registry import registry  # noqa: E402
+
+
+class WordTokenizer:
+    model_max_length = 12
+
+    def num_special_tokens_to_add(self):
+        return 2
+
+    def __call__(self, text, add_special_tokens=False, return_offsets_mapping=False):
+        return {"offset_mapping": [match.span() for match in re.finditer(r"\S+", text)]}
+
+
+class FakeNer:
+    """Tags capitalized words; the score drops for words at the edges of the window it was given."""
+
+    tokenizer = WordTokenizer()
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts, batch_size, aggregation_strategy):
+        self.calls.append(len(texts))
+        results = []
+        for text in texts:
+            matches = list(re.finditer(r"\S+", text))
+            entities = []
+            for position, match in enumerate(matches):
+                if match.group()[0].isupper():
+                    edge = position in (0, len(matches) - 1)
+                    entities.append({"word": match.group(), "score": 0.7 if edge else 0.95,
+                                     "start": match.start(), "end": match.end()})
+            results.append(entities)
+        return results
+
+
+class FakeSummarizer:
+    """Returns the first three words of each input."""
+
+    tokenizer = WordTokenizer()
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts, batch_size, min_length, max_length, truncation):
+        self.calls.append((len(texts), min_length, max_length))
+        assert all(len(text.split()) <= 10 for text in texts), "window larger than the model input"
+        return [{"summary_text": " ".join(text.split()[:3]) + "."} for text in texts]
+
+
+class TestSlidingWindows(unittest.TestCase):
+
+    def setUp(self):
+        self.ner = FakeNer()
+        self.summarizer = FakeSummarizer()
+        registry.register("test-ner", lambda: self.ner)
+        registry.register("test-summarization", lambda: self.summarizer)
+        self.names = summarizer.summarizer_name, summarizer.keyword_extractor_name, summarizer.window_overlap_tokens
+        summarizer.summarizer_name, summarizer.keyword_extractor_name = "test-summarization", "test-ner"
+        summarizer.window_overlap_tokens = 2
+
+    def tearDown(self):
+        summarizer.summarizer_name, summarizer.keyword_extractor_name, summarizer.window_overlap_tokens = self.names
+        registry.evict("test-ner")
+        registry.evict("test-summarization")
+
+    def test_windows_overlap_and_cover_the_text(self):
+        text = " ".join(f"w{i}" for i in range(25))
+        windows = summarizer.split_windows(text, WordTokenizer(), 10, overlap_tokens=2)
+        self.assertEqual([text[start:end].split()[0] for start, end in windows], ["w0", "w8", "w16"])
+        self.assertEqual(text[windows[-1][0]:windows[-1][1]].split()[-1], "w24")
+        self.assertEqual(summarizer.split_windows("a b", WordTokenizer(), 10), [(0, 3)])
+
+    def test_entities_at_window_boundaries_are_merged_with_averaged_scores(self):
+        entities = [{"word": "Wasser", "score": 0.6, "start": 10, "end": 16},
+                    {"word": "Wasserstoff", "score": 0.9, "start": 10, "end": 21},
+                    {"word": "Delhi", "score": 0.9, "start": 30, "end": 35}]
+        merged = summarizer.merge_entities(entities)
+        self.assertEqual([entity["word"] for entity in merged], ["Wasserstoff", "Delhi"])
+        self.assertAlmostEqual(merged[0]["score"], 0.75)
+
+    def test_keywords_of_many_documents_share_one_batched_call(self):
+        texts = ["the High Court heard the appeal of the Revenue about the tax on Delhi land in the year",
+                 "a short note from Mumbai"]
+        keywords = summarizer.extract_keywords_from_texts(texts)
+        self.assertEqual(self.ner.calls, [3])
+        # "Revenue" sits at a window edge in one window and inside the next; the scores are averaged
+        self.assertEqual(keywords, [["High", "Court", "Revenue", "Delhi"], []])
+
+    def test_long_texts_are_summarized_per_window_then_combined(self):
+        texts = [" ".join(f"w{i}" for i in range(40)), "One short document."]
+        summaries = summarizer.summarize_texts(texts)
+        # Five windows, then two windows of the joined partial summaries, then the final pass
+        self.assertEqual(summaries, ["w0 w1 w2...", "One short document.."])
+        self.assertEqual([calls for calls, _, _ in self.summarizer.calls], [5, 1, 2, 1])
+        # First pass: the long text's windows and the short text's final summary, grouped by length
+        self.assertEqual(self.summarizer.calls[0], (5, 30, 120))
+        self.assertEqual(self.summarizer.calls[1], (1, 30, 50))
+
+    def test_process_pdfs_reads_each_text_once(self):
+        reads = []
+        original = summarizer.document_text
+        summarizer.document_text = lambda path: reads.append(path) or "Alpha beta gamma delta"
+        try:
+            results = summarizer.process_pdfs(["a.pdf", "b.pdf"])
+        finally:
+            summarizer.document_text = original
+        self.assertEqual(reads, ["a.pdf", "b.pdf"])
+        self.assertEqual(results[0], ("Alpha beta gamma.", []))
+
+
+if __name__ == '__main__':
+    unittest.main()
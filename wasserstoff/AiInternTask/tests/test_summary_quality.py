@@ -0,0 +1,34 @@
+# tests/test_summary_quality.py
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from summary_quality import rouge_l, rouge_n, rouge_scores  # noqa: E402
+
+
+class TestRouge(unittest.TestCase):
+
+    def test_identical_summaries_score_one(self):
+        scores = rouge_scores("The cat sat on the mat.", "the cat sat on the mat")
+        self.assertEqual(scores, {"rouge1": 1.0, "rouge2": 1.0, "rougeL": 1.0})
+
+    def test_disjoint_summaries_score_zero(self):
+        self.assertEqual(rouge_scores("alpha beta", "gamma delta"), {"rouge1": 0.0, "rouge2": 0.0, "rougeL": 0.0})
+        self.assertEqual(rouge_n("", "gamma"), 0.0)
+
+    def test_partial_overlap(self):
+        reference = "the cat sat on the mat"
+        candidate = "the cat lay on the mat"
+        # 5 of 6 unigrams and 3 of 5 bigrams match in both directions
+        self.assertAlmostEqual(rouge_n(reference, candidate, 1), 5 / 6)
+        self.assertAlmostEqual(rouge_n(reference, candidate, 2), 3 / 5)
+        self.assertAlmostEqual(rouge_l(reference, candidate), 5 / 6)
+
+    def test_rouge_l_respects_order(self):
+        self.assertAlmostEqual(rouge_l("a b c d", "d c b a"), 0.25)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+# tests/test_tfidf_keywords.py
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from tfidf_keywords import TfidfKeywordEngine  # noqa: E402
+
+
+class TestTfidfKeywordEngine(unittest.TestCase):
+
+    def test_terms_common_to_the_corpus_rank_below_specific_ones(self):
+        engine = TfidfKeywordEngine()
+        engine.add_documents(["court appeal judgment"] * 5)
+        keywords, = engine.extract_keywords(["court court appeal appeal tribunal"], top_n=3)
+        self.assertEqual(keywords[0], "tribunal")
+        self.assertEqual(engine.documents, 6)
+
+    def test_top_n_is_ordered_and_bounded(self):
+        engine = TfidfKeywordEngine()
+        keywords = engine.extract_keywords(["gamma alpha alpha alpha delta delta beta beta beta beta",
+                                            "epsilon", ""], top_n=3)
+        self.assertEqual(keywords[0], ["beta", "alpha", "delta"])
+        self.assertEqual(keywords[1], ["epsilon"])
+        self.assertEqual(keywords[2], [])
+
+    def test_numbers_and_stop_words_are_not_keywords(self):
+        keywords, = TfidfKeywordEngine().extract_keywords(["the 2024 and 01 of invoice"], top_n=5)
+        self.assertEqual(keywords, ["invoice"])
+
+    def test_scoring_without_update_leaves_frequencies_unchanged(self):
+        engine = TfidfKeywordEngine()
+        engine.add_documents(["alpha beta"])
+        engine.extract_keywords(["alpha gamma"], update=False)
+        self.assertEqual(engine.documents, 1)
+
+    def test_state_survives_save_and_load(self):
+        engine = TfidfKeywordEngine()
+        engine.add_documents(["alpha beta", "alpha gamma"])
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "state.npz")
+            engine.save(path)
+            loaded = TfidfKeywordEngine.load(path)
+        self.assertEqual(loaded.documents, 2)
+        self.assertEqual(len(loaded), 3)
+        self.assertEqual(loaded.extract_keywords(["alpha delta"], top_n=1, update=False),
+                         engine.extract_keywords(["alpha delta"], top_n=1, update=False))
+
+    def test_only_changes_make_the_engine_dirty(self):
+        engine = TfidfKeywordEngine()
+        self.assertFalse(engine.dirty)
+        engine.add_documents(["alpha beta"])
+        self.assertTrue(engine.dirty)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "state.npz")
+            engine.save(path)
+            self.assertFalse(engine.dirty)
+            engine.extract_keywords(["alpha beta"], update=False)
+            self.assertFalse(engine.dirty)
+            # A new term is part of the saved vocabulary, even when the frequencies are not updated
+            engine.extract_keywords(["alpha gamma"], update=False)
+            self.assertTrue(engine.dirty)
+            self.assertFalse(TfidfKeywordEngine.load(path).dirty)
+
+    def test_load_of_missing_state_is_empty(self):
+        self.assertEqual(TfidfKeywordEngine.load(os.path.join(tempfile.gettempdir(), "missing.npz")).documents, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+# tests/test_triage.py
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+import fitz
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from triage import triage_pdf, time_limit  # noqa: E402
+
+PARAGRAPH = "Triage reads only the first pages of each document before any model runs. " * 8
+
+
+class TestTriage(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_pdf(self, name, page_texts, image_pages=(), **save_options):
+        path = os.path.join(self.tmp.name, name)
+        doc = fitz.open()
+        for number, text in enumerate(page_texts):
+            page = doc.new_page()
+            if text:
+                page.insert_textbox(fitz.Rect(50, 50, 550, 750), text)
+            if number in image_pages:
+                pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 32, 32), False)
+                pixmap.clear_with(128)
+                page.insert_image(fitz.Rect(50, 50, 550, 750), pixmap=pixmap)
+        doc.save(path, **save_options)
+        doc.close()
+        return path
+
+    def test_text_pdf(self):
+        result = triage_pdf(self.make_pdf("text.pdf", [PARAGRAPH] * 5))
+        self.assertEqual(result["category"], "text")
+        self.assertEqual(result["pages"], 5)
+        # Only the first pages are read
+        self.assertEqual([page_number for page_number, _, _ in result["sample"]], [0, 1, 2])
+
+    def test_image_only_pdf_is_scanned(self):
+        result = triage_pdf(self.make_pdf("scan.pdf", ["", "", "", ""], image_pages=(0, 1, 2, 3)))
+        self.assertEqual(result["category"], "scanned")
+        self.assertEqual(result["images"], 3)
+
+    def test_short_pdf_is_trivial_and_its_sample_is_the_whole_text(self):
+        result = triage_pdf(self.make_pdf("short.pdf", ["A two page memo.", "Signed, the team."]))
+        self.assertEqual(result["category"], "trivial")
+        self.assertIn("Signed, the team.", "".join(text for _, text, _ in result["sample"]))
+
+    def test_blank_pdf_is_empty(self):
+        self.assertEqual(triage_pdf(self.make_pdf("blank.pdf", ["", ""]))["category"], "empty")
+
+    def test_sparse_first_pages_of_a_long_pdf_are_left_to_extraction(self):
+        result = triage_pdf(self.make_pdf("cover.pdf", ["", "", "", PARAGRAPH, PARAGRAPH]))
+        self.assertEqual(result["category"], "text")
+
+    def test_encrypted_pdf(self):
+        path = self.make_pdf("locked.pdf", [PARAGRAPH], encryption=fitz.PDF_ENCRYPT_AES_256, user_pw="secret",
+                             owner_pw="owner")
+        self.assertEqual(triage_pdf(path)["category"], "encrypted")
+
+    def test_corrupt_pdf(self):
+        path = os.path.join(self.tmp.name, "corrupt.pdf")
+        with open(path, "wb") as file:
+            file.write(b"%PDF-1.4\n" + os.urandom(256))
+        result = triage_pdf(path)
+        self.assertEqual(result["category"], "corrupt")
+        self.assertTrue(result["reason"])
+
+
+class TestTimeLimit(unittest.TestCase):
+
+    def test_raises_once_the_limit_passes(self):
+        with self.assertRaises(TimeoutError):
+            with time_limit(0.1):
+                time.sleep(2)
+
+    def test_fast_block_and_no_limit(self):
+        with time_limit(1):
+            pass
+        with time_limit(None):
+            time.sleep(0.01)
+
+
+if __name__ == '__main__':
+    unittest.main()